@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Load-aware admission of incoming advisory mail.
+
+Before any parsing, the alert scripts check whether the insert path can keep
+up. If it can't, they exit with EX_TEMPFAIL (75) so the MTA keeps the
+message queued and redelivers it later, instead of the script spending its
+parse, AI and database work on an insert that will fail. Mail is shed when:
+
+  - the MySQL breaker is open (connections failing or refused for too many
+    connections),
+  - ADMIT_MAX_QUEUED or more inserts are already waiting for a scheduler slot,
+  - the spool holds ADMIT_MAX_SPOOL or more advisories awaiting replay,
+  - the AI alias breaker is open and ADMIT_AI_BREAKER is set.
+
+Set a threshold to 0 to ignore that signal. Every decision is counted in
+alerts_admission_total by decision and reason.
+"""
+
+import os
+import breaker
+import metrics
+from scheduler import InsertScheduler
+from spool import Spool
+
+EX_TEMPFAIL = 75
+
+ADMIT_MAX_QUEUED = int(os.getenv('ADMIT_MAX_QUEUED', 50))
+ADMIT_MAX_SPOOL = int(os.getenv('ADMIT_MAX_SPOOL', 200))
+ADMIT_DB_BREAKER = os.getenv('ADMIT_DB_BREAKER', '1') == '1'
+ADMIT_AI_BREAKER = os.getenv('ADMIT_AI_BREAKER', '1') == '1'
+
+
+def shed_reason(scheduler=None, spool=None, db_breaker=None, ai_breaker=None):
+    """Why new mail should be deferred, or None to admit it; cheapest checks first"""
+    db_breaker = db_breaker or breaker.DB
+    ai_breaker = ai_breaker or breaker.AI
+    if ADMIT_DB_BREAKER and db_breaker.state() == 'open':
+        return 'db_breaker'
+    if ADMIT_AI_BREAKER and ai_breaker.state() == 'open':
+        return 'ai_breaker'
+    if ADMIT_MAX_SPOOL and (spool or Spool()).backlog() >= ADMIT_MAX_SPOOL:
+        return 'spool_backlog'
+    if ADMIT_MAX_QUEUED and (scheduler or InsertScheduler()).waiting() >= ADMIT_MAX_QUEUED:
+        return 'insert_queue'
+    return None
+
+
+def admit(**checks):
+    """Count and return the decision: None to proceed, else the shed reason"""
+    reason = shed_reason(**checks)
+    metrics.ADMISSIONS.inc(decision='shed' if reason else 'admit', reason=reason or '')
+    return reason
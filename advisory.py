@@ -8,15 +8,62 @@ import string
 import random
 from datetime import datetime
 import time
-import subprocess
 import sys
 from email.utils import parsedate_to_datetime
 from dotenv import load_dotenv
 import os
+from timing import NULL_TIMER
+from notifier import get_notifier
+from ingest_log import get_ingest_log
+from search_index import extract_facets, get_search_index
+from feed import feed_record, get_feed
+from coordination import insert_lock
+from cve_index import store_cves
+from parser_engine import extract_cves
+import metrics
+import breaker
+
+
+ALIAS_MODEL = "gpt-4o-mini"
+ALIAS_USER_PREFIX = "Extract the most descriptive core words: "
+ALIAS_SYSTEM_INSTRUCTION = """You are an expert at creating concise, SEO-friendly URL slugs for security advisories.
+Extract the 3-5 most important and descriptive words from a security advisory title.
+
+Rules:
+1. Focus on the software/package name and the key vulnerability or issue
+2. Exclude generic words like "security", "advisory", "update", "fix", "bug"
+3. Keep version numbers only if they're critical to understanding
+4. Output should be 3-5 words maximum, lowercase, separated by hyphens
+5. Total length should be under 40 characters. This is must-have option.
+
+Examples:
+- "DSA-6059-1 thunderbird - security update" -> "thunderbird-dsa-6059-1"
+- "FEDORA-2024-123 kernel security and bug fix update" -> "kernel-fedora-2024-123"
+"""
+
+
+class _CountingCursor:
+    """Cursor wrapper counting executed statements for the round-trip metric"""
+
+    def __init__(self, cursor, advisory):
+        self._cursor = cursor
+        self._advisory = advisory
+
+    def execute(self, *args, **kwargs):
+        self._advisory.round_trips += 1
+        return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        # INSERTs are batched into one multi-row statement
+        self._advisory.round_trips += 1
+        return self._cursor.executemany(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
 
 
 class Advisory:
-    def __init__(self):
+    def __init__(self, alias_client=None, alias_breaker=None):
         load_dotenv()
         
         self.db_config = {
@@ -61,15 +108,29 @@ class Advisory:
             'other': 97,
         }
 
+        self.databases = ["lsv7", "lsv7j5beta"]
+
+        # Chat completions client for aliases (injectable for tests) and aliases per title
+        self.alias_client = alias_client
+        # Injected clients don't share the production breaker's state
+        self.alias_breaker = alias_breaker or (breaker.NullBreaker() if alias_client else breaker.AI)
+        self.alias_cache = {}
+        self.round_trips = 0
+        self.last_reason = ''
+        self.last_article_ids = {}
+        self.last_aliases = {}
+
     def db_connect(self, database):
         """Connect to MySQL database"""
         try:
             config = self.db_config.copy()
             config['database'] = database
             connection = mysql.connector.connect(**config)
+            breaker.DB.success()
             return connection
         except Error as e:
             print(f"Error connecting to MySQL: {e}")
+            breaker.DB.failure()
             return None
 
     def db_disconnect(self, connection):
@@ -86,82 +147,93 @@ class Advisory:
         import time
         return str(int(time.time()))
 
-    def clean_title_alias(self, title):
-        """Generate concise alias using AI to select most descriptive words"""
-        import json
-        from openai import OpenAI
-        from dotenv import load_dotenv
-        import os
-        
-        load_dotenv()
-        
-        # Use AI to extract the most descriptive core words
-        system_instruction = """You are an expert at creating concise, SEO-friendly URL slugs for security advisories.
-Extract the 3-5 most important and descriptive words from a security advisory title.
-
-Rules:
-1. Focus on the software/package name and the key vulnerability or issue
-2. Exclude generic words like "security", "advisory", "update", "fix", "bug"
-3. Keep version numbers only if they're critical to understanding
-4. Output should be 3-5 words maximum, lowercase, separated by hyphens
-5. Total length should be under 40 characters. This is must-have option.
-
-Examples:
-- "DSA-6059-1 thunderbird - security update" -> "thunderbird-dsa-6059-1"
-- "FEDORA-2024-123 kernel security and bug fix update" -> "kernel-fedora-2024-123"
-"""
-        
-        try:
-            client = OpenAI(
+    def get_alias_client(self):
+        """Return the chat completions client used for aliases, creating it on first use"""
+        if self.alias_client is None:
+            from openai import OpenAI
+            self.alias_client = OpenAI(
                 organization=os.getenv("ORGANIZATION"),
                 project=os.getenv("PROJECT_ID"),
             )
-            
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_instruction},
-                    {"role": "user", "content": f"Extract the most descriptive core words: {title}"}
-                ],
-                response_format={
-                    "type": "json_schema",
-                    "json_schema": {
-                        "name": "alias_format",
-                        "schema": {
-                            "type": "object",
-                            "properties": {"string": {"type": "string"}},
-                            "required": ["string"],
-                            "additionalProperties": False
-                        },
-                        "strict": True
-                    }
+        return self.alias_client
+
+    def _ai_alias(self, title):
+        """Ask the model for the most descriptive words of a title; raises on failure"""
+        response = self.get_alias_client().chat.completions.create(
+            model=ALIAS_MODEL,
+            messages=[
+                {"role": "system", "content": ALIAS_SYSTEM_INSTRUCTION},
+                {"role": "user", "content": f"{ALIAS_USER_PREFIX}{title}"}
+            ],
+            response_format={
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "alias_format",
+                    "schema": {
+                        "type": "object",
+                        "properties": {"string": {"type": "string"}},
+                        "required": ["string"],
+                        "additionalProperties": False
+                    },
+                    "strict": True
                 }
-            )
-            
-            result = json.loads(response.choices[0].message.content)
-            alias = result.get("string", "").lower().strip()
-            
-            # Clean up the AI-generated alias
-            alias = re.sub(r'[^\x00-\x7F]', '', alias)
-            alias = re.sub(r'[^a-z0-9\-]', '-', alias)
-            alias = re.sub(r'-+', '-', alias)
-            alias = re.sub(r'^-|-$', '', alias)
-            
-        except Exception as e:
-            # Fallback to basic cleaning if AI fails
-            print(f"AI alias generation failed: {e}, using fallback")
-            alias = title.lower()
-            alias = re.sub(r'security and bug fix (update)?', '', alias)
-            alias = re.sub(r'[\[\]]', '', alias)
-            alias = re.sub(r'[^\x00-\x7F]', '', alias)
-            alias = re.sub(r'[^a-z0-9\-]', '-', alias)
-            alias = re.sub(r'-+', '-', alias)
-            alias = re.sub(r'^-|-$', '', alias)
-        
+            }
+        )
+
+        result = json.loads(response.choices[0].message.content)
+        alias = result.get("string", "").lower().strip()
+
+        # Clean up the AI-generated alias
+        alias = re.sub(r'[^\x00-\x7F]', '', alias)
+        alias = re.sub(r'[^a-z0-9\-]', '-', alias)
+        alias = re.sub(r'-+', '-', alias)
+        alias = re.sub(r'^-|-$', '', alias)
+        if not alias:
+            raise ValueError("empty alias in model response")
+        return alias
+
+    def _fallback_alias(self, title):
+        """Basic regex cleaning of the title, used when the model is unavailable"""
+        alias = title.lower()
+        alias = re.sub(r'security and bug fix (update)?', '', alias)
+        alias = re.sub(r'[\[\]]', '', alias)
+        alias = re.sub(r'[^\x00-\x7F]', '', alias)
+        alias = re.sub(r'[^a-z0-9\-]', '-', alias)
+        alias = re.sub(r'-+', '-', alias)
+        alias = re.sub(r'^-|-$', '', alias)
+        return alias
+
+    def title_alias_base(self, title):
+        """Alias words for a title without the unique suffix, cached per title"""
+        alias = self.alias_cache.get(title)
+        if alias is None:
+            if not self.alias_breaker.allow():
+                # The model has been failing; don't wait on another timeout
+                metrics.AI_ALIAS_FALLBACKS.inc()
+                return self._fallback_alias(title)
+            start = time.perf_counter()
+            try:
+                alias = self._ai_alias(title)
+            except Exception as e:
+                # Fallback to basic cleaning if AI fails; not cached so a later call can retry
+                print(f"AI alias generation failed: {e}, using fallback")
+                metrics.AI_ALIAS_FALLBACKS.inc()
+                self.alias_breaker.failure()
+                return self._fallback_alias(title)
+            finally:
+                metrics.AI_ALIAS_SECONDS.observe(time.perf_counter() - start)
+            self.alias_breaker.success()
+            self.alias_cache[title] = alias
+        return alias
+
+    def clean_title_alias(self, title):
+        """Generate concise alias using AI to select most descriptive words"""
+        alias = self.title_alias_base(title)
+
         # Add random ID for uniqueness
         random_id = self.generate_random_id()
         alias = f"{alias}-{random_id.lower()}"
-        
+
         return alias.strip()
 
     def get_distro_images(self, os_name):
@@ -237,85 +309,190 @@ Examples:
         return distro_images.get(os_name.lower(), default)
 
     def send_copy(self, title, intro_text, full_text, os_name):
-        """Send copy notification email"""
-        try:
-            cmd = ['/usr/sbin/sendmail', '-odb', '-t']
-            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, text=True)
-            
-            email_content = f"""X-Script-Name: <gambit:~alerts/scripts/advisory.py>
-From: alerts@guardiandigital.com
-To: reports@guardiandigital.com
-Subject: Automatically Inserted Advisory for {os_name}
-
-The following advisory has been inserted into the database.
-Please log into linuxsecurity.com, check the advisory and publish.
-
--Title: {title}
-
--Short Description:
-{intro_text}
-
--Full Text:
-{full_text}
-
--- Automatic Advisory Inserter"""
-            
-            proc.communicate(input=email_content)
-        except Exception as e:
-            print(f"Error sending copy email: {e}")
-
-    def send_failed(self, title, os_name, error_reason=None):
-        """Send failure notification email"""
-        try:
-            cmd = ['/usr/sbin/sendmail', '-odb', '-t']
-            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, text=True)
-            
-            # Build error details section
-            error_details = ""
-            if error_reason:
-                error_details = f"\nError/Reason:\n{error_reason}\n"
-            
-            email_content = f"""X-Script-Name: <gambit:~alerts/scripts/advisory.py>
-From: alerts@guardiandigital.com
-To: dwreski@guardiandigital.com
-Subject: {os_name} Advisory insert failed
-
-The following advisory failed to be inserted.
-
-subject: {title}
-{error_details}
--- Automatic Advisory Inserter"""
-            
-            proc.communicate(input=email_content)
-        except Exception as e:
-            print(f"Error sending failure email: {e}")
-
-    def insert_advisory(self, title_init, intro_text_init, full_text_init, os_name_init, adv_date_tz_init):
-        """Insert advisory into database"""
-        
-        # Log to file
-        db_file = '/home/alerts/scripts_linstage/db-record.txt'
+        """Queue a copy notification email"""
+        get_notifier().copy(title, intro_text, full_text, os_name)
+
+    def send_failed(self, title, os_name, error_reason=None, kind='failed', critical=False):
+        """
+        Queue a failure notification email. Events with the same distro and kind
+        are coalesced into one digest; critical ones are sent immediately.
+        """
+        get_notifier().failed(title, os_name, error_reason, kind, critical)
+
+    def insert_advisory(self, title_init, intro_text_init, full_text_init, os_name_init, adv_date_tz_init,
+                        connections=None, notify=True, timer=NULL_TIMER, cves=None):
+        """
+        Insert advisory into database.
+
+        connections maps database name to an open connection to reuse (bulk
+        imports); otherwise one is opened and closed per database. notify=False
+        suppresses duplicate and taken-alias notifications. Stage times for both
+        databases are accumulated on timer. cves are the parser's CVE ids, linked
+        to the article in xu5gc_advisory_cve; None takes them from the full text.
+        Returns 'inserted', 'duplicate' or 'alias_exists'.
+        """
+        self.round_trips = 0
+        self.last_reason = ''
+        self.last_article_ids = {}
+        self.last_aliases = {}
+        started = time.perf_counter()
+        if cves is None:
+            cves = extract_cves(full_text_init)
         try:
-            with open(db_file, 'a') as f:
-                datestring = datetime.now().strftime('%c')
-                f.write(f"BEGIN {datestring} -------------------------------------------------------------------------------------------\n")
-                f.write(f"Title: {title_init} Date: {adv_date_tz_init}\n")
+            outcome = self._insert_advisory(title_init, intro_text_init, full_text_init, os_name_init,
+                                            adv_date_tz_init, connections, notify, timer, cves)
         except Exception as e:
-            print(f"Error writing to log file: {e}")
+            self.log_insert(title_init, os_name_init, adv_date_tz_init, 'failed', started, reason=str(e))
+            raise
+        self.log_insert(title_init, os_name_init, adv_date_tz_init, outcome, started, reason=self.last_reason)
+        timer.lap('log')
+        metrics.DB_ROUND_TRIPS.observe(self.round_trips)
+        if outcome == 'inserted':
+            get_search_index().add(title_init, intro_text_init, full_text_init, os_name_init, adv_date_tz_init,
+                                   self.last_article_ids.get(self.databases[0]))
+            timer.lap('search_index')
+            get_feed().append(feed_record(title_init, intro_text_init, os_name_init, adv_date_tz_init,
+                                          self.last_aliases.get(self.databases[0], ''),
+                                          extract_facets(title_init, full_text_init or ''), cves,
+                                          dict(self.last_article_ids)))
+            timer.lap('feed')
+            try:
+                lag = time.time() - parsedate_to_datetime(adv_date_tz_init).timestamp()
+                metrics.INSERT_LAG_SECONDS.observe(max(0.0, lag), distro=os_name_init.lower())
+            except Exception:
+                pass  # No usable Date header; the insert already fell back to now
+        return outcome
+
+    def log_insert(self, title, os_name, adv_date, outcome, started, reason=''):
+        """One ingest log record per insert attempt"""
+        record = {'title': title, 'distro': os_name.lower(), 'date': adv_date, 'outcome': outcome,
+                  'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                  'round_trips': self.round_trips}
+        if reason:
+            record['reason'] = reason
+        if self.last_article_ids:
+            record['articles'] = self.last_article_ids
+        get_ingest_log().write('insert', **record)
+
+    def find_title(self, cursor, title):
+        """(id, title) of a published article with this title, or None"""
+        cursor.execute("SELECT id, title FROM xu5gc_content WHERE title = %s AND state = 1", (title,))
+        return cursor.fetchone()
+
+    def _duplicate(self, existing, os_name, notify, cursor, connection, connections):
+        already_exists = f"{os_name} title already exists: {existing[0]}"
+        print(already_exists)
+        self.last_reason = already_exists
+        if notify:
+            self.send_failed(already_exists, os_name, already_exists, kind='duplicate_title')
+        cursor.close()
+        if not connections:
+            self.db_disconnect(connection)
+        return 'duplicate'
+
+    def write_article(self, cursor, dbname, catid, title, title_alias, intro_text, full_text, os_name,
+                      newdate, image_json, attribs_json, cves, notify=True, timer=NULL_TIMER):
+        """
+        Article, asset and workflow rows for a new title; run under the
+        category's insert lock. notify=False skips the failure mail when the
+        alias is taken, as for duplicates.
+        """
+        # Check if alias already exists and regenerate if needed
+        import time
+        max_attempts = 3
+        attempt = 0
+
+        while attempt < max_attempts:
+            check_alias_sql = "SELECT id, alias FROM xu5gc_content WHERE alias = %s AND state = 1"
+            cursor.execute(check_alias_sql, (title_alias,))
+            existing_alias = cursor.fetchone()
+            timer.lap('alias_check')
+
+            if not existing_alias:
+                break
+
+            attempt += 1
+            print(f"Alias already exists: {title_alias}, regenerating (attempt {attempt}/{max_attempts})...")
+            time.sleep(1)
+            timer.lap('alias_retry_sleep')
+            title_alias = self.clean_title_alias(title)
+            timer.lap('alias')
+
+        if existing_alias:
+            already_exists = f"{os_name} alias still exists after {max_attempts} attempts: {title_alias}"
+            print(already_exists)
+            self.last_reason = already_exists
+            if notify:
+                self.send_failed(already_exists, os_name, already_exists, kind='alias_exists')
+            return 'alias_exists'
+
+        # Set access level based on database
+        access = 1 if "lsv7j5beta" in dbname else 8
+
+        # Insert into content table
+        insert_sql = """
+        INSERT INTO xu5gc_content (
+            title, alias, introtext, `fulltext`, state, catid, created, created_by, 
+            created_by_alias, modified, modified_by, checked_out, checked_out_time, 
+            publish_up, publish_down, images, urls, attribs, version, ordering, 
+            metakey, metadesc, metadata, access, hits, language
+        ) VALUES (
+            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+        )
+        """
+
+        values = (
+            title, title_alias, intro_text, full_text, 1, catid, newdate, 62,
+            'LinuxSecurity.com Team', '0000-00-00 00:00:00', 0, 0, '0000-00-00 00:00:00',
+            newdate, None, json.dumps(image_json), '', json.dumps(attribs_json), 1, 1,
+            '', '', '{"robots":"","author":"","rights":"","xreference":""}', access, 1, '*'
+        )
+
+        print(f"inserting: {title}, {title_alias}, {newdate}")
+
+        cursor.execute(insert_sql, values)
+        article_id = cursor.lastrowid
+        self.last_article_ids[dbname] = article_id
+        self.last_aliases[dbname] = title_alias
+
+        # Handle assets table
+        # Get category asset ID
+        cursor.execute("SELECT id FROM xu5gc_assets WHERE name LIKE %s", (f"com_content.category.{catid}",))
+        parent_id = cursor.fetchone()[0]
+
+        # Get max lft value
+        cursor.execute("SELECT MAX(lft) FROM xu5gc_assets WHERE parent_id = %s", (parent_id,))
+        lft = cursor.fetchone()[0] + 2
+        rgt = lft + 1
+
+        # Insert asset
+        asset_sql = """
+        INSERT INTO xu5gc_assets (parent_id, level, name, title, rules, lft, rgt)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """
+        cursor.execute(asset_sql, (parent_id, 4, f"com_content.article.{article_id}", title, '{}', lft, rgt))
+        asset_id = cursor.lastrowid
+
+        # Update content with asset_id
+        cursor.execute("UPDATE xu5gc_content SET asset_id = %s WHERE id = %s", (asset_id, article_id))
+
+        # Insert workflow association
+        cursor.execute("INSERT INTO xu5gc_workflow_associations VALUES (%s, %s, %s)", 
+                     (article_id, 1, "com_content.article"))
+        store_cves(cursor, article_id, cves)
+        timer.lap('insert')
+        return 'inserted'
+
+    def _insert_advisory(self, title_init, intro_text_init, full_text_init, os_name_init, adv_date_tz_init,
+                         connections, notify, timer, cves):
+        timer.skip()
 
         if not full_text_init:
             error_msg = "Advisory fulltext is empty or null"
-            self.send_failed(title_init, os_name_init, error_msg)
-            try:
-                with open(db_file, 'a') as f:
-                    f.write(f"Fulltext {title_init} null\n")
-            except Exception as e:
-                print(f"Error writing to log file: {e}")
+            self.send_failed(title_init, os_name_init, error_msg, kind='fulltext_empty')
             raise ValueError("fulltext null")
 
-        databases = ["lsv7", "lsv7j5beta"]
-        
-        for dbname in databases:
+        for dbname in self.databases:
             # Reset values for each database
             title = title_init
             intro_text = intro_text_init
@@ -323,22 +500,17 @@ subject: {title}
             os_name = os_name_init
             adv_date_tz = adv_date_tz_init
 
-            connection = self.db_connect(dbname)
+            connection = connections[dbname] if connections else self.db_connect(dbname)
             if not connection:
                 error_msg = f"Failed to connect to MySQL database: {dbname}"
-                self.send_failed(title, os_name, error_msg)
-                try:
-                    with open(db_file, 'a') as f:
-                        f.write(f"Failed to connect to MySQL database {title_init} null\n")
-                except Exception as e:
-                    print(f"Error writing to log file: {e}")
+                self.send_failed(title, os_name, error_msg, kind='db_connect')
                 raise Exception("failed to connect to MySQL database")
 
-            cursor = connection.cursor()
+            cursor = _CountingCursor(connection.cursor(), self)
+            timer.lap('connect')
 
             # Clean title
             title = re.sub(r'security and bug fix (update)?', '', title, flags=re.IGNORECASE)
-            title_alias = self.clean_title_alias(title)
 
             # Parse date
             try:
@@ -375,104 +547,66 @@ subject: {title}
                 'helix_ultimate_image': images_info['distimage'],
             }
 
-            # Check if title already exists
-            check_sql = "SELECT id, title FROM xu5gc_content WHERE title = %s AND state = 1"
-            cursor.execute(check_sql, (title,))
-            existing = cursor.fetchone()
-            
-            if existing:
-                already_exists = f"{os_name} title already exists: {existing[0]}"
-                print(already_exists)
-                with open(db_file, 'a') as f:
-                    f.write(f"END {datestring} title already exists ----------------------------------------------------------------------\n")
-                self.send_failed(already_exists, os_name, already_exists)
-                cursor.close()
-                self.db_disconnect(connection)
-                return
-
-            # Check if alias already exists and regenerate if needed
-            import time
-            max_attempts = 3
-            attempt = 0
-            
-            while attempt < max_attempts:
-                check_alias_sql = "SELECT id, alias FROM xu5gc_content WHERE alias = %s AND state = 1"
-                cursor.execute(check_alias_sql, (title_alias,))
-                existing_alias = cursor.fetchone()
-                
-                if not existing_alias:
-                    break
-                
-                attempt += 1
-                print(f"Alias already exists: {title_alias}, regenerating (attempt {attempt}/{max_attempts})...")
-                time.sleep(1)
-                title_alias = self.clean_title_alias(title)
-            
-            if existing_alias:
-                already_exists = f"{os_name} alias still exists after {max_attempts} attempts: {title_alias}"
-                print(already_exists)
-                with open(db_file, 'a') as f:
-                    f.write(f"END {datestring} alias already exists after retries ----------------------------------------------------------------------\n")
-                self.send_failed(already_exists, os_name, already_exists)
-                cursor.close()
-                self.db_disconnect(connection)
-                return
-
-            # Set access level based on database
-            access = 1 if "lsv7j5beta" in dbname else 8
-
-            # Insert into content table
-            insert_sql = """
-            INSERT INTO xu5gc_content (
-                title, alias, introtext, `fulltext`, state, catid, created, created_by, 
-                created_by_alias, modified, modified_by, checked_out, checked_out_time, 
-                publish_up, publish_down, images, urls, attribs, version, ordering, 
-                metakey, metadesc, metadata, access, hits, language
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-            )
-            """
-
-            values = (
-                title, title_alias, intro_text, full_text, 1, catid, newdate, 62,
-                'LinuxSecurity.com Team', '0000-00-00 00:00:00', 0, 0, '0000-00-00 00:00:00',
-                newdate, None, json.dumps(image_json), '', json.dumps(attribs_json), 1, 1,
-                '', '', '{"robots":"","author":"","rights":"","xreference":""}', access, 1, '*'
-            )
-
-            print(f"inserting: {title}, {title_alias}, {newdate}")
-
-            cursor.execute(insert_sql, values)
-            article_id = cursor.lastrowid
+            timer.lap('prepare')
 
-            # Handle assets table
-            # Get category asset ID
-            cursor.execute("SELECT id FROM xu5gc_assets WHERE name LIKE %s", (f"com_content.category.{catid}",))
-            parent_id = cursor.fetchone()[0]
-
-            # Get max lft value
-            cursor.execute("SELECT MAX(lft) FROM xu5gc_assets WHERE parent_id = %s", (parent_id,))
-            lft = cursor.fetchone()[0] + 2
-            rgt = lft + 1
-
-            # Insert asset
-            asset_sql = """
-            INSERT INTO xu5gc_assets (parent_id, level, name, title, rules, lft, rgt)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """
-            cursor.execute(asset_sql, (parent_id, 4, f"com_content.article.{article_id}", title, '{}', lft, rgt))
-            asset_id = cursor.lastrowid
-
-            # Update content with asset_id
-            cursor.execute("UPDATE xu5gc_content SET asset_id = %s WHERE id = %s", (asset_id, article_id))
-
-            # Insert workflow association
-            cursor.execute("INSERT INTO xu5gc_workflow_associations VALUES (%s, %s, %s)", 
-                         (article_id, 1, "com_content.article"))
+            # Unlocked first pass, so duplicates never cost an AI call or a lock wait
+            existing = self.find_title(cursor, title)
+            timer.lap('duplicate_check')
+            if existing:
+                return self._duplicate(existing, os_name, notify, cursor, connection, connections)
 
+            # Alias is only generated once the title is known to be new, and before taking
+            # the lock so other inserts into this category don't wait on the model
+            title_alias = self.clean_title_alias(title)
+            timer.lap('alias')
+
+            # Checks, asset allocation and inserts must not interleave with another
+            # writer's for this category, on this host or any other
+            with insert_lock(_CountingCursor(connection.cursor(), self), dbname, catid):
+                timer.lap('lock_wait')
+                existing = self.find_title(cursor, title)
+                timer.lap('duplicate_check')
+                if not existing:
+                    outcome = self.write_article(cursor, dbname, catid, title, title_alias, intro_text, full_text,
+                                                 os_name, newdate, image_json, attribs_json, cves, notify, timer)
+
+            # Only once the lock is released, since closing the connection would drop it
+            if existing:
+                return self._duplicate(existing, os_name, notify, cursor, connection, connections)
             cursor.close()
-            self.db_disconnect(connection)
-
-        # Log completion
-        with open(db_file, 'a') as f:
-            f.write(f"END {datestring} -------------------------------------------------------------------------------------------\n")
\ No newline at end of file
+            if not connections:
+                self.db_disconnect(connection)
+            timer.lap('disconnect')
+            if outcome != 'inserted':
+                return outcome
+
+        return 'inserted'
+
+    def insert_advisories(self, advisories, notify=False):
+        """
+        Insert a batch of parsed advisories (ParsedAdvisory records) reusing one
+        connection per database. Returns one outcome per advisory; failures are
+        reported as 'failed' instead of aborting the batch.
+        """
+        connections = {}
+        try:
+            for dbname in self.databases:
+                connection = self.db_connect(dbname)
+                if not connection:
+                    raise Exception(f"failed to connect to MySQL database {dbname}")
+                connections[dbname] = connection
+
+            outcomes = []
+            for adv in advisories:
+                try:
+                    outcome = self.insert_advisory(adv['title'], adv['short_desc'], adv['body'],
+                                                   adv['distro'], adv['date'],
+                                                   connections=connections, notify=notify, cves=adv.get('cves'))
+                except Exception as e:
+                    print(f"Error inserting advisory {adv['title']}: {e}")
+                    outcome = 'failed'
+                outcomes.append(outcome)
+            return outcomes
+        finally:
+            for connection in connections.values():
+                self.db_disconnect(connection)
\ No newline at end of file
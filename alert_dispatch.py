@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Parse an advisory email with the matching parser spec and insert it.
+
+The distro is detected from the subject unless a spec name is forced, which is
+how the per-distro alert scripts reuse this entry point. Every message's stage
+timings are appended to the timing log (see timing.py).
+"""
+
+import sys
+import sqlite3
+from contextlib import nullcontext
+from datetime import datetime
+from advisory import Advisory
+from parser_engine import ParseError, SkipMessage, get_engine, read_input
+from parse_cache import get_parse_cache
+from timing import Profiler, StageTimer, write_record
+from dedup_cache import DedupCache, body_key, header_message_id, message_id_key
+from spool import Spool
+from scheduler import InsertScheduler
+from admission import EX_TEMPFAIL, admit
+from coalesce import COALESCE_WINDOW, CoalesceStore, group_key, release_due
+import metrics
+
+
+def print_usage(script_name):
+    """Print command line help"""
+    print(f"Usage: python {script_name} [--test] [--profile] [email_file]")
+    print("  --test: Run in test mode (don't insert into database)")
+    print("  --profile: Add a cProfile/tracemalloc summary to the timing record")
+    print("  email_file: Read email from file instead of stdin")
+    print("  Exits 75 (EX_TEMPFAIL) when the insert path is overloaded, so the MTA retries later")
+    print("")
+    print("Examples:")
+    print(f"  python {script_name} < email.eml")
+    print(f"  python {script_name} --test email.eml")
+    print(f"  cat email.eml | python {script_name} --test")
+
+
+def print_parsed(parsed):
+    """Show parsed content in test mode"""
+    print("\n" + "="*60)
+    print("PARSED EMAIL CONTENT (TEST MODE)")
+    print("="*60)
+    print(f"Parser Spec: {parsed['spec']}")
+    print(f"Original Subject: {parsed['subject']}")
+    print(f"Formatted Title: {parsed['title']}")
+    print(f"sent from: {parsed['from']}")
+    print(f"Date: {parsed['date']}")
+    print(f"Package Name: {parsed['package']}")
+    print(f"Advisory Number: {parsed['advisory_id']}")
+    print(f"Short Description ({len(parsed['short_desc'])} chars): {parsed['short_desc']}")
+    print("\nFull Advisory Content:")
+    print("-" * 40)
+    advisory = parsed['body']
+    print(advisory[:500] + "..." if len(advisory) > 500 else advisory)
+    print("="*60)
+    print("Test mode - no database insertion attempted")
+
+
+def log_timing(timer, script_name, outcome, buf, parsed=None, profiler=None):
+    """Write this message's stage timings (and profile summary) to the timing log"""
+    parsed = parsed or {}
+    record = {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'script': script_name,
+        'outcome': outcome,
+        'bytes': len(buf),
+        'spec': parsed.get('spec', ''),
+        'distro': parsed.get('distro', ''),
+        'title': parsed.get('title', ''),
+        'total_ms': round(timer.total() * 1000, 3),
+        'stages_ms': timer.stages_ms(),
+    }
+    if profiler:
+        record['profile'] = profiler.summary()
+    write_record(record)
+
+
+def record_metrics(timer, outcome, parsed):
+    """Count this message and its stage latencies, then update the textfile collector"""
+    metrics.MESSAGES.inc(distro=(parsed or {}).get('distro', ''), outcome=outcome)
+    for stage, seconds in timer.stages.items():
+        metrics.STAGE_SECONDS.observe(seconds, stage=stage)
+    metrics.write_textfile()
+
+
+def run(argv, spec_name=None, script_name='alert_dispatch.py'):
+    """Read, parse and insert one advisory email"""
+    argv = list(argv)
+
+    if '--help' in argv or '-h' in argv:
+        print_usage(script_name)
+        sys.exit(0)
+
+    test_mode = '--test' in argv
+    if test_mode:
+        argv.remove('--test')
+    profile = '--profile' in argv
+    if profile:
+        argv.remove('--profile')
+
+    timer = StageTimer()
+    buf = read_input(argv[1] if len(argv) > 1 else None)
+    timer.lap('read')
+
+    # Defer to the MTA's queue rather than start work the insert path can't finish
+    reason = None if test_mode else admit()
+    timer.lap('admission')
+    if reason:
+        print(f"Deferring message ({reason}), exiting with EX_TEMPFAIL")
+        log_timing(timer, script_name, 'deferred', buf)
+        record_metrics(timer, 'deferred', None)
+        sys.exit(EX_TEMPFAIL)
+
+    with (Profiler() if profile else nullcontext()) as profiler:
+        outcome, parsed, exit_code = process(buf, spec_name, test_mode, timer)
+    log_timing(timer, script_name, outcome, buf, parsed, profiler)
+    record_metrics(timer, outcome, parsed)
+    if exit_code is not None:
+        sys.exit(exit_code)
+
+
+def process(buf, spec_name, test_mode, timer):
+    """Parse and insert one message; returns (outcome, parsed, exit code or None)"""
+    dedup = None if test_mode else DedupCache()
+    mid_key = message_id_key(header_message_id(buf))
+    hit = dedup.seen(mid_key) if dedup else None
+    timer.lap('dedup')
+    if hit:
+        print(f"Already ingested, skipping: Message-ID {mid_key[4:]}")
+        return 'dedup', None, 0
+
+    engine = get_engine()
+    timer.lap('compile')
+    try:
+        parsed = engine.parse(buf, spec_name, timer, cache=get_parse_cache())
+    except SkipMessage as e:
+        print(e)
+        return 'skipped', None, 0
+    except ParseError as e:
+        print(f"Failed to parse: {e.reason}: {e.subject}")
+        Advisory().send_failed(e.subject, e.file_type, e.reason, kind=e.kind)
+        return e.kind, {'distro': e.file_type.lower()}, e.exit_code
+
+    print(f"subject: |{parsed['title']}|")
+    print(f"date: |{parsed['date']}|")
+    print(f"shortdesc: |{parsed['short_desc']}|")
+
+    if test_mode:
+        print_parsed(parsed)
+        return 'test', parsed, None
+
+    # Cross-posts carry the same advisory under a different Message-ID
+    keys = [mid_key, body_key(parsed['body'])]
+    hit = dedup.seen(keys[1])
+    timer.lap('dedup')
+    if hit:
+        print(f"Already ingested as {hit[1]!r}, skipping: {parsed['title']}")
+        dedup.add(keys, hit[1])
+        return 'dedup', parsed, 0
+
+    # Per-release announcements of one build wait to be merged (see coalesce.py)
+    rule = engine.by_name[parsed['spec']].coalesce
+    group = group_key(parsed, rule) if rule and COALESCE_WINDOW > 0 else None
+    if group:
+        store = CoalesceStore()
+        try:
+            store.hold(group, parsed, keys)
+        except sqlite3.Error as e:
+            # Insert it on its own below rather than fail the delivery
+            print(f"Error holding advisory for coalescing: {e}")
+            group = None
+        timer.lap('coalesce')
+    if group:
+        print(f"Held for coalescing: {group}")
+        try:
+            release_due(store)
+        except (sqlite3.Error, OSError) as e:
+            # This advisory is held; cron's `coalesce.py --release` or the next message releases it
+            print(f"Error releasing coalesced groups: {e}")
+        return 'held', parsed, 0
+
+    # Spool first so a database outage or crash can't lose the parsed advisory
+    spool = Spool()
+    try:
+        spool_id = spool.append({'title': parsed['title'], 'short_desc': parsed['short_desc'],
+                                 'body': parsed['body'], 'distro': parsed['distro'], 'date': parsed['date'],
+                                 'message_id': parsed['message_id'], 'severity': parsed['severity'],
+                                 'cves': parsed['cves'], 'dedup_keys': keys})
+    except OSError as e:
+        print(f"Error spooling advisory: {e}")
+        spool_id = None
+    timer.lap('spool')
+
+    # Insert advisory into database (production mode)
+    scheduler = InsertScheduler()
+    try:
+        advisory_handler = Advisory()
+        # Higher severity inserts go first, and no distro can hog the slots
+        with scheduler.slot(parsed['severity'], parsed['distro']):
+            timer.lap('queue')
+            outcome = advisory_handler.insert_advisory(parsed['title'], parsed['short_desc'], parsed['body'],
+                                                       parsed['distro'], parsed['date'], timer=timer,
+                                                       cves=parsed['cves'])
+        print(f"Successfully inserted: {parsed['title']}")
+        if spool_id:
+            try:
+                spool.ack(spool_id, outcome)
+            except OSError as e:
+                # Left pending, replay will find the title already present
+                print(f"Error acknowledging spool entry {spool_id}: {e}")
+        if outcome in ['inserted', 'duplicate']:
+            dedup.add(keys, parsed['title'])
+        return outcome, parsed, None
+    except Exception as e:
+        error_msg = f"Database insertion error: {str(e)}"
+        print(f"Error inserting advisory: {e}")
+        if spool_id:
+            # The replay worker will insert it; exit cleanly so the MTA doesn't re-deliver
+            error_msg += f" (spooled as {spool_id} for replay)"
+        advisory_handler = Advisory()
+        # Without a spool entry the advisory is lost, so don't wait for a digest
+        advisory_handler.send_failed(parsed['title'], parsed['distro'], error_msg,
+                                     kind='insert_error', critical=not spool_id)
+        if spool_id:
+            return 'spooled', parsed, 0
+        return 'insert_error', parsed, 1
+
+
+def main():
+    run(sys.argv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Checkpointed introtext backfill for every category with a parser spec.
+
+Rows with a missing introtext are streamed per database by keyset on id,
+their stored fulltext is reparsed with the short description rules of the
+category's parser spec on a process pool, and each chunk is updated with one
+executemany. The last id committed per database is saved to a checkpoint
+file so an interrupted run resumes where it stopped. Writes go through a
+shared RateController so a repair can run next to live traffic.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from advisory import Advisory
+from parser_engine import ParseError, get_engine
+from throttle import PAUSE_FILE, RateController
+
+CHECKPOINT_FILE = '/home/alerts/scripts_linstage/backfill-checkpoint.json'
+
+HTML_STRIP_RE = re.compile(r'<[^>]+>|&lt;|&gt;|&amp;')
+HTML_ENTITIES = {'&lt;': '<', '&gt;': '>', '&amp;': '&'}
+
+
+def strip_html(fulltext):
+    """Remove tags and decode &lt; &gt; &amp; in a single pass"""
+    return HTML_STRIP_RE.sub(lambda m: HTML_ENTITIES.get(m.group(0), ''), fulltext)
+
+
+@lru_cache(maxsize=1)
+def category_specs():
+    """Map catid to parser spec for every spec whose distro has its own category"""
+    advisory_handler = Advisory()
+    specs = {}
+    for spec in get_engine().specs:
+        catid = advisory_handler.category_map.get(spec.distro)
+        if catid is not None:
+            specs[catid] = spec
+    return specs
+
+
+def reparse_row(row):
+    """Pool worker: (id, catid, fulltext) -> (id, new introtext or '')"""
+    record_id, catid, fulltext = row
+    spec = category_specs()[catid]
+    try:
+        introtext = spec.build_short_desc(strip_html(fulltext), stored=True)
+    except ParseError:
+        return record_id, ''
+    # The spec default means no real description was found
+    if introtext == spec.short_default:
+        return record_id, ''
+    return record_id, introtext
+
+
+class Checkpoint:
+    """Last id processed per backfill key, persisted as JSON"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, 'r') as f:
+                self.positions = json.load(f)
+        except (OSError, ValueError):
+            self.positions = {}
+
+    def get(self, key):
+        with self.lock:
+            return self.positions.get(key)
+
+    def set(self, key, last_id):
+        """Record progress (None clears it) and write the file atomically"""
+        with self.lock:
+            if last_id is None:
+                self.positions.pop(key, None)
+            else:
+                self.positions[key] = last_id
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.positions, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+def iter_missing_introtext(connection, catids, chunk_size=500, limit=None, specific_ids=None, start_id=None):
+    """
+    Yield chunks of (id, catid, title, introtext, fulltext, created) rows with
+    missing introtext, newest first. Pages are fetched by keyset on id through
+    an unbuffered cursor, so only one chunk is held in memory at a time.
+    """
+    cursor = connection.cursor(buffered=False)
+    last_id = start_id
+    remaining = limit
+
+    try:
+        while remaining is None or remaining > 0:
+            page_size = chunk_size if remaining is None else min(chunk_size, remaining)
+            conditions = [f"catid IN ({','.join(['%s'] * len(catids))})"]
+            params = list(catids)
+            if last_id is not None:
+                conditions.append("id < %s")
+                params.append(last_id)
+            if specific_ids:
+                conditions.append(f"id IN ({','.join(['%s'] * len(specific_ids))})")
+                params.extend(specific_ids)
+
+            query = f"""
+            SELECT id, catid, title, introtext, `fulltext`, created
+            FROM xu5gc_content
+            WHERE (introtext IS NULL OR introtext = '' OR TRIM(introtext) = '')
+            AND `fulltext` IS NOT NULL
+            AND `fulltext` != ''
+            {''.join(' AND ' + c for c in conditions)}
+            ORDER BY id DESC
+            LIMIT {int(page_size)}
+            """
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            yield rows
+            last_id = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < page_size:
+                break
+    finally:
+        cursor.close()
+
+
+def backfill_database(dbname, catids, pool, checkpoint=None, test_mode=False, limit=None,
+                      specific_ids=None, chunk_size=500, throttle=None):
+    """
+    Backfill one database. Chunks from the streaming reader are reparsed on the
+    process pool while the next chunk is fetched; the calling thread is the
+    only writer for this database. Returns (scanned, updated).
+    """
+    advisory_handler = Advisory()
+    print(f"\nProcessing database: {dbname}")
+
+    connection = advisory_handler.db_connect(dbname)
+    if not connection:
+        print(f"Failed to connect to database {dbname}")
+        return 0, 0
+
+    connection.autocommit = False
+    write_cursor = connection.cursor()
+    update_query = "UPDATE xu5gc_content SET introtext = %s WHERE id = %s"
+
+    # --ids and --test runs neither resume from nor move the checkpoint
+    checkpoint_key = f"{dbname}:{','.join(map(str, sorted(catids)))}"
+    if specific_ids or test_mode:
+        checkpoint = None
+    start_id = checkpoint.get(checkpoint_key) if checkpoint else None
+    if start_id:
+        print(f"{dbname}: resuming below id {start_id}")
+
+    verbose = test_mode or bool(specific_ids)
+    scanned_count = 0
+    updated_count = 0
+    found_ids = []
+    exhausted = False
+    start = time.perf_counter()
+
+    def apply_chunk(rows, results):
+        nonlocal scanned_count, updated_count
+        if pool:
+            results = results.get()
+        if throttle:
+            throttle.acquire(len(rows))
+        updates = []
+        for (record_id, catid, title, current_introtext, fulltext, created), (_, new_introtext) in zip(rows, results):
+            found_ids.append(str(record_id))
+            if not new_introtext:
+                print(f"\nID: {record_id} - No introtext pattern found in: {title}")
+                continue
+
+            if verbose:
+                print(f"\nID: {record_id}")
+                print(f"Title: {title}")
+                print(f"Created: {created}")
+                print(f"Current introtext: '{current_introtext}'")
+                print(f"New introtext: '{new_introtext}'")
+            updates.append((new_introtext, record_id))
+
+        if updates and not test_mode:
+            write_start = time.perf_counter()
+            write_cursor.executemany(update_query, updates)
+            connection.commit()
+            if throttle:
+                throttle.record(time.perf_counter() - write_start, len(updates))
+        if checkpoint:
+            checkpoint.set(checkpoint_key, rows[-1][0])
+
+        scanned_count += len(rows)
+        updated_count += len(updates)
+        elapsed = time.perf_counter() - start
+        rate = scanned_count / elapsed if elapsed > 0 else 0
+        print(f"{dbname}: scanned {scanned_count} rows, "
+              f"{'would update' if test_mode else 'updated'} {updated_count} "
+              f"({rate:.1f} rows/sec)")
+
+    try:
+        pending = None
+        for rows in iter_missing_introtext(connection, catids, chunk_size, limit, specific_ids, start_id):
+            tasks = [(row[0], row[1], row[4]) for row in rows]
+            if pool:
+                # Reparse in the background so the next page is fetched meanwhile
+                results = pool.map_async(reparse_row, tasks, chunksize=max(1, len(tasks) // 32))
+            else:
+                results = list(map(reparse_row, tasks))
+            if pending:
+                apply_chunk(*pending)
+            pending = (rows, results)
+        if pending:
+            apply_chunk(*pending)
+        exhausted = limit is None or scanned_count < limit
+    except Exception as e:
+        connection.rollback()
+        print(f"Error updating {dbname}: {e}")
+    finally:
+        write_cursor.close()
+        advisory_handler.db_disconnect(connection)
+
+    # A completed pass starts from the newest rows again next time
+    if checkpoint and exhausted:
+        checkpoint.set(checkpoint_key, None)
+
+    if specific_ids:
+        missing_ids = [str(id) for id in specific_ids if str(id) not in found_ids]
+        if found_ids:
+            print(f"Found {len(found_ids)} records with IDs: {', '.join(found_ids)}")
+        if missing_ids:
+            print(f"Missing or invalid IDs (or records don't meet criteria): {', '.join(missing_ids)}")
+
+    print(f"\nDatabase {dbname}: {'Would update' if test_mode else 'Updated'} {updated_count} records")
+    return scanned_count, updated_count
+
+
+def run_backfill(catids, test_mode=False, limit=None, specific_ids=None, chunk_size=500, jobs=1,
+                 restart=False, max_rate=None):
+    """
+    Backfill the given categories in every database concurrently. max_rate
+    caps rows/second (default THROTTLE_MAX_RATE); 0 disables throttling.
+    """
+    advisory_handler = Advisory()
+    specs = category_specs()
+    unknown = [catid for catid in catids if catid not in specs]
+    if unknown:
+        print(f"Error: no parser spec for catid {', '.join(map(str, unknown))}")
+        sys.exit(1)
+
+    checkpoint = Checkpoint(os.getenv('BACKFILL_CHECKPOINT', CHECKPOINT_FILE))
+    if restart:
+        for dbname in advisory_handler.databases:
+            checkpoint.set(f"{dbname}:{','.join(map(str, sorted(catids)))}", None)
+
+    throttle = None
+    if max_rate != 0:
+        # Both databases live on the same server, so they share one rate
+        throttle = RateController(max_rate, connect=lambda: advisory_handler.db_connect(advisory_handler.databases[0]))
+
+    pool = multiprocessing.Pool(jobs) if jobs > 1 else None
+    start = time.perf_counter()
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(advisory_handler.databases)) as executor:
+            futures = [executor.submit(backfill_database, dbname, catids, pool, checkpoint, test_mode,
+                                       limit, specific_ids, chunk_size, throttle)
+                       for dbname in advisory_handler.databases]
+            totals = [future.result() for future in futures]
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        if throttle:
+            throttle.close()
+
+    elapsed = time.perf_counter() - start
+    scanned = sum(t[0] for t in totals)
+    rate = scanned / elapsed if elapsed > 0 else 0
+    print(f"\nScanned {scanned} rows in {elapsed:.2f}s ({rate:.1f} rows/sec, {jobs} jobs)")
+
+
+def print_usage():
+    """Print command line help"""
+    print("Usage: python backfill.py [--catid N,N] [--test] [--limit N] [--ids N,N,N] [--jobs N] [--restart]")
+    print("                          [--max-rate N]")
+    print("  --catid N,N: Categories to backfill (default: all with a parser spec:")
+    print("               87 Debian, 89 Fedora, 203 Mageia, 202 openSUSE, ...)")
+    print("  --test: Run in test mode (don't actually update)")
+    print("  --limit N: Process at most N records per database; the next run continues")
+    print("  --ids N,N,N: Update specific record IDs (ignores the checkpoint)")
+    print("  --jobs N: Reparse with N processes (default: CPU count)")
+    print("  --restart: Discard the saved checkpoint and start from the newest rows")
+    print("  --max-rate N: Cap rows/second (adapts down under load; 0 disables)")
+    print(f"  Touch {os.getenv('THROTTLE_PAUSE_FILE', PAUSE_FILE)} to pause, remove it to resume")
+
+
+def main():
+    catids = None
+    test_mode = False
+    restart = False
+    limit = None
+    specific_ids = None
+    jobs = os.cpu_count() or 1
+    max_rate = None
+
+    args = sys.argv[1:]
+    while args:
+        arg = args.pop(0)
+        name, _, value = arg.partition('=')
+        if name in ['--catid', '--limit', '--ids', '--jobs', '--max-rate'] and not value:
+            if not args:
+                print(f"Error: {name} requires a value")
+                sys.exit(1)
+            value = args.pop(0)
+        if name == '--catid':
+            catids = [int(x.strip()) for x in value.split(',')]
+        elif name == '--limit':
+            limit = int(value)
+        elif name == '--ids':
+            specific_ids = [int(x.strip()) for x in value.split(',')]
+        elif name == '--jobs':
+            jobs = max(1, int(value))
+        elif name == '--max-rate':
+            max_rate = float(value)
+        elif arg == '--test':
+            test_mode = True
+        elif arg == '--restart':
+            restart = True
+        elif arg in ['--help', '-h']:
+            print_usage()
+            sys.exit(0)
+        else:
+            print(f"Error: unknown option {arg}")
+            sys.exit(1)
+
+    if catids is None:
+        catids = sorted(category_specs())
+
+    if test_mode:
+        print("Running in TEST MODE - no actual updates will be made")
+
+    run_backfill(catids, test_mode, limit, specific_ids, jobs=jobs, restart=restart, max_rate=max_rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Synthetic, offline advisory corpus for parser benchmarks.
+
+Messages are generated deterministically from a seed and follow the layout
+of real Debian DSA, Fedora, Mageia MGASA/MGAA and SUSE/openSUSE
+announcements. Each distro comes in small, medium and multi-MB "kernel"
+sizes, as plain text, base64 encoded and multipart/signed variants.
+"""
+
+import random
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.charset import Charset, BASE64, QP
+
+PACKAGES = ['curl', 'openssl', 'thunderbird', 'chromium', 'libssh', 'nginx', 'python3.12',
+            'postgresql-16', 'ghostscript', 'xorg-server', 'webkit2gtk', 'sudo', 'glibc']
+
+WORDS = ('a remote attacker could exploit a flaw in the handling of crafted input to cause '
+         'a denial of service or possibly execute arbitrary code with the privileges of the '
+         'user running the application when processing malformed requests or files').split()
+
+# Number of CVE paragraphs per size; "kernel" produces a multi-MB body
+SIZES = {'small': 2, 'medium': 60, 'kernel': 6000}
+
+DATE = 'Mon, 17 Nov 2025 20:05:12 +0000'
+
+
+def sentence(rng, words=18):
+    """A random advisory-ish sentence"""
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def cve_paragraphs(rng, count):
+    """count CVE entries with wrapped descriptions"""
+    lines = []
+    for _ in range(count):
+        lines.append(f"CVE-{rng.randint(2020, 2025)}-{rng.randint(1000, 99999)}")
+        lines.append("")
+        text = ' '.join(sentence(rng) for _ in range(3))
+        while text:
+            lines.append("    " + text[:68])
+            text = text[68:]
+        lines.append("")
+    return '\n'.join(lines)
+
+
+def debian_message(rng, size):
+    pkg = 'linux' if size == 'kernel' else rng.choice(PACKAGES)
+    num = rng.randint(5000, 6500)
+    subject = f"[SECURITY] [DSA {num}-1] {pkg} security update"
+    body = f"""-----BEGIN PGP SIGNED MESSAGE-----
+Hash: SHA512
+
+- -------------------------------------------------------------------------
+Debian Security Advisory DSA-{num}-1                   security@debian.org
+https://www.debian.org/security/                       Moritz Muehlenhoff
+November 17, 2025                     https://www.debian.org/security/faq
+- -------------------------------------------------------------------------
+
+Package        : {pkg}
+CVE ID         : CVE-2025-{rng.randint(1000, 9999)}
+
+{sentence(rng)}
+{sentence(rng)}
+
+{cve_paragraphs(rng, SIZES[size])}
+For the stable distribution (trixie), these problems have been fixed in
+version 1.2.3-1~deb13u1.
+
+We recommend that you upgrade your {pkg} packages.
+-----BEGIN PGP SIGNATURE-----
+
+iQIzBAEBCgAdFiEEtuYvPRKsOElcDakFEMKTtsN8TjYFAmkbgc0ACgkQEMKTtsN8
+-----END PGP SIGNATURE-----
+"""
+    return subject, body
+
+
+def fedora_message(rng, size):
+    pkg = 'kernel' if size == 'kernel' else rng.choice(PACKAGES)
+    version = rng.choice([41, 42, 43])
+    subject = f"[SECURITY] Fedora {version} Update: {pkg}-6.1.{rng.randint(1, 99)}-1.fc{version}"
+    rule = '-' * 80
+    body = f"""{rule}
+Fedora Update Notification
+FEDORA-2025-{rng.getrandbits(40):010x}
+2025-11-17 20:00:00.000000
+{rule}
+
+Name        : {pkg}
+Product     : Fedora {version}
+Version     : 6.1.{rng.randint(1, 99)}
+Release     : 1.fc{version}
+URL         : https://example.org/{pkg}
+Summary     : {pkg} package
+Description :
+{sentence(rng)}
+
+{rule}
+Update Information:
+
+{sentence(rng)}
+{sentence(rng)}
+{rule}
+ChangeLog:
+
+{cve_paragraphs(rng, SIZES[size])}
+{rule}
+
+This update can be installed with the "dnf" update program.
+{rule}
+"""
+    return subject, body
+
+
+def mageia_message(rng, size):
+    pkg = 'kernel' if size == 'kernel' else rng.choice(PACKAGES)
+    kind = rng.choice(['MGASA', 'MGAA'])
+    num = f"2025-{rng.randint(1, 400):04d}"
+    if kind == 'MGASA':
+        subject = f"{kind}-{num}: Updated {pkg} packages fix security vulnerabilities"
+    else:
+        subject = f"{kind}-{num}: Updated {pkg} packages fix bugs"
+    body = f"""
+{kind}-{num} - Updated {pkg} packages fix security vulnerabilities
+
+Publication date: 17 Nov 2025
+URL: https://advisories.mageia.org/{kind}-{num}.html
+Type: security
+Affected Mageia releases: 9
+
+Description:
+{cve_paragraphs(rng, SIZES[size])}
+References:
+ - https://bugs.mageia.org/show_bug.cgi?id={rng.randint(30000, 35000)}
+"""
+    return subject, body
+
+
+def suse_message(rng, size):
+    pkg = 'the Linux Kernel' if size == 'kernel' else rng.choice(PACKAGES)
+    num = f"2025:{rng.randint(1000, 4000)}-1"
+    prefix = rng.choice(['SUSE-SU', 'openSUSE-SU'])
+    subject = f"{prefix}-{num}: important: Security update for {pkg}"
+    products = '\n'.join(f"* SUSE Linux Enterprise Server 15 SP{i}" for i in range(3, 8))
+    body = f"""# Security update for {pkg}
+
+Announcement ID: {prefix}-{num}
+Release Date: 2025-11-17T20:00:00Z
+Rating: important
+References:
+
+* bsc#{rng.randint(1200000, 1250000)}
+
+Affected Products:
+
+{products}
+* openSUSE Leap 15.6
+
+An update that solves {SIZES[size]} vulnerabilities and has {rng.randint(1, 9)} security fixes
+can now be installed.
+
+## Description:
+
+{cve_paragraphs(rng, SIZES[size])}
+## Patch Instructions:
+
+To install this SUSE update use the SUSE recommended installation methods.
+"""
+    return subject, body
+
+
+GENERATORS = {
+    'debian': debian_message,
+    'fedora': fedora_message,
+    'mageia': mageia_message,
+    'opensuse': suse_message,
+}
+
+ENCODINGS = ['plain', 'base64', 'signed']
+
+
+def build_message(subject, body, encoding, boundary=None):
+    """Wrap a body as a plain, base64 or multipart/signed email string"""
+    if encoding == 'plain':
+        msg = MIMEText(body, 'plain', 'us-ascii')
+    else:
+        charset = Charset('utf-8')
+        charset.body_encoding = BASE64 if encoding == 'base64' else QP
+        text = MIMEText(body, 'plain', charset)
+        if encoding == 'base64':
+            msg = text
+        else:
+            msg = MIMEMultipart('signed', boundary, micalg='pgp-sha512', protocol='application/pgp-signature')
+            msg.attach(text)
+            signature = MIMEApplication(b'-----BEGIN PGP SIGNATURE-----\n\n-----END PGP SIGNATURE-----\n',
+                                        'pgp-signature', name='signature.asc')
+            msg.attach(signature)
+    msg['Subject'] = subject
+    msg['From'] = 'security@example.org'
+    msg['Date'] = DATE
+    return msg.as_string()
+
+
+def generate_corpus(seed=1234, sizes=None, distros=None):
+    """Return a list of (spec name, variant, raw email) tuples"""
+    rng = random.Random(seed)
+    corpus = []
+    for distro in distros or GENERATORS:
+        for size in sizes or SIZES:
+            for encoding in ENCODINGS:
+                subject, body = GENERATORS[distro](rng, size)
+                # Fixed boundaries keep the corpus byte-for-byte reproducible
+                boundary = "===============%019d==" % rng.getrandbits(60)
+                corpus.append((distro, f"{size}-{encoding}", build_message(subject, body, encoding, boundary)))
+    return corpus
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Per-message parser benchmark over the synthetic corpus in bench_corpus.py.
+
+Each corpus message is parsed in-process through the spec engine with every
+stage timed separately (MIME parse, spec detection, subject match, payload
+decode, body extraction, short description and field extraction), followed
+by one tracemalloc run for peak memory. Results can be saved as a baseline
+and later runs fail when throughput drops or peak memory grows by more than
+the threshold.
+"""
+
+import os
+import sys
+import json
+import time
+import tracemalloc
+from parser_engine import get_engine
+from timing import StageTimer
+import bench_corpus
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+STAGES = ['mime', 'detect', 'subject', 'decode', 'body', 'short_desc', 'fields']
+
+
+def print_usage():
+    """Print command line help"""
+    print("Usage: python bench_parsers.py [options]")
+    print("  --distro NAME: Only benchmark this distro (repeatable)")
+    print("  --size NAME: Only benchmark this size: small, medium, kernel (repeatable)")
+    print("  --min-time SECONDS: Minimum timing per message (default: 0.5)")
+    print("  --threshold FRACTION: Allowed regression against the baseline (default: 0.25)")
+    print("  --baseline FILE: Baseline file (default: bench_baseline.json)")
+    print("  --save-baseline: Write this run's results as the new baseline")
+    print("  --json FILE: Also write this run's results to FILE")
+
+
+def bench_message(engine, raw, min_time):
+    """Time repeated parses of one message and measure its peak memory"""
+    timer = StageTimer()
+    iterations = 0
+    start = time.perf_counter()
+    while True:
+        timer.skip()
+        engine.parse(raw, timer=timer)
+        iterations += 1
+        if time.perf_counter() - start >= min_time:
+            break
+    elapsed = time.perf_counter() - start
+
+    # Separate run: tracemalloc slows allocation-heavy stages too much to time under it
+    tracemalloc.start()
+    engine.parse(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'bytes': len(raw),
+        'iterations': iterations,
+        'msgs_per_sec': iterations / elapsed,
+        'stages_ms': {stage: timer.stages.get(stage, 0.0) / iterations * 1000 for stage in STAGES},
+        'peak_kb': peak / 1024,
+    }
+
+
+def run_benchmark(corpus, min_time=0.5):
+    """Benchmark every (spec, variant, raw) in corpus, keyed 'spec/variant'"""
+    engine = get_engine()
+    results = {}
+    for spec_name, variant, raw in corpus:
+        parsed = engine.parse(raw)
+        if parsed['spec'] != spec_name:
+            raise RuntimeError(f"{spec_name}/{variant} was parsed by the {parsed['spec']} spec")
+        results[f"{spec_name}/{variant}"] = bench_message(engine, raw, min_time)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return a list of regression messages against baseline results"""
+    regressions = []
+    for key, result in sorted(results.items()):
+        base = baseline.get(key)
+        if not base:
+            continue
+        if result['msgs_per_sec'] < base['msgs_per_sec'] * (1 - threshold):
+            regressions.append(f"{key}: {result['msgs_per_sec']:.1f} msgs/sec, "
+                               f"baseline {base['msgs_per_sec']:.1f}")
+        if result['peak_kb'] > base['peak_kb'] * (1 + threshold):
+            regressions.append(f"{key}: peak {result['peak_kb']:.0f} KiB, "
+                               f"baseline {base['peak_kb']:.0f} KiB")
+    return regressions
+
+
+def print_results(results):
+    """Print one row per message with per-stage milliseconds"""
+    print(f"{'message':<26} {'size':>9} {'msgs/sec':>10} {'peak KiB':>9}  "
+          + ' '.join(f"{stage:>10}" for stage in STAGES))
+    for key, result in results.items():
+        stages = ' '.join(f"{result['stages_ms'][stage]:>10.3f}" for stage in STAGES)
+        print(f"{key:<26} {result['bytes']:>9} {result['msgs_per_sec']:>10.1f} "
+              f"{result['peak_kb']:>9.0f}  {stages}")
+
+
+def load_baseline(path):
+    """Load a baseline file, or an empty dict if there isn't one"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_results(path, results):
+    """Write results as JSON, atomically"""
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def main():
+    distros, sizes = [], []
+    min_time = 0.5
+    threshold = 0.25
+    baseline_file = BASELINE_FILE
+    save_baseline = False
+    json_file = None
+
+    args = list(sys.argv[1:])
+    while args:
+        arg = args.pop(0)
+        if arg in ['--help', '-h']:
+            print_usage()
+            sys.exit(0)
+        if arg == '--save-baseline':
+            save_baseline = True
+            continue
+        name, _, value = arg[2:].partition('=')
+        if not arg.startswith('--') or name not in ['distro', 'size', 'min-time', 'threshold', 'baseline', 'json']:
+            print(f"Error: unknown option {arg}")
+            sys.exit(1)
+        if not value:
+            if not args:
+                print(f"Error: --{name} requires a value")
+                sys.exit(1)
+            value = args.pop(0)
+        try:
+            if name == 'distro':
+                distros.append(value)
+            elif name == 'size':
+                sizes.append(value)
+            elif name == 'min-time':
+                min_time = float(value)
+            elif name == 'threshold':
+                threshold = float(value)
+            elif name == 'baseline':
+                baseline_file = value
+            else:
+                json_file = value
+        except ValueError:
+            print(f"Error: invalid value for --{name}: {value}")
+            sys.exit(1)
+
+    unknown = [d for d in distros if d not in bench_corpus.GENERATORS] + \
+              [s for s in sizes if s not in bench_corpus.SIZES]
+    if unknown:
+        print(f"Error: unknown distro or size: {', '.join(unknown)}")
+        sys.exit(1)
+
+    corpus = bench_corpus.generate_corpus(sizes=sizes, distros=distros)
+    results = run_benchmark(corpus, min_time)
+    print_results(results)
+
+    if json_file:
+        save_results(json_file, results)
+    if save_baseline:
+        # Merge so a partial run only replaces the entries it measured
+        baseline = load_baseline(baseline_file)
+        baseline.update(results)
+        save_results(baseline_file, baseline)
+        print(f"Baseline saved to {baseline_file}")
+        return
+
+    baseline = load_baseline(baseline_file)
+    if not baseline:
+        print(f"No baseline at {baseline_file}; run with --save-baseline to create one")
+        return
+    regressions = compare(results, baseline, threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {threshold:.0%} against {baseline_file}")
+
+
+if __name__ == "__main__":
+    main()
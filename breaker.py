@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Circuit breakers for the database and the AI alias service, shared by every
+alert script through a small JSON state file per breaker.
+
+A breaker opens after `threshold` consecutive failures and stays open for
+`cooldown` seconds. After that it is half-open: calls are let through
+again, a success closes the breaker and a failure opens it for another
+cooldown. Advisory skips the AI call while the AI breaker is open, and the
+admission check sheds new mail while either breaker is open.
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+
+BREAKER_DIR = os.getenv('BREAKER_DIR', '/home/alerts/scripts_linstage/breakers')
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker; an empty directory keeps the state in memory"""
+
+    def __init__(self, name, threshold, cooldown, directory=BREAKER_DIR):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.path = os.path.join(directory, f"{name}.json") if directory else None
+        self.memory = {'failures': 0, 'opened_at': 0.0}
+
+    def load(self):
+        if not self.path:
+            return dict(self.memory)
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'failures': 0, 'opened_at': 0.0}
+
+    def save(self, state):
+        if not self.path:
+            self.memory = dict(state)
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Error saving {self.name} breaker state: {e}")
+
+    def state(self, now=None):
+        """'closed', 'open' or 'half_open'"""
+        state = self.load()
+        if state['failures'] < self.threshold:
+            return 'closed'
+        if (now or time.time()) - state['opened_at'] < self.cooldown:
+            return 'open'
+        return 'half_open'
+
+    def allow(self):
+        return self.state() != 'open'
+
+    def success(self):
+        # The common case is already closed; don't rewrite the file for it
+        if self.load()['failures']:
+            self.save({'failures': 0, 'opened_at': 0.0})
+
+    def failure(self):
+        if not self.path:
+            self._failure()
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + '.lock', 'w') as lock:
+                # Concurrent scripts failing together must all be counted
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self._failure()
+        except OSError as e:
+            print(f"Error updating {self.name} breaker: {e}")
+
+    def _failure(self):
+        state = self.load()
+        state['failures'] += 1
+        if state['failures'] >= self.threshold:
+            if state['failures'] == self.threshold:
+                print(f"{self.name} breaker opened after {self.threshold} consecutive failures")
+            state['opened_at'] = time.time()
+        self.save(state)
+
+
+class NullBreaker:
+    """Breaker that is always closed, for injected clients"""
+
+    def state(self, now=None):
+        return 'closed'
+
+    def allow(self):
+        return True
+
+    def success(self):
+        pass
+
+    def failure(self):
+        pass
+
+
+AI = CircuitBreaker('openai', int(os.getenv('AI_BREAKER_FAILURES', 5)),
+                    float(os.getenv('AI_BREAKER_COOLDOWN', 300)))
+DB = CircuitBreaker('mysql', int(os.getenv('DB_BREAKER_FAILURES', 3)),
+                    float(os.getenv('DB_BREAKER_COOLDOWN', 60)))
+BREAKERS = [DB, AI]
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] in ['--help', '-h']:
+        print("Usage: python breaker.py [--reset NAME]")
+        print(f"  Show breaker states, or close one ({', '.join(b.name for b in BREAKERS)})")
+        print(f"  State directory: {BREAKER_DIR} (BREAKER_DIR)")
+        sys.exit(0)
+    if args and args[0] == '--reset' and len(args) > 1:
+        for b in BREAKERS:
+            if b.name == args[1]:
+                b.save({'failures': 0, 'opened_at': 0.0})
+                print(f"Closed {b.name} breaker")
+                return
+        print(f"Error: unknown breaker {args[1]}")
+        sys.exit(1)
+    for b in BREAKERS:
+        state = b.load()
+        print(f"{b.name:<8} {b.state():<10} failures={state['failures']} "
+              f"threshold={b.threshold} cooldown={b.cooldown:g}s")
+
+
+if __name__ == "__main__":
+    main()
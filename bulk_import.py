@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Bulk import advisories from mbox files or Maildir directories.
+
+Each message's distro is detected by the parser spec engine, messages are
+parsed across a process pool and the results are inserted in batches that
+reuse one connection per database. mbox files are read through the
+mbox_index offset index, so workers get (offset, length) ranges instead of
+message bytes and --resume continues after the last committed message.
+"""
+
+import os
+import sys
+import time
+import mailbox
+import multiprocessing
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from parser_engine import ParseError, SkipMessage, get_engine
+from parse_cache import get_parse_cache
+import mbox_index
+from throttle import RateController
+import metrics
+
+
+class ImportAborted(Exception):
+    """The database could not be reached; the batch in hand was not inserted"""
+
+
+def print_usage():
+    """Print command line help"""
+    print("Usage: python bulk_import.py [options] PATH [PATH ...]")
+    print("  PATH: mbox file or Maildir directory")
+    print("  --jobs N: Number of parser processes (default: CPU count)")
+    print("  --dry-run: Parse only, don't insert into database")
+    print("  --since YYYY-MM-DD: Skip advisories dated before this day")
+    print("  --until YYYY-MM-DD: Skip advisories dated after this day")
+    print("  --batch-size N: Advisories per database batch (default: 50)")
+    print("  --resume: Continue each mbox after its last committed message")
+    print("  --max-rate N: Cap inserts at N advisories/sec, backing off under server load")
+    print("  --metrics-port N: Serve Prometheus metrics on this port while importing")
+
+
+def parse_args(argv):
+    """Parse command line options into a dict"""
+    options = {
+        'jobs': os.cpu_count() or 1,
+        'dry_run': False,
+        'since': None,
+        'until': None,
+        'batch_size': 50,
+        'resume': False,
+        'max_rate': None,
+        'metrics_port': None,
+        'paths': [],
+    }
+    args = list(argv[1:])
+    while args:
+        arg = args.pop(0)
+        if arg in ['--help', '-h']:
+            print_usage()
+            sys.exit(0)
+        if arg in ['--dry-run', '--test']:
+            options['dry_run'] = True
+            continue
+        if arg == '--resume':
+            options['resume'] = True
+            continue
+        if arg.startswith('--'):
+            name, _, value = arg[2:].partition('=')
+            if not value:
+                if not args:
+                    print(f"Error: --{name} requires a value")
+                    sys.exit(1)
+                value = args.pop(0)
+            try:
+                if name == 'metrics-port':
+                    options['metrics_port'] = int(value)
+                elif name in ['jobs', 'batch-size']:
+                    options[name.replace('-', '_')] = max(1, int(value))
+                elif name == 'max-rate':
+                    options['max_rate'] = float(value)
+                elif name in ['since', 'until']:
+                    options[name] = datetime.strptime(value, '%Y-%m-%d').date()
+                else:
+                    print(f"Error: unknown option --{name}")
+                    sys.exit(1)
+            except ValueError:
+                print(f"Error: invalid value for --{name}: {value}")
+                sys.exit(1)
+            continue
+        options['paths'].append(arg)
+
+    if not options['paths']:
+        print_usage()
+        sys.exit(1)
+    return options
+
+
+def iter_messages(paths, resume=False):
+    """
+    Yield (kind, path, key, raw) work items. mbox items carry an
+    (offset, length) key and no bytes; Maildir items carry the message bytes.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            box = mailbox.Maildir(path, factory=None, create=False)
+            try:
+                for key in box.iterkeys():
+                    yield 'maildir', path, key, box.get_bytes(key)
+            finally:
+                box.close()
+        else:
+            start_offset = mbox_index.load_checkpoint(path) if resume else 0
+            if start_offset:
+                print(f"Resuming {path} from offset {start_offset}")
+            offsets = mbox_index.get_index(path)
+            for offset, length in mbox_index.iter_ranges(path, offsets, start_offset):
+                yield 'mbox', path, (offset, length), None
+
+
+def in_date_range(adv_date, since, until):
+    """Check an advisory Date header against the --since/--until filters"""
+    if not since and not until:
+        return True
+    try:
+        day = parsedate_to_datetime(adv_date).date()
+    except Exception:
+        return False
+    if since and day < since:
+        return False
+    if until and day > until:
+        return False
+    return True
+
+
+def parse_one(item):
+    """Worker: parse one work item into (status, (kind, path, key), payload)"""
+    kind, path, key, raw = item
+    source = (kind, path, key)
+    try:
+        if kind == 'mbox':
+            text = mbox_index.read_message(path, *key)
+        else:
+            text = raw.decode('utf-8', errors='ignore')
+        parsed = get_engine().parse(text, cache=get_parse_cache())
+    except SkipMessage as e:
+        return 'skipped', source, str(e)
+    except ParseError as e:
+        return 'failed', source, (e.kind, e.file_type.lower(), f"{e.reason}: {e.subject}")
+    except Exception as e:
+        return 'failed', source, ('parse_error', '', f"Error parsing message: {e}")
+    return 'parsed', source, parsed
+
+
+def format_source(source):
+    """Human readable message location"""
+    kind, path, key = source
+    return f"{path}@{key[0]}" if kind == 'mbox' else f"{path}:{key}"
+
+
+def save_checkpoints(sources, failed=(), held=None):
+    """
+    Record the end of the last committed message for each mbox. An mbox whose
+    insert failed is held at the message before the failure for the rest of
+    the run (its path is added to held), so --resume retries it.
+    """
+    held = set() if held is None else held
+    ends = {}
+    for source in sources:
+        kind, path, key = source
+        if kind != 'mbox' or path in held:
+            continue
+        if source in failed:
+            held.add(path)
+            continue
+        ends[path] = max(ends.get(path, 0), key[0] + key[1])
+    for path, end in ends.items():
+        mbox_index.save_checkpoint(path, end)
+
+
+def flush(batch, stats, dry_run, throttle=None, held=None):
+    """Hand a batch of (source, parsed advisory) pairs to the database writer"""
+    if not batch:
+        return
+    if throttle:
+        throttle.acquire(len(batch))
+    if dry_run:
+        for source, parsed in batch:
+            print(f"[{parsed['distro']}] {parsed['title']} ({parsed['date']})")
+        stats['would_insert'] = stats.get('would_insert', 0) + len(batch)
+    else:
+        from advisory import Advisory
+        try:
+            outcomes = Advisory().insert_advisories([parsed for source, parsed in batch])
+        except Exception as e:
+            # Raised only when connecting, before any advisory of the batch is inserted
+            stats['insert_failed'] = stats.get('insert_failed', 0) + len(batch)
+            raise ImportAborted(f"Database unavailable: {e}") from e
+        for (source, parsed), outcome in zip(batch, outcomes):
+            # Kept apart from the parse failures counted under 'failed'
+            outcome_key = 'insert_failed' if outcome == 'failed' else outcome
+            print(f"{outcome_key}: [{parsed['distro']}] {parsed['title']}")
+            stats[outcome_key] = stats.get(outcome_key, 0) + 1
+            metrics.MESSAGES.inc(distro=parsed['distro'], outcome=outcome_key)
+        failed = {source for (source, parsed), outcome in zip(batch, outcomes) if outcome == 'failed'}
+        save_checkpoints([source for source, parsed in batch], failed, held)
+    batch.clear()
+
+
+def run_import(options):
+    """
+    Parse and insert every message, returning the stats dict. If the database
+    becomes unreachable the import stops there, with 'aborted' set in stats
+    and every mbox checkpoint left at its last committed message.
+    """
+    stats = {'messages': 0, 'parsed': 0, 'skipped': 0, 'failed': 0, 'out_of_range': 0}
+    batch = []
+    held = set()
+    throttle = None
+    if options['max_rate'] and not options['dry_run']:
+        from advisory import Advisory
+        advisory_handler = Advisory()
+        throttle = RateController(options['max_rate'],
+                                  connect=lambda: advisory_handler.db_connect(advisory_handler.databases[0]))
+    messages = iter_messages(options['paths'], options['resume'])
+
+    if options['jobs'] > 1:
+        pool = multiprocessing.Pool(options['jobs'])
+        results = pool.imap(parse_one, messages, chunksize=16)
+    else:
+        pool = None
+        results = map(parse_one, messages)
+
+    finished = False
+    try:
+        for status, source, payload in results:
+            stats['messages'] += 1
+            if status == 'skipped':
+                stats['skipped'] += 1
+                metrics.MESSAGES.inc(distro='', outcome='skipped')
+                continue
+            if status == 'failed':
+                kind, distro, reason = payload
+                stats['failed'] += 1
+                metrics.MESSAGES.inc(distro=distro, outcome=kind)
+                print(f"Failed to parse {format_source(source)}: {reason}")
+                continue
+            if not in_date_range(payload['date'], options['since'], options['until']):
+                stats['out_of_range'] += 1
+                continue
+            stats['parsed'] += 1
+            batch.append((source, payload))
+            if len(batch) >= options['batch_size']:
+                flush(batch, stats, options['dry_run'], throttle, held)
+        flush(batch, stats, options['dry_run'], throttle, held)
+        finished = True
+    except ImportAborted as e:
+        print(f"{e}; stopping the import")
+        stats['aborted'] = str(e)
+    finally:
+        if pool:
+            if finished:
+                pool.close()
+            else:
+                # Don't wait for the parse work still queued
+                pool.terminate()
+            pool.join()
+        if throttle:
+            throttle.close()
+    for path in sorted(held):
+        print(f"Checkpoint for {path} held before its first failed insert; --resume will retry from there")
+    return stats
+
+
+def print_summary(stats, elapsed):
+    """Print counts and throughput"""
+    rate = stats['messages'] / elapsed if elapsed > 0 else 0
+    print("\n" + "="*60)
+    print("BULK IMPORT SUMMARY")
+    print("="*60)
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+    print(f"elapsed: {elapsed:.2f}s ({rate:.1f} messages/sec)")
+
+
+def main():
+    options = parse_args(sys.argv)
+    if options['dry_run']:
+        print("Running in DRY RUN mode - no database insertion will be attempted")
+
+    if options['metrics_port'] is not None:
+        metrics.start_http_server(options['metrics_port'])
+
+    start = time.perf_counter()
+    try:
+        stats = run_import(options)
+    finally:
+        metrics.write_textfile()
+    print_summary(stats, time.perf_counter() - start)
+    if stats.get('aborted'):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Merging of per-release announcements of the same build.
+
+Fedora announces one build separately for every supported release, so a
+mass rebuild means one parse, AI alias and insert per release. When
+COALESCE_WINDOW is set, the dispatcher holds advisories whose spec has a
+'coalesce' rule in a local SQLite store, grouped by the rule's group_by
+fields. Once a group's first advisory has waited for the window, the group
+is merged into one advisory listing every release and advisory id, spooled
+and inserted. Held advisories survive restarts. Every alert script run
+releases due groups; run `coalesce.py --release` from cron so the last
+group of a burst is not left waiting for the next message.
+"""
+
+import os
+import sys
+import json
+import time
+from collections import defaultdict
+from datetime import datetime
+from dedup_cache import DedupCache
+from spool import Spool
+from sqlite_store import open_store
+import metrics
+
+COALESCE_DB = os.getenv('COALESCE_DB', '/home/alerts/scripts_linstage/coalesce.sqlite3')
+# Seconds to hold an advisory for its siblings; 0 disables coalescing
+COALESCE_WINDOW = float(os.getenv('COALESCE_WINDOW', 0))
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS held (id INTEGER PRIMARY KEY AUTOINCREMENT, group_key TEXT NOT NULL, "
+    "held_at REAL NOT NULL, advisory TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS group_key_idx ON held (group_key)",
+]
+
+HELD_FIELDS = ['spec', 'title', 'short_desc', 'body', 'distro', 'date', 'message_id', 'fields']
+
+
+def group_key(parsed, rule):
+    """Key shared by announcements of one build, or None if a group_by field is missing"""
+    values = [parsed['fields'].get(name, '') for name in rule['group_by']]
+    if not all(values):
+        return None
+    return '|'.join([parsed['spec']] + [value.lower() for value in values])
+
+
+def release_order(release):
+    return (0, int(release), '') if release.isdigit() else (1, 0, release)
+
+
+def combine(entries, rule):
+    """Merge the held advisories of one group into a single advisory dict"""
+    entries = sorted(entries, key=lambda entry: release_order(entry['fields'].get(rule['release'], '')))
+    dedup_keys = list(dict.fromkeys(key for entry in entries for key in entry['dedup_keys'] if key))
+    # A resent announcement would otherwise list its release twice
+    unique = list({entry['fields'].get('advisory_id') or entry['title']: entry for entry in entries}.values())
+    first = unique[0]
+    advisory = {name: first[name] for name in ['title', 'short_desc', 'body', 'distro', 'date', 'message_id']}
+    advisory['dedup_keys'] = dedup_keys
+    if len(unique) == 1:
+        return advisory
+
+    fields = defaultdict(str, first['fields'])
+    fields['releases'] = ', '.join(dict.fromkeys(entry['fields'].get(rule['release'], '') for entry in unique))
+    fields['advisory_ids'] = ' '.join(dict.fromkeys(entry['fields'].get('advisory_id', '') for entry in unique))
+    releases = [rule['release_line'].format_map(defaultdict(str, entry['fields'])) for entry in unique]
+    advisory['title'] = rule['title'].format_map(fields).strip()
+    advisory['body'] = '\n'.join(releases) + '\n\n' + first['body']
+    return advisory
+
+
+def coalesce_rule(spec_name):
+    from parser_engine import get_engine
+    return get_engine().by_name[spec_name].coalesce
+
+
+class CoalesceStore:
+    """SQLite store of advisories held for coalescing"""
+
+    def __init__(self, path=COALESCE_DB, window=COALESCE_WINDOW):
+        self.path = path
+        self.window = window
+        self.connection = None
+
+    def connect(self):
+        if self.connection is None:
+            # Autocommit; release() opens its own IMMEDIATE transactions
+            self.connection = open_store(self.path, SCHEMA, synchronous='FULL', timeout=30, isolation_level=None)
+        return self.connection
+
+    def hold(self, key, parsed, dedup_keys):
+        """Hold a parsed advisory under its group key"""
+        advisory = {name: parsed[name] for name in HELD_FIELDS}
+        advisory['dedup_keys'] = dedup_keys
+        self.connect().execute("INSERT INTO held (group_key, held_at, advisory) VALUES (?, ?, ?)",
+                               (key, time.time(), json.dumps(advisory)))
+
+    def groups(self):
+        """[(group key, first held time, advisories held)] oldest first"""
+        return self.connect().execute(
+            "SELECT group_key, MIN(held_at), COUNT(*) FROM held GROUP BY group_key ORDER BY MIN(held_at)").fetchall()
+
+    def release(self, spool, everything=False):
+        """Merge, spool and drop every due group; returns [(spool id, advisory)]"""
+        cutoff = float('inf') if everything else time.time() - self.window
+        released = []
+        for key, held_at, _ in self.groups():
+            if held_at > cutoff:
+                continue
+            connection = self.connect()
+            # Concurrent alert scripts may release the same group; the first one wins
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                rows = connection.execute("SELECT id, advisory FROM held WHERE group_key = ? ORDER BY id",
+                                          (key,)).fetchall()
+                if not rows:
+                    connection.execute("ROLLBACK")
+                    continue
+                entries = [json.loads(advisory) for _, advisory in rows]
+                advisory = combine(entries, coalesce_rule(entries[0]['spec']))
+                # Spooled before the rows go, so a crash here re-releases rather than loses it
+                spool_id = spool.append(advisory)
+                connection.execute("DELETE FROM held WHERE group_key = ? AND id <= ?", (key, rows[-1][0]))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            print(f"Released {len(entries)} held as: {advisory['title']}")
+            released.append((spool_id, advisory))
+        return released
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def release_due(store=None, spool=None, everything=False):
+    """Insert every group whose window has passed; returns outcome counts"""
+    from advisory import Advisory
+
+    store = store or CoalesceStore()
+    spool = spool or Spool()
+    released = store.release(spool, everything)
+    if not released:
+        return {}
+    try:
+        outcomes = Advisory().insert_advisories([advisory for _, advisory in released])
+    except Exception as e:
+        print(f"Database unavailable, released advisories left for spool replay: {e}")
+        return {}
+
+    stats = {}
+    for (spool_id, advisory), outcome in zip(released, outcomes):
+        if outcome == 'failed':
+            continue  # Still pending in the spool; replay retries it
+        spool.ack(spool_id, outcome)
+        stats[outcome] = stats.get(outcome, 0) + 1
+        metrics.MESSAGES.inc(distro=advisory['distro'], outcome=f"coalesced_{outcome}")
+        if outcome in ['inserted', 'duplicate']:
+            DedupCache().add(advisory['dedup_keys'], advisory['title'])
+    return stats
+
+
+def print_held(store):
+    now = time.time()
+    groups = store.groups()
+    print(f"{len(groups)} groups held in {store.path} (window {store.window:g}s)")
+    for key, held_at, count in groups:
+        print(f"{datetime.fromtimestamp(held_at).isoformat(timespec='seconds')} age={now - held_at:.0f}s "
+              f"advisories={count} {key}")
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ['--help', '-h']:
+        print("Usage: python coalesce.py --list | --release [--all]")
+        print("  --list: Show held groups")
+        print("  --release: Insert groups held for longer than the window (--all: every group)")
+        print(f"  Store: {COALESCE_DB} (COALESCE_DB), window {COALESCE_WINDOW:g}s (COALESCE_WINDOW)")
+        sys.exit(0)
+    store = CoalesceStore()
+    try:
+        if args[0] == '--list':
+            print_held(store)
+        elif args[0] == '--release':
+            stats = release_due(store, everything='--all' in args)
+            metrics.write_textfile()
+            print(f"Release finished: {stats or 'nothing due'}")
+        else:
+            print(f"Error: unknown option {args[0]}")
+            sys.exit(1)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Consistency check of published advisories between the two databases.
+
+insert_advisory writes lsv7 and lsv7j5beta in separate steps, and can return
+or raise between them, so the two drift. Article ids are assigned by each
+database on its own, so rows are matched by title, the key the duplicate
+checks already use, rather than by id range.
+
+Each database is read once: one GROUP BY pass returns a row count and a
+64-bit XOR of MD5(title) for every (category, MOD(CRC32(title), buckets))
+bucket. Only buckets whose count or checksum differ are read again, with
+their titles, in one query per database. The resulting repair plan lists
+every title present on one side only. `--repair` copies those articles in
+batches through Advisory.write_article, under the category's insert lock,
+so asset, workflow and CVE rows are created the same way as for a live
+insert.
+"""
+
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from coordination import insert_lock
+from parser_engine import extract_cves
+
+DEFAULT_BUCKETS = 1024
+REPAIR_BATCH = 100
+
+CHECKSUM_SQL = """
+SELECT catid, MOD(CRC32(title), %s) AS bucket, COUNT(*),
+       BIT_XOR(CAST(CONV(LEFT(MD5(title), 16), 16, 10) AS UNSIGNED))
+FROM xu5gc_content
+WHERE state = 1{catid_filter}
+GROUP BY catid, bucket
+"""
+
+TITLES_SQL = """
+SELECT catid, MOD(CRC32(title), %s) AS bucket, id, title
+FROM xu5gc_content
+WHERE state = 1 AND catid IN ({catids}) AND MOD(CRC32(title), %s) IN ({buckets})
+"""
+
+ARTICLE_SQL = """
+SELECT id, catid, title, alias, introtext, `fulltext`, created, images, attribs
+FROM xu5gc_content
+WHERE id IN ({ids})
+"""
+
+
+def bucket_checksums(connection, buckets, catids=None):
+    """{(catid, bucket): (rows, checksum)} for one database"""
+    cursor = connection.cursor()
+    try:
+        catid_filter = f" AND catid IN ({','.join(['%s'] * len(catids))})" if catids else ''
+        cursor.execute(CHECKSUM_SQL.format(catid_filter=catid_filter), (buckets, *(catids or ())))
+        return {(catid, int(bucket)): (count, int(checksum)) for catid, bucket, count, checksum in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def bucket_titles(connection, buckets, keys):
+    """{(catid, title): id} for the rows in the given (catid, bucket) buckets"""
+    if not keys:
+        return {}
+    catids = sorted({catid for catid, _ in keys})
+    selected = sorted({bucket for _, bucket in keys})
+    cursor = connection.cursor()
+    try:
+        cursor.execute(TITLES_SQL.format(catids=','.join(['%s'] * len(catids)),
+                                         buckets=','.join(['%s'] * len(selected))),
+                       (buckets, *catids, buckets, *selected))
+        # Filtering by catid and bucket separately can return extra buckets
+        return {(catid, title): record_id for catid, bucket, record_id, title in cursor.fetchall()
+                if (catid, int(bucket)) in keys}
+    finally:
+        cursor.close()
+
+
+def plan_repairs(connections, buckets=DEFAULT_BUCKETS, catids=None):
+    """
+    Compare two databases given as {name: connection}; returns (plan, stats)
+    where each plan entry copies one article from 'source' to 'target'
+    """
+    (first, first_conn), (second, second_conn) = connections.items()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        sums = list(executor.map(lambda conn: bucket_checksums(conn, buckets, catids), [first_conn, second_conn]))
+    mismatched = {key for key in set(sums[0]) | set(sums[1]) if sums[0].get(key) != sums[1].get(key)}
+    scanned = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        titles = list(executor.map(lambda conn: bucket_titles(conn, buckets, mismatched), [first_conn, second_conn]))
+    plan = []
+    for source, target, have, other in [(first, second, titles[0], titles[1]), (second, first, titles[1], titles[0])]:
+        for (catid, title), record_id in sorted(have.items(), key=lambda item: item[1]):
+            if (catid, title) not in other:
+                plan.append({'source': source, 'target': target, 'catid': catid, 'id': record_id, 'title': title})
+
+    stats = {
+        'rows': {name: sum(count for count, _ in side.values()) for name, side in zip(connections, sums)},
+        'buckets': len(set(sums[0]) | set(sums[1])),
+        'mismatched_buckets': len(mismatched),
+        'checksum_seconds': round(scanned - start, 3),
+        'drilldown_seconds': round(time.perf_counter() - scanned, 3),
+    }
+    return plan, stats
+
+
+def decode_json(text):
+    try:
+        return json.loads(text or '{}')
+    except ValueError:
+        return {}
+
+
+def repair(plan, advisory_handler, connections, batch_size=REPAIR_BATCH):
+    """Copy planned articles in batches; returns {'copied': n, 'skipped': n}"""
+    distros = {}
+    for distro, catid in advisory_handler.category_map.items():
+        distros.setdefault(catid, distro)
+    routes = {}
+    for entry in plan:
+        routes.setdefault((entry['source'], entry['target'], entry['catid']), []).append(entry['id'])
+
+    counts = {'copied': 0, 'skipped': 0}
+    for (source, target, catid), ids in routes.items():
+        for i in range(0, len(ids), batch_size):
+            batch = ids[i:i + batch_size]
+            read_cursor = connections[source].cursor()
+            read_cursor.execute(ARTICLE_SQL.format(ids=','.join(['%s'] * len(batch))), batch)
+            rows = read_cursor.fetchall()
+            read_cursor.close()
+
+            cursor = connections[target].cursor()
+            with insert_lock(connections[target].cursor(), target, catid):
+                for record_id, _, title, alias, introtext, fulltext, created, images, attribs in rows:
+                    # A live insert may have added it since the plan was made
+                    if advisory_handler.find_title(cursor, title):
+                        counts['skipped'] += 1
+                        continue
+                    outcome = advisory_handler.write_article(
+                        cursor, target, catid, title, alias, introtext, fulltext, distros.get(catid, 'other'),
+                        created.strftime('%Y-%m-%d %H:%M:%S') if hasattr(created, 'strftime') else created,
+                        decode_json(images), decode_json(attribs), extract_cves(f"{title}\n{fulltext}"),
+                        notify=False)
+                    counts['copied' if outcome == 'inserted' else 'skipped'] += 1
+                    print(f"{source} -> {target}: {outcome} {title} "
+                          f"(id {record_id} -> {advisory_handler.last_article_ids.get(target, '-')})")
+            cursor.close()
+    return counts
+
+
+def print_usage():
+    """Print command line help"""
+    print("Usage: python consistency.py [--catid N,N] [--buckets N] [--json] [--repair [--batch-size N]]")
+    print("  Compare published articles of the two databases by title and print a repair plan")
+    print("  --catid N,N: Only these categories (default: all)")
+    print(f"  --buckets N: Checksum buckets per category (default: {DEFAULT_BUCKETS})")
+    print("  --json: Print the plan as JSON lines")
+    print("  --repair: Copy each missing article to the database lacking it")
+    print(f"  --batch-size N: Articles read per query while repairing (default: {REPAIR_BATCH})")
+
+
+def main():
+    options = {'catid': None, 'buckets': DEFAULT_BUCKETS, 'json': False, 'repair': False,
+               'batch-size': REPAIR_BATCH}
+    args = sys.argv[1:]
+    while args:
+        arg = args.pop(0)
+        name, _, value = arg.partition('=')
+        if name in ['--help', '-h']:
+            print_usage()
+            sys.exit(0)
+        if name in ['--json', '--repair']:
+            options[name[2:]] = True
+            continue
+        if name not in ['--catid', '--buckets', '--batch-size']:
+            print(f"Error: unknown option {arg}")
+            sys.exit(1)
+        if not value:
+            if not args:
+                print(f"Error: {name} requires a value")
+                sys.exit(1)
+            value = args.pop(0)
+        if name == '--catid':
+            options['catid'] = [int(x.strip()) for x in value.split(',')]
+        else:
+            options[name[2:]] = max(1, int(value))
+
+    from advisory import Advisory
+    advisory_handler = Advisory()
+    connections = {}
+    try:
+        for dbname in advisory_handler.databases:
+            connection = advisory_handler.db_connect(dbname)
+            if not connection:
+                print(f"Failed to connect to database {dbname}")
+                sys.exit(1)
+            connections[dbname] = connection
+
+        plan, stats = plan_repairs(connections, options['buckets'], options['catid'])
+        for entry in plan:
+            if options['json']:
+                print(json.dumps(entry))
+            else:
+                print(f"copy {entry['source']} -> {entry['target']}  catid {entry['catid']:<4} "
+                      f"id {entry['id']:<8} {entry['title']}")
+        rows = ', '.join(f"{name} {count}" for name, count in stats['rows'].items())
+        print(f"{len(plan)} articles to copy; rows: {rows}; {stats['mismatched_buckets']}/{stats['buckets']} "
+              f"buckets differ; checksums {stats['checksum_seconds']}s, drill-down {stats['drilldown_seconds']}s",
+              file=sys.stderr)
+
+        if options['repair'] and plan:
+            counts = repair(plan, advisory_handler, connections, options['batch-size'])
+            print(f"Copied {counts['copied']} articles, skipped {counts['skipped']}", file=sys.stderr)
+    finally:
+        for connection in connections.values():
+            advisory_handler.db_disconnect(connection)
+
+
+if __name__ == "__main__":
+    main()
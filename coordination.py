@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Coordination of advisory inserts between hosts through MySQL named locks.
+
+insert_advisory checks the title and alias, inserts the article and then
+allocates its asset's lft from MAX(lft) under the category. Two writers doing
+that at once can insert the same advisory twice or hand out the same lft. So
+the critical section runs under GET_LOCK, with the lock name sharded by
+database and category. Inserts for different distros still run in parallel
+on every host, while two inserts into one category take turns.
+
+Named locks belong to the server connection holding them. When a node dies
+or loses its connection, the server drops its locks at once and the next
+waiter takes over, with no lease expiry to wait out. A writer that can't get
+the lock within INSERT_LOCK_TIMEOUT fails the insert, which leaves the
+advisory in the spool for replay.
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+
+INSERT_LOCK_TIMEOUT = int(os.getenv('INSERT_LOCK_TIMEOUT', 30))
+LOCK_PREFIX = 'alerts:insert'
+
+
+class LockTimeout(Exception):
+    """A named lock was not granted in time"""
+
+
+def lock_name(database, shard):
+    # Lock names are server-wide and limited to 64 characters
+    return f"{LOCK_PREFIX}:{database}:{shard}"[:64]
+
+
+@contextmanager
+def named_lock(cursor, name, timeout=INSERT_LOCK_TIMEOUT):
+    """Hold GET_LOCK(name) for the block; the cursor is closed afterwards"""
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (name, timeout))
+        row = cursor.fetchone()
+        if not row or row[0] != 1:
+            raise LockTimeout(f"timed out after {timeout}s waiting for lock {name}")
+        try:
+            yield
+        finally:
+            try:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (name,))
+                cursor.fetchone()
+            except Exception as e:
+                # The connection is gone, and the server released the lock with it
+                print(f"Error releasing lock {name}: {e}")
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            pass
+
+
+def insert_lock(cursor, database, catid, timeout=INSERT_LOCK_TIMEOUT):
+    """Lock serializing inserts into one category of one database"""
+    return named_lock(cursor, lock_name(database, catid), timeout)
+
+
+def print_holders():
+    """Which server connection holds each category's insert lock"""
+    from advisory import Advisory
+    advisory_handler = Advisory()
+    for dbname in advisory_handler.databases:
+        connection = advisory_handler.db_connect(dbname)
+        if not connection:
+            print(f"{dbname}: unreachable")
+            continue
+        cursor = connection.cursor()
+        for distro, catid in sorted(set(advisory_handler.category_map.items()), key=lambda item: item[1]):
+            cursor.execute("SELECT IS_USED_LOCK(%s)", (lock_name(dbname, catid),))
+            holder = cursor.fetchone()[0]
+            print(f"{dbname:<12} {distro:<10} catid={catid:<4} {'held by connection ' + str(holder) if holder else 'free'}")
+        cursor.close()
+        advisory_handler.db_disconnect(connection)
+
+
+def main():
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print("Usage: python coordination.py")
+        print("  Show which MySQL connection holds each category's insert lock")
+        print(f"  Lock wait timeout: {INSERT_LOCK_TIMEOUT}s (INSERT_LOCK_TIMEOUT)")
+        sys.exit(0)
+    print_holders()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+CVE cross-reference table for advisories.
+
+The parser engine collects the CVE ids of every advisory in its existing
+pass over the subject and body, and insert_advisory writes them to
+xu5gc_advisory_cve(article_id, cve) together with the content row, in one
+multi-row INSERT per database. Pages listing advisories per CVE then read
+that index instead of full-text searching `fulltext`.
+
+Historical rows are filled by `python cve_index.py --backfill`. It streams
+published articles by keyset on id, extracts their CVE ids, and inserts them
+in batches through the shared RateController. The last id done per database
+is checkpointed so an interrupted run resumes.
+"""
+
+import os
+import sys
+import time
+from parser_engine import extract_cves
+
+CVE_TABLE = 'xu5gc_advisory_cve'
+CHECKPOINT_FILE = '/home/alerts/scripts_linstage/cve-backfill-checkpoint.json'
+ER_NO_SUCH_TABLE = 1146
+
+CREATE_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS {CVE_TABLE} (
+    article_id INT UNSIGNED NOT NULL,
+    cve VARCHAR(32) NOT NULL,
+    PRIMARY KEY (article_id, cve),
+    KEY cve_article_idx (cve, article_id)
+)
+"""
+INSERT_SQL = f"INSERT IGNORE INTO {CVE_TABLE} (article_id, cve) VALUES (%s, %s)"
+
+
+def store_cves(cursor, article_id, cves):
+    """Link an article to its CVE ids in one statement; returns the number of ids"""
+    if not cves:
+        return 0
+    try:
+        cursor.executemany(INSERT_SQL, [(article_id, cve) for cve in cves])
+    except Exception as e:
+        # Until the table is created the article itself must still go in
+        if getattr(e, 'errno', None) != ER_NO_SUCH_TABLE:
+            raise
+        print(f"Error: {CVE_TABLE} is missing, run `python cve_index.py --create-table`")
+        return 0
+    return len(cves)
+
+
+def iter_articles(connection, start_id=0, chunk_size=1000, limit=None):
+    """Yield chunks of published (id, title, fulltext) rows by keyset on id"""
+    cursor = connection.cursor(buffered=False)
+    last_id = start_id
+    remaining = limit
+    try:
+        while remaining is None or remaining > 0:
+            page_size = chunk_size if remaining is None else min(chunk_size, remaining)
+            cursor.execute("SELECT id, title, `fulltext` FROM xu5gc_content "
+                           f"WHERE state = 1 AND id > %s ORDER BY id LIMIT {int(page_size)}", (last_id,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            yield rows
+            last_id = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < page_size:
+                break
+    finally:
+        cursor.close()
+
+
+def backfill_database(advisory_handler, dbname, checkpoint, chunk_size=1000, limit=None, test_mode=False,
+                      throttle=None):
+    """Index the CVE ids of one database's articles; returns (scanned, links)"""
+    connection = advisory_handler.db_connect(dbname)
+    if not connection:
+        print(f"Failed to connect to database {dbname}")
+        return 0, 0
+    connection.autocommit = False
+    write_cursor = connection.cursor()
+    key = f"cve:{dbname}"
+    start_id = checkpoint.get(key) or 0
+    if start_id:
+        print(f"{dbname}: resuming after id {start_id}")
+
+    scanned = links = 0
+    start = time.perf_counter()
+    try:
+        if not test_mode:
+            write_cursor.execute(CREATE_TABLE_SQL)
+        for rows in iter_articles(connection, start_id, chunk_size, limit):
+            batch = [(record_id, cve) for record_id, title, fulltext in rows
+                     for cve in extract_cves(f"{title}\n{fulltext}")]
+            if batch and not test_mode:
+                if throttle:
+                    throttle.acquire(len(batch))
+                write_start = time.perf_counter()
+                write_cursor.executemany(INSERT_SQL, batch)
+                connection.commit()
+                if throttle:
+                    throttle.record(time.perf_counter() - write_start, len(batch))
+            if not test_mode:
+                checkpoint.set(key, rows[-1][0])
+            scanned += len(rows)
+            links += len(batch)
+            print(f"{dbname}: scanned {scanned} rows, {'found' if test_mode else 'stored'} {links} CVE links "
+                  f"({scanned / (time.perf_counter() - start):.1f} rows/sec)")
+    except Exception as e:
+        connection.rollback()
+        print(f"Error backfilling {dbname}: {e}")
+    finally:
+        write_cursor.close()
+        advisory_handler.db_disconnect(connection)
+    return scanned, links
+
+
+def create_table():
+    from advisory import Advisory
+    advisory_handler = Advisory()
+    for dbname in advisory_handler.databases:
+        connection = advisory_handler.db_connect(dbname)
+        if not connection:
+            print(f"Failed to connect to database {dbname}")
+            continue
+        cursor = connection.cursor()
+        cursor.execute(CREATE_TABLE_SQL)
+        cursor.close()
+        advisory_handler.db_disconnect(connection)
+        print(f"{dbname}: {CVE_TABLE} ready")
+
+
+def print_links(cve):
+    """Article ids linked to a CVE in each database"""
+    from advisory import Advisory
+    advisory_handler = Advisory()
+    for dbname in advisory_handler.databases:
+        connection = advisory_handler.db_connect(dbname)
+        if not connection:
+            print(f"{dbname}: unreachable")
+            continue
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT article_id FROM {CVE_TABLE} WHERE cve = %s ORDER BY article_id", (cve,))
+        print(f"{dbname}: {' '.join(str(row[0]) for row in cursor.fetchall()) or '-'}")
+        cursor.close()
+        advisory_handler.db_disconnect(connection)
+
+
+def print_usage():
+    """Print command line help"""
+    print("Usage: python cve_index.py --create-table | --backfill [options] | --cve CVE-YYYY-NNNN")
+    print("  --create-table: Create the CVE table in every database")
+    print("  --backfill: Index CVE ids of existing articles (creates the table if needed)")
+    print("    --test: Count CVE links without writing")
+    print("    --limit N: Process at most N articles per database; the next run continues")
+    print("    --chunk-size N: Articles per page and insert batch (default: 1000)")
+    print("    --restart: Discard the saved checkpoint")
+    print("    --max-rate N: Cap CVE links/second (adapts down under load; 0 disables)")
+    print("  --cve ID: Article ids linked to a CVE in each database")
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ['--help', '-h']:
+        print_usage()
+        sys.exit(0)
+
+    command = args.pop(0)
+    if command == '--cve':
+        if not args:
+            print("Error: --cve requires a value")
+            sys.exit(1)
+        print_links(args[0].upper())
+        return
+
+    options = {'test': False, 'restart': False, 'limit': None, 'chunk-size': 1000, 'max-rate': None}
+    while args:
+        arg = args.pop(0)
+        name, _, value = arg.partition('=')
+        if name in ['--test', '--restart']:
+            options[name[2:]] = True
+            continue
+        if name not in ['--limit', '--chunk-size', '--max-rate']:
+            print(f"Error: unknown option {arg}")
+            sys.exit(1)
+        if not value:
+            if not args:
+                print(f"Error: {name} requires a value")
+                sys.exit(1)
+            value = args.pop(0)
+        options[name[2:]] = float(value) if name == '--max-rate' else int(value)
+
+    if command == '--create-table':
+        create_table()
+    elif command == '--backfill':
+        from advisory import Advisory
+        from backfill import Checkpoint
+        from throttle import RateController
+        advisory_handler = Advisory()
+        checkpoint = Checkpoint(os.getenv('CVE_BACKFILL_CHECKPOINT', CHECKPOINT_FILE))
+        if options['restart']:
+            for dbname in advisory_handler.databases:
+                checkpoint.set(f"cve:{dbname}", None)
+        throttle = None
+        if options['max-rate'] != 0:
+            throttle = RateController(options['max-rate'],
+                                      connect=lambda: advisory_handler.db_connect(advisory_handler.databases[0]))
+        try:
+            for dbname in advisory_handler.databases:
+                scanned, links = backfill_database(advisory_handler, dbname, checkpoint, options['chunk-size'],
+                                                   options['limit'], options['test'], throttle)
+                print(f"\nDatabase {dbname}: scanned {scanned} articles, {links} CVE links")
+        finally:
+            if throttle:
+                throttle.close()
+    else:
+        print(f"Error: unknown option {command}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
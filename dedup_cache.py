@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Local store of recently ingested advisories, checked before the database.
+
+List resends and MTA retries repeat a Message-ID, and cross-posts to several
+announce lists repeat the advisory body under a new one. Both are recorded
+in a small SQLite database once an advisory has been inserted (or found to
+exist), so later copies are dropped before the AI alias call, the database
+round-trips and the duplicate-title failure email. Entries expire after a
+TTL so the table stays small.
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import hashlib
+from email.parser import HeaderParser
+from sqlite_store import open_store
+
+DEDUP_DB = os.getenv('DEDUP_DB', '/home/alerts/scripts_linstage/dedup.sqlite3')
+DEDUP_TTL_DAYS = float(os.getenv('DEDUP_TTL_DAYS', 14))
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY, seen_at REAL NOT NULL, title TEXT)",
+    "CREATE INDEX IF NOT EXISTS seen_at_idx ON seen (seen_at)",
+]
+
+WHITESPACE_RE = re.compile(r'\s+')
+# Mailman footers differ between lists carrying the same advisory
+FOOTER_RE = re.compile(r'^_{5,}\s*$', re.MULTILINE)
+
+
+def header_message_id(raw):
+    """Message-ID from the header block only, without parsing the body"""
+    head = raw.split('\n\n', 1)[0]
+    return (HeaderParser().parsestr(head).get('Message-ID') or '').strip()
+
+
+def normalize_body(body):
+    """Body text with list footers dropped and whitespace collapsed"""
+    match = FOOTER_RE.search(body)
+    if match:
+        body = body[:match.start()]
+    return WHITESPACE_RE.sub(' ', body).strip()
+
+
+def message_id_key(message_id):
+    return f"mid:{message_id.strip('<> ').lower()}" if message_id else None
+
+
+def body_key(body):
+    normalized = normalize_body(body)
+    if not normalized:
+        return None
+    return "body:" + hashlib.sha256(normalized.encode('utf-8', errors='ignore')).hexdigest()
+
+
+class DedupCache:
+    """SQLite set of Message-ID and body-hash keys with a TTL"""
+
+    def __init__(self, path=DEDUP_DB, ttl_days=DEDUP_TTL_DAYS):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.connection = None
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = open_store(self.path, SCHEMA, timeout=5)
+        return self.connection
+
+    def seen(self, *keys):
+        """Return (key, title) for the first unexpired key present, else None"""
+        keys = [key for key in keys if key]
+        if not keys:
+            return None
+        try:
+            row = self.connect().execute(
+                f"SELECT key, title FROM seen WHERE key IN ({','.join('?' * len(keys))}) AND seen_at >= ?",
+                (*keys, time.time() - self.ttl)).fetchone()
+        except sqlite3.Error as e:
+            # The cache is an optimisation; fall through to the database checks
+            print(f"Error reading dedup cache: {e}")
+            return None
+        return tuple(row) if row else None
+
+    def add(self, keys, title=''):
+        """Record keys as ingested now and drop expired entries"""
+        keys = [key for key in keys if key]
+        if not keys:
+            return
+        now = time.time()
+        try:
+            with self.connect() as connection:
+                connection.executemany("INSERT OR REPLACE INTO seen (key, seen_at, title) VALUES (?, ?, ?)",
+                                       [(key, now, title) for key in keys])
+                connection.execute("DELETE FROM seen WHERE seen_at < ?", (now - self.ttl,))
+        except sqlite3.Error as e:
+            print(f"Error writing dedup cache: {e}")
+
+    def stats(self):
+        """Return (live entries, expired entries)"""
+        cutoff = time.time() - self.ttl
+        live, expired = self.connect().execute(
+            "SELECT SUM(seen_at >= ?), SUM(seen_at < ?) FROM seen", (cutoff, cutoff)).fetchone()
+        return live or 0, expired or 0
+
+    def purge(self):
+        """Delete expired entries, returning how many were removed"""
+        with self.connect() as connection:
+            return connection.execute("DELETE FROM seen WHERE seen_at < ?", (time.time() - self.ttl,)).rowcount
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ['--help', '-h']:
+        print("Usage: python dedup_cache.py --stats | --purge | --forget MESSAGE-ID")
+        print(f"  Cache: {DEDUP_DB} (TTL {DEDUP_TTL_DAYS:g} days)")
+        sys.exit(0)
+    cache = DedupCache()
+    try:
+        if args[0] == '--stats':
+            live, expired = cache.stats()
+            print(f"{live} live entries, {expired} expired")
+        elif args[0] == '--purge':
+            print(f"Removed {cache.purge()} expired entries")
+        elif args[0] == '--forget' and len(args) > 1:
+            key = message_id_key(args[1])
+            hit = cache.seen(key)
+            with cache.connect() as connection:
+                # Keys recorded together share a title; drop them all so the mail can be re-fed
+                removed = connection.execute("DELETE FROM seen WHERE key = ? OR title = ?",
+                                             (key, hit[1] if hit else None)).rowcount
+            print(f"Removed {removed} entries")
+        else:
+            print(f"Error: unknown option {args[0]}")
+            sys.exit(1)
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
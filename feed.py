@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Segmented JSON-lines feed of ingested advisories for downstream consumers.
+
+Every successful insert appends one record: distro, title, alias, date,
+introtext, advisory id, package, CVE ids and the article id per database.
+Records carry an offset that grows by one per record across all writers.
+Segments are named after the offset of their first record, and a new one
+is started every FEED_SEGMENT_RECORDS records. Only the newest
+FEED_KEEP_SEGMENTS segments are kept.
+
+Offsets are taken under an exclusive lock from the last complete line of
+the newest segment, so there is no counter file to drift. A line left
+half-written by a crashed writer is cut off before the next append.
+
+Consumers keep the offset they have reached, either themselves or as a
+named position under FEED_DIR/consumers. read() opens the segment holding
+that offset and skips to it by line number, so a poll costs one segment
+seek plus the new records, without querying MySQL.
+"""
+
+import os
+import sys
+import json
+import fcntl
+import atexit
+import bisect
+import threading
+from datetime import datetime
+
+# '' disables the feed
+FEED_DIR = os.getenv('FEED_DIR', '/home/alerts/scripts_linstage/feed')
+FEED_SEGMENT_RECORDS = int(os.getenv('FEED_SEGMENT_RECORDS', 5000))
+FEED_KEEP_SEGMENTS = int(os.getenv('FEED_KEEP_SEGMENTS', 200))
+SEGMENT_SUFFIX = '.jsonl'
+TAIL_BYTES = 64 * 1024
+
+
+def segment_path(directory, first_offset):
+    return os.path.join(directory, f"{first_offset:020d}{SEGMENT_SUFFIX}")
+
+
+def segments(directory):
+    """(first offset, path) of every segment, oldest first"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted((int(name[:-len(SEGMENT_SUFFIX)]), os.path.join(directory, name))
+                  for name in names if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit())
+
+
+def next_offset(first_offset, path):
+    """Offset after the last complete record of a segment, cutting off a partial last line"""
+    with open(path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        window = TAIL_BYTES
+        while True:
+            start = max(0, size - window)
+            f.seek(start)
+            tail = f.read(size - start)
+            end = tail.rfind(b'\n')
+            # The last complete line needs the newline before it too, unless it is the first line
+            previous = tail.rfind(b'\n', 0, end) if end != -1 else -1
+            if start == 0 or previous != -1:
+                break
+            window *= 2
+        if start + end + 1 < size:
+            f.truncate(start + end + 1)
+        if end == -1:
+            return first_offset
+        return json.loads(tail[previous + 1:end])['offset'] + 1
+
+
+class Feed:
+    """Appends records to the segmented feed; safe across processes"""
+
+    def __init__(self, directory=FEED_DIR, segment_records=FEED_SEGMENT_RECORDS, keep=FEED_KEEP_SEGMENTS):
+        self.directory = directory
+        self.segment_records = segment_records
+        self.keep = keep
+        self.lock_fd = None
+        self.lock = threading.Lock()
+
+    def append(self, record):
+        """Append one record; returns its offset, or None if the feed is disabled or unwritable"""
+        if not self.directory:
+            return None
+        with self.lock:
+            try:
+                if self.lock_fd is None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    self.lock_fd = os.open(os.path.join(self.directory, '.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self.lock_fd, fcntl.LOCK_EX)
+                try:
+                    return self._append(record)
+                finally:
+                    fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+            except (OSError, ValueError, KeyError) as e:
+                # Consumers can catch up from the ingest log; the insert already succeeded
+                print(f"Error appending to feed: {e}")
+                return None
+
+    def _append(self, record):
+        existing = segments(self.directory)
+        if existing:
+            first, path = existing[-1]
+            offset = next_offset(first, path)
+        else:
+            first, path, offset = 0, None, 0
+        if path is None or offset - first >= self.segment_records:
+            path = segment_path(self.directory, offset)
+            self.prune(existing, self.keep - 1)
+        line = (json.dumps({'offset': offset, **record}, default=str, ensure_ascii=False) + '\n').encode('utf-8')
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            view = memoryview(line)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        return offset
+
+    def prune(self, existing, keep):
+        for _, path in existing[:max(0, len(existing) - keep)]:
+            os.remove(path)
+
+    def close(self):
+        with self.lock:
+            if self.lock_fd is not None:
+                os.close(self.lock_fd)
+                self.lock_fd = None
+
+
+def read(offset=0, directory=FEED_DIR, limit=None):
+    """
+    Yield records with offset >= offset, oldest first. If older segments
+    were pruned, reading starts at the oldest record still kept; compare
+    the first offset returned with the one asked for to detect the gap.
+    """
+    existing = segments(directory)
+    firsts = [first for first, _ in existing]
+    index = max(0, bisect.bisect_right(firsts, offset) - 1)
+    count = 0
+    for first, path in existing[index:]:
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            continue  # Pruned while reading
+        with f:
+            for line_number, line in enumerate(f):
+                # Offsets within a segment are consecutive, so skipped lines are never decoded
+                if first + line_number < offset:
+                    continue
+                if not line.endswith(b'\n'):
+                    return  # Still being written
+                yield json.loads(line)
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+
+
+def position_path(directory, consumer):
+    return os.path.join(directory, 'consumers', consumer)
+
+
+def load_position(consumer, directory=FEED_DIR):
+    """Next offset a named consumer should read, 0 if it has none"""
+    try:
+        with open(position_path(directory, consumer), 'r') as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def save_position(consumer, offset, directory=FEED_DIR):
+    """Atomically store the next offset for a named consumer"""
+    path = position_path(directory, consumer)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(f"{offset}\n")
+    os.replace(tmp_path, path)
+
+
+def consume(consumer, directory=FEED_DIR, limit=None):
+    """New records for a named consumer; the caller saves its position once they are handled"""
+    return list(read(load_position(consumer, directory), directory, limit))
+
+
+_feed = None
+_lock = threading.Lock()
+
+
+def get_feed():
+    """The process-wide feed writer, closed at exit"""
+    global _feed
+    with _lock:
+        if _feed is None:
+            _feed = Feed()
+            atexit.register(_feed.close)
+        return _feed
+
+
+def feed_record(title, introtext, distro, adv_date, alias, facets, cves, articles):
+    """The feed's view of one inserted advisory"""
+    return {'time': datetime.now().isoformat(timespec='milliseconds'), 'distro': distro.lower(), 'title': title,
+            'alias': alias, 'date': adv_date, 'introtext': introtext, 'advisory_id': facets['advisory_id'],
+            'package': facets['package'], 'cves': cves, 'articles': articles}
+
+
+def print_status(directory):
+    existing = segments(directory)
+    if not existing:
+        print(f"{directory}: empty")
+        return
+    end = next_offset(*existing[-1])
+    print(f"{directory}: {len(existing)} segments, offsets {existing[0][0]}..{end - 1}")
+    try:
+        consumers = sorted(os.listdir(os.path.join(directory, 'consumers')))
+    except FileNotFoundError:
+        consumers = []
+    for consumer in consumers:
+        if not consumer.endswith('.tmp'):
+            position = load_position(consumer, directory)
+            print(f"  {consumer:<20} at {position} ({end - position} behind)")
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ['--help', '-h']:
+        print("Usage: python feed.py --status | --read [--from OFFSET] [--limit N] | --consume NAME [--limit N]")
+        print("  --status: Segments, offset range and consumer positions")
+        print("  --read: Print records as JSON lines from OFFSET (default: 0)")
+        print("  --consume NAME: Print NAME's new records and advance its position")
+        print(f"  Feed: {FEED_DIR or '(disabled)'} (FEED_DIR), {FEED_SEGMENT_RECORDS} records per segment")
+        sys.exit(0)
+    if not FEED_DIR:
+        print("Error: FEED_DIR is empty, the feed is disabled")
+        sys.exit(1)
+
+    command = args.pop(0)
+    options = {'from': 0, 'limit': None, 'name': None}
+    if command == '--consume':
+        if not args:
+            print("Error: --consume requires a name")
+            sys.exit(1)
+        options['name'] = args.pop(0)
+    while args:
+        arg = args.pop(0)
+        if arg not in ['--from', '--limit'] or not args:
+            print(f"Error: unknown option or missing value: {arg}")
+            sys.exit(1)
+        options[arg[2:]] = int(args.pop(0))
+
+    if command == '--status':
+        print_status(FEED_DIR)
+    elif command == '--read':
+        for record in read(options['from'], FEED_DIR, options['limit']):
+            print(json.dumps(record, ensure_ascii=False))
+    elif command == '--consume':
+        records = consume(options['name'], FEED_DIR, options['limit'])
+        for record in records:
+            print(json.dumps(record, ensure_ascii=False))
+        if records:
+            save_position(options['name'], records[-1]['offset'] + 1, FEED_DIR)
+    else:
+        print(f"Error: unknown option {command}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Structured ingest log: one JSON line per advisory insert attempt.
+
+Records are buffered in the process and appended with a single O_APPEND
+write of whole lines, so concurrent alert scripts never interleave partial
+lines. The live file is rotated when it outgrows INGEST_LOG_MAX_BYTES or its
+rotation period ends, rotated files are gzipped, and only the newest
+INGEST_LOG_KEEP are kept. Writers hold a shared lock while appending and
+rotation takes it exclusively, so nothing is written to a file once it has
+been renamed. Running this module filters the live and rotated logs.
+"""
+
+import os
+import sys
+import glob
+import gzip
+import json
+import time
+import fcntl
+import atexit
+import shutil
+import threading
+from datetime import datetime
+
+INGEST_LOG = os.getenv('INGEST_LOG', '/home/alerts/scripts_linstage/ingest.jsonl')
+INGEST_LOG_MAX_BYTES = int(os.getenv('INGEST_LOG_MAX_BYTES', 50 * 1024 * 1024))
+# Rotation periods are aligned to the epoch, so the default rotates at midnight UTC
+INGEST_LOG_ROTATE_SECONDS = float(os.getenv('INGEST_LOG_ROTATE_SECONDS', 86400))
+INGEST_LOG_KEEP = int(os.getenv('INGEST_LOG_KEEP', 90))
+BUFFER_BYTES = 64 * 1024
+FLUSH_SECONDS = 1.0
+STAMP_FORMAT = '%Y%m%d-%H%M%S'
+
+
+class IngestLog:
+    """Buffered, rotating JSONL log shared by concurrent processes"""
+
+    def __init__(self, path=INGEST_LOG, max_bytes=INGEST_LOG_MAX_BYTES,
+                 rotate_seconds=INGEST_LOG_ROTATE_SECONDS, keep=INGEST_LOG_KEEP):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.keep = keep
+        self.fd = None
+        self.lock_fd = None
+        self.buffer = []
+        self.buffered = 0
+        self.flushed_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def write(self, event, **fields):
+        """Buffer one record; flushed when the buffer fills, after FLUSH_SECONDS or on close"""
+        if not self.path:
+            return
+        record = {'time': datetime.now().isoformat(timespec='milliseconds'), 'pid': os.getpid(),
+                  'event': event, **fields}
+        line = (json.dumps(record, default=str, ensure_ascii=False) + '\n').encode('utf-8')
+        with self.lock:
+            self.buffer.append(line)
+            self.buffered += len(line)
+            if self.buffered >= BUFFER_BYTES or time.monotonic() - self.flushed_at >= FLUSH_SECONDS:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            for fd in (self.fd, self.lock_fd):
+                if fd is not None:
+                    os.close(fd)
+            self.fd = self.lock_fd = None
+
+    def _flush(self):
+        self.flushed_at = time.monotonic()
+        if not self.buffer:
+            return
+        data = b''.join(self.buffer)
+        self.buffer, self.buffered = [], 0
+        try:
+            if self.lock_fd is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self.lock_fd = os.open(self.path + '.lock', os.O_WRONLY | os.O_CREAT, 0o644)
+            rotated = self._rotate_if_due()
+            fcntl.flock(self.lock_fd, fcntl.LOCK_SH)
+            try:
+                self._reopen_if_rotated()
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(self.fd, view):]
+            finally:
+                fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+            if rotated:
+                self._compress(rotated)
+        except OSError as e:
+            print(f"Error writing ingest log: {e}")
+
+    def _reopen_if_rotated(self):
+        """Point our descriptor at the live file, which another process may have renamed"""
+        try:
+            current = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            current = None
+        if self.fd is not None and os.fstat(self.fd).st_ino == current:
+            return
+        if self.fd is not None:
+            os.close(self.fd)
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _due(self, stat, now):
+        if stat.st_size == 0:
+            return False
+        if self.max_bytes and stat.st_size >= self.max_bytes:
+            return True
+        return bool(self.rotate_seconds) and \
+            stat.st_mtime // self.rotate_seconds != now // self.rotate_seconds
+
+    def _rotate_if_due(self):
+        """Rename the live file if it is due; returns the renamed path or None"""
+        now = time.time()
+        try:
+            if not self._due(os.stat(self.path), now):
+                return None
+        except FileNotFoundError:
+            return None
+        fcntl.flock(self.lock_fd, fcntl.LOCK_EX)
+        try:
+            # Another process may have rotated while we waited for the lock
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return None
+            if not self._due(stat, now):
+                return None
+            # Nanoseconds keep names unique and in order when small files rotate within a second
+            base = (f"{self.path}.{datetime.fromtimestamp(stat.st_mtime).strftime(STAMP_FORMAT)}"
+                    f"-{stat.st_mtime_ns % 10 ** 9:09d}")
+            rotated, n = base, 0
+            while os.path.exists(rotated) or os.path.exists(rotated + '.gz'):
+                n += 1
+                rotated = f"{base}-{n}"
+            os.rename(self.path, rotated)
+            return rotated
+        finally:
+            fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+
+    def _compress(self, rotated):
+        with open(rotated, 'rb') as src, gzip.open(rotated + '.gz.tmp', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(rotated + '.gz.tmp', rotated + '.gz')
+        os.remove(rotated)
+        if self.keep:
+            for old in rotated_logs(self.path)[:-self.keep]:
+                os.remove(old)
+
+
+def rotated_logs(path=INGEST_LOG):
+    """Compressed rotated logs, oldest first (the stamps sort by time)"""
+    return sorted(glob.glob(glob.escape(path) + '.*.gz'))
+
+
+def rotated_stamp(rotated):
+    """Time of the last write to a rotated log, from its name"""
+    try:
+        return datetime.strptime(rotated.rsplit('.', 2)[-2][:15], STAMP_FORMAT)
+    except ValueError:
+        return None
+
+
+def read_records(path=INGEST_LOG, since=None):
+    """Yield records from the rotated and live logs, oldest first, skipping malformed lines"""
+    for log in rotated_logs(path) + [path]:
+        if log != path and since:
+            stamp = rotated_stamp(log)
+            if stamp and stamp < since.replace(microsecond=0):
+                continue  # Every record in it is older than since
+        try:
+            f = gzip.open(log, 'rt', encoding='utf-8') if log.endswith('.gz') else open(log, encoding='utf-8')
+        except FileNotFoundError:
+            continue
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                yield record
+
+
+def query(records, distro=None, outcome=None, since=None, until=None, title=None):
+    """Filter records; since and until are datetimes, the rest exact (title: substring)"""
+    for record in records:
+        if distro and record.get('distro', '').lower() != distro.lower():
+            continue
+        if outcome and record.get('outcome') != outcome:
+            continue
+        if title and title.lower() not in record.get('title', '').lower():
+            continue
+        if since or until:
+            try:
+                when = datetime.fromisoformat(record['time'])
+            except (KeyError, ValueError):
+                continue
+            if (since and when < since) or (until and when >= until):
+                continue
+        yield record
+
+
+_ingest_log = None
+_lock = threading.Lock()
+
+
+def get_ingest_log():
+    """The process-wide ingest log, flushed and closed at exit"""
+    global _ingest_log
+    with _lock:
+        if _ingest_log is None:
+            _ingest_log = IngestLog()
+            atexit.register(_ingest_log.close)
+        return _ingest_log
+
+
+def print_record(record):
+    detail = record.get('reason') or ' '.join(f"{db}={article}" for db, article in record.get('articles', {}).items())
+    print(f"{record.get('time', '')} {record.get('outcome', record.get('event', '')):<13} "
+          f"[{record.get('distro', '')}] {record.get('title', '')}{'  ' + detail if detail else ''}")
+
+
+def print_usage():
+    print("Usage: python ingest_log.py [OPTIONS]")
+    print("  --distro NAME: Only records for this distro")
+    print("  --outcome OUTCOME: inserted, duplicate, alias_exists or failed")
+    print("  --since TIME, --until TIME: ISO date or time range, e.g. 2024-05-01 or 2024-05-01T12:00")
+    print("  --title TEXT: Only titles containing TEXT")
+    print("  --json: Print matching records as JSON lines")
+    print(f"  Log: {INGEST_LOG} (INGEST_LOG), plus its rotated .gz files")
+
+
+def main():
+    args = sys.argv[1:]
+    if '--help' in args or '-h' in args:
+        print_usage()
+        sys.exit(0)
+    options = {}
+    as_json = False
+    while args:
+        arg = args.pop(0)
+        if arg == '--json':
+            as_json = True
+        elif arg in ['--distro', '--outcome', '--since', '--until', '--title'] and args:
+            options[arg[2:]] = args.pop(0)
+        else:
+            print(f"Error: unknown option {arg}")
+            sys.exit(1)
+    try:
+        for name in ['since', 'until']:
+            if name in options:
+                options[name] = datetime.fromisoformat(options[name])
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    count = 0
+    records = read_records(since=options.get('since'))
+    for record in query(records, **options):
+        count += 1
+        if as_json:
+            print(json.dumps(record, ensure_ascii=False))
+        else:
+            print_record(record)
+    if not as_json:
+        print(f"{count} records")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,604 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test of the alert scripts against local stand-ins.
+
+Nothing here touches production. The harness starts:
+
+- a MySQL server on a free loopback port, with throwaway lsv7 and
+  lsv7j5beta databases holding the xu5gc_content, xu5gc_assets,
+  xu5gc_workflow_associations and CVE tables. `mysqld` from PATH is
+  initialised in a temporary directory; without one, point --mysql at a
+  disposable local server, e.g. one started with
+  `docker run --rm -p 3399:3306 -e MYSQL_ALLOW_EMPTY_PASSWORD=1 mysql:8.0`
+- a stub of the OpenAI chat completions endpoint with configurable latency,
+  jitter and error rate
+- an SMTP sink standing in for the MTA, capturing every notification the
+  scripts send (notifier.py only falls back to /usr/sbin/sendmail when SMTP
+  is down)
+
+The seeded tables get --rows filler articles beforehand, spread over the
+categories, so runs at several sizes show how the title and alias duplicate
+checks scale. Messages from the synthetic corpus (bench_corpus.py) or an
+mbox are then piped into the real per-distro alert scripts, one process per
+message as the MTA does, at a fixed arrival rate with bounded concurrency.
+Latency is measured from each message's scheduled arrival to its script's
+exit, so queueing behind a slow run is counted. The scripts' own timing log
+gives the outcome and per-stage breakdown.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import mailbox
+import tempfile
+import threading
+import subprocess
+import socketserver
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from email import message_from_bytes
+from email.utils import make_msgid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cve_index import CREATE_TABLE_SQL
+from timing import aggregate, percentile, print_aggregate, read_records
+import bench_corpus
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATABASES = ['lsv7', 'lsv7j5beta']
+ENTRY_POINTS = {
+    'debian': 'debian_alert3.py',
+    'fedora': 'fedora_alert3.py',
+    'mageia': 'mageia_alert1.py',
+    'opensuse': 'opensuse_alert.py',
+}
+# Created in every seeded database; only databases carrying it are ever dropped
+MARKER_TABLE = 'loadtest_marker'
+SEED_BATCH = 1000
+ALIAS_STOP_WORDS = {'security', 'advisory', 'update', 'updates', 'fix', 'bug', 'and', 'the', 'for', 'important',
+                    'moderate', 'low', 'critical'}
+
+SCHEMA = [
+    """
+    CREATE TABLE xu5gc_content (
+        id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+        asset_id INT UNSIGNED NOT NULL DEFAULT 0,
+        title VARCHAR(255) NOT NULL DEFAULT '',
+        alias VARCHAR(400) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL DEFAULT '',
+        introtext MEDIUMTEXT NOT NULL,
+        `fulltext` MEDIUMTEXT NOT NULL,
+        state TINYINT NOT NULL DEFAULT 0,
+        catid INT UNSIGNED NOT NULL DEFAULT 0,
+        created DATETIME NOT NULL,
+        created_by INT UNSIGNED NOT NULL DEFAULT 0,
+        created_by_alias VARCHAR(255) NOT NULL DEFAULT '',
+        modified DATETIME NOT NULL,
+        modified_by INT UNSIGNED NOT NULL DEFAULT 0,
+        checked_out INT UNSIGNED,
+        checked_out_time DATETIME NULL,
+        publish_up DATETIME NULL,
+        publish_down DATETIME NULL,
+        images TEXT NOT NULL,
+        urls TEXT NOT NULL,
+        attribs VARCHAR(5120) NOT NULL,
+        version INT UNSIGNED NOT NULL DEFAULT 1,
+        ordering INT NOT NULL DEFAULT 0,
+        metakey TEXT,
+        metadesc TEXT NOT NULL,
+        access INT UNSIGNED NOT NULL DEFAULT 0,
+        hits INT UNSIGNED NOT NULL DEFAULT 0,
+        metadata TEXT NOT NULL,
+        language CHAR(7) NOT NULL,
+        PRIMARY KEY (id),
+        KEY idx_access (access),
+        KEY idx_state (state),
+        KEY idx_catid (catid),
+        KEY idx_alias (alias(191)),
+        KEY idx_language (language)
+    )
+    """,
+    """
+    CREATE TABLE xu5gc_assets (
+        id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+        parent_id INT NOT NULL DEFAULT 0,
+        lft INT NOT NULL DEFAULT 0,
+        rgt INT NOT NULL DEFAULT 0,
+        level INT UNSIGNED NOT NULL,
+        name VARCHAR(50) NOT NULL,
+        title VARCHAR(100) NOT NULL,
+        rules VARCHAR(5120) NOT NULL,
+        PRIMARY KEY (id),
+        UNIQUE KEY idx_asset_name (name),
+        KEY idx_lft_rgt (lft, rgt),
+        KEY idx_parent_id (parent_id)
+    )
+    """,
+    """
+    CREATE TABLE xu5gc_workflow_associations (
+        item_id INT UNSIGNED NOT NULL DEFAULT 0,
+        stage_id INT UNSIGNED NOT NULL,
+        extension VARCHAR(50) NOT NULL,
+        PRIMARY KEY (item_id, extension),
+        KEY idx_item_stage_extension (item_id, stage_id, extension),
+        KEY idx_stage (stage_id)
+    )
+    """,
+    CREATE_TABLE_SQL,
+    f"CREATE TABLE {MARKER_TABLE} (created DATETIME NOT NULL)",
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def alias_slug(text):
+    """Alias words the stub model answers with: the first few meaningful words of the title"""
+    title = text.split(': ', 1)[-1].lower()
+    words = [w for w in re.findall(r'[a-z0-9][a-z0-9.\-]*', title) if w not in ALIAS_STOP_WORDS]
+    return '-'.join(words[:4])[:40] or 'advisory'
+
+
+class AIStub(ThreadingHTTPServer):
+    """Chat completions endpoint answering alias requests after a random delay"""
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.3, jitter=0.1, error_rate=0.0, seed=None):
+        super().__init__(('127.0.0.1', 0), AIStubHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def draw(self):
+        """(delay in seconds, whether to fail) for the next request"""
+        with self.lock:
+            self.calls += 1
+            fail = self.rng.random() < self.error_rate
+            self.errors += fail
+            return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)), fail
+
+
+class AIStubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        if not self.path.endswith('/chat/completions'):
+            self.reply(404, {'error': {'message': f"no route {self.path}", 'type': 'invalid_request_error'}})
+            return
+        delay, fail = self.server.draw()
+        time.sleep(delay)
+        if fail:
+            self.reply(500, {'error': {'message': 'stub failure', 'type': 'server_error'}})
+            return
+        content = json.dumps({'string': alias_slug(request['messages'][-1]['content'])})
+        self.reply(200, {
+            'id': f"chatcmpl-stub{self.server.calls}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', ''),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        })
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    """Minimal SMTP server keeping every message it is handed, optionally as .eml files"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, directory=None):
+        super().__init__(('127.0.0.1', 0), SmtpSinkHandler)
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.messages = []
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def capture(self, sender, recipients, data):
+        msg = message_from_bytes(data)
+        with self.lock:
+            self.messages.append({'from': sender, 'to': recipients, 'subject': msg.get('Subject', '')})
+            if self.directory:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(os.path.join(self.directory, f"{len(self.messages):06d}.eml"), 'wb') as f:
+                    f.write(data)
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.reply('220 loadtest ESMTP')
+        sender, recipients = None, []
+        for line in self.rfile:
+            command = line.decode('ascii', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ['EHLO', 'HELO']:
+                self.reply('250 loadtest')
+            elif verb == 'MAIL':
+                sender, recipients = command.partition(':')[2].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.partition(':')[2].strip())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                for data_line in self.rfile:
+                    if data_line.rstrip(b'\r\n') == b'.':
+                        break
+                    lines.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                self.server.capture(sender, recipients, b''.join(lines))
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode('ascii'))
+
+
+def start_mysqld(directory, port):
+    """Initialise and start a private mysqld; returns its process, or None if there is no mysqld"""
+    binary = shutil.which('mysqld')
+    if not binary:
+        return None
+    datadir = os.path.join(directory, 'mysql')
+    user = ['--user=root'] if os.geteuid() == 0 else []
+    subprocess.run([binary, '--no-defaults', '--initialize-insecure', f"--datadir={datadir}", *user],
+                   check=True, capture_output=True)
+    log = open(os.path.join(directory, 'mysqld.log'), 'ab')
+    # Joomla rows hold zero dates, which the default strict sql_mode rejects
+    proc = subprocess.Popen([binary, '--no-defaults', f"--datadir={datadir}", f"--port={port}",
+                             '--bind-address=127.0.0.1', f"--socket={os.path.join(directory, 'mysqld.sock')}",
+                             f"--pid-file={os.path.join(directory, 'mysqld.pid')}", '--mysqlx=OFF', '--skip-log-bin',
+                             '--sql-mode=NO_ENGINE_SUBSTITUTION', '--max-connections=500', *user],
+                            stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"mysqld exited with {proc.returncode}, see {directory}/mysqld.log")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"mysqld did not start within 60s, see {directory}/mysqld.log")
+
+
+def parse_server(value):
+    """{'user', 'password', 'host', 'port'} from USER[:PASSWORD]@HOST:PORT"""
+    credentials, _, address = value.rpartition('@')
+    user, _, password = (credentials or 'root').partition(':')
+    host, _, port = address.partition(':')
+    return {'user': user, 'password': password, 'host': host or '127.0.0.1', 'port': int(port or 3306)}
+
+
+def reset_databases(cursor):
+    """Drop and recreate the test databases, refusing to drop any the harness did not create"""
+    cursor.execute("SHOW DATABASES")
+    existing = {row[0] for row in cursor.fetchall()}
+    for dbname in DATABASES:
+        if dbname in existing:
+            cursor.execute("SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = %s "
+                           "AND table_name = %s", (dbname, MARKER_TABLE))
+            if not cursor.fetchone()[0]:
+                raise RuntimeError(f"database {dbname} exists and was not created by loadtest.py; "
+                                   "refusing to drop it")
+            cursor.execute(f"DROP DATABASE `{dbname}`")
+        cursor.execute(f"CREATE DATABASE `{dbname}` CHARACTER SET utf8mb4")
+
+
+def filler_rows(start, count, catids, rng):
+    """Published content rows for articles LOADTEST-start .. start+count-1"""
+    rows = []
+    for n in range(start, start + count):
+        catid = catids[n % len(catids)]
+        package = rng.choice(bench_corpus.PACKAGES)
+        text = ' '.join(bench_corpus.sentence(rng) for _ in range(8))
+        rows.append((f"Loadtest: LOADTEST-{n}-1: {package} security update", f"loadtest-{n}-{package}",
+                     text[:200], f"<pre>{text}</pre>", 1, catid, '2024-01-01 00:00:00', 62, '',
+                     '2024-01-01 00:00:00', 0, 0, '{}', '', '{}', '', '{}', '*'))
+    return rows
+
+
+def seed(server, rows, catids, seed_value=0):
+    """Recreate both databases with category assets and `rows` filler articles each"""
+    import mysql.connector
+    connection = mysql.connector.connect(**server, autocommit=True)
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SET GLOBAL sql_mode = 'NO_ENGINE_SUBSTITUTION'")
+        reset_databases(cursor)
+        for dbname in DATABASES:
+            cursor.execute(f"USE `{dbname}`")
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            cursor.execute(f"INSERT INTO {MARKER_TABLE} VALUES (NOW())")
+            cursor.execute("INSERT INTO xu5gc_assets (id, parent_id, lft, rgt, level, name, title, rules) "
+                           "VALUES (1, 0, 0, 1, 0, 'root.1', 'Root Asset', '{}')")
+            # insert_advisory appends after the highest lft under the category, so every category has one
+            cursor.executemany("INSERT INTO xu5gc_assets (parent_id, lft, rgt, level, name, title, rules) "
+                               "VALUES (1, %s, %s, 3, %s, %s, '{}')",
+                               [(i * 2 + 1, i * 2 + 2, f"com_content.category.{catid}", f"Category {catid}")
+                                for i, catid in enumerate(catids)])
+            cursor.execute("SELECT id FROM xu5gc_assets WHERE level = 3")
+            cursor.executemany("INSERT INTO xu5gc_assets (parent_id, lft, rgt, level, name, title, rules) "
+                               "VALUES (%s, 1, 2, 4, %s, 'Placeholder', '{}')",
+                               [(asset_id, f"com_content.article.placeholder{asset_id}")
+                                for asset_id, in cursor.fetchall()])
+            rng = random.Random(seed_value)
+            for start in range(0, rows, SEED_BATCH):
+                cursor.executemany(
+                    "INSERT INTO xu5gc_content (title, alias, introtext, `fulltext`, state, catid, created, "
+                    "created_by, created_by_alias, modified, modified_by, checked_out, images, urls, attribs, "
+                    "metadesc, metadata, access, language) "
+                    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 1, %s)",
+                    filler_rows(start, min(SEED_BATCH, rows - start), catids, rng))
+            cursor.execute("ANALYZE TABLE xu5gc_content, xu5gc_assets")
+            cursor.fetchall()
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def build_corpus(count, seed_value=1234, sizes=None, mbox=None):
+    """count (spec name or None, raw message) pairs, cycling through the source"""
+    if mbox:
+        source = [(None, message.as_string()) for message in mailbox.mbox(mbox)]
+        if not source:
+            raise ValueError(f"{mbox} holds no messages")
+        # Repeats keep their Message-ID, as a list resend would
+        return [source[i % len(source)] for i in range(count)]
+
+    messages = []
+    batch = 0
+    while len(messages) < count:
+        for spec, _, raw in bench_corpus.generate_corpus(seed_value + batch, sizes or ['small', 'medium']):
+            messages.append((spec, f"Message-ID: {make_msgid('loadtest')}\n{raw}"))
+        batch += 1
+    return messages[:count]
+
+
+def state_env(directory, server, ai_url, smtp_port):
+    """Environment for the alert scripts: stand-ins for every service, all state under directory"""
+    env = dict(os.environ)
+    for name in ['ORGANIZATION', 'PROJECT_ID']:
+        env.pop(name, None)
+    env.update({
+        'DB_HOST': server['host'], 'DB_PORT': str(server['port']), 'DB_USER': server['user'],
+        'DB_PASSWORD': server['password'],
+        'OPENAI_BASE_URL': ai_url, 'OPENAI_API_KEY': 'loadtest',
+        'NOTIFY_SMTP_HOST': '127.0.0.1', 'NOTIFY_SMTP_PORT': str(smtp_port),
+        'NOTIFY_DB': os.path.join(directory, 'notify.sqlite3'),
+        'ALERT_TIMING_LOG': os.path.join(directory, 'timings.jsonl'),
+        'ALERT_PROFILE_DIR': os.path.join(directory, 'profiles'),
+        'SPOOL_DIR': os.path.join(directory, 'spool'),
+        'METRICS_TEXTFILE': os.path.join(directory, 'metrics', 'alerts.prom'),
+        'METRICS_STATE': os.path.join(directory, 'metrics', 'alerts-state.json'),
+        'BREAKER_DIR': os.path.join(directory, 'breakers'),
+        'COALESCE_DB': os.path.join(directory, 'coalesce.sqlite3'),
+        'DEDUP_DB': os.path.join(directory, 'dedup.sqlite3'),
+        'PARSE_CACHE_DB': os.path.join(directory, 'parse-cache.sqlite3'),
+        'SCHED_DB': os.path.join(directory, 'scheduler.sqlite3'),
+        'INGEST_LOG': os.path.join(directory, 'ingest.jsonl'),
+        'SEARCH_DB': os.path.join(directory, 'search.sqlite3'),
+        'FEED_DIR': os.path.join(directory, 'feed'),
+        'THROTTLE_PAUSE_FILE': os.path.join(directory, 'throttle.pause'),
+    })
+    os.makedirs(directory, exist_ok=True)
+    return env
+
+
+def replay(messages, rate, concurrency, env, log_path, command=None):
+    """
+    Pipe each message into its alert script, message i arriving at i / rate
+    seconds; returns ([(latency seconds, exit code)], elapsed seconds)
+    """
+    with open(log_path, 'ab') as log:
+        start = time.perf_counter() + 0.1
+
+        def deliver(index, spec, raw):
+            due = start + index / rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            argv = command or [sys.executable, os.path.join(HERE, ENTRY_POINTS.get(spec, 'alert_dispatch.py'))]
+            proc = subprocess.run(argv, input=raw.encode('utf-8'), env=env, cwd=HERE, stdout=log,
+                                  stderr=subprocess.STDOUT)
+            return time.perf_counter() - due, proc.returncode
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda item: deliver(item[0], *item[1]), enumerate(messages)))
+        return results, time.perf_counter() - start
+
+
+def summarize(results, elapsed):
+    """Throughput, latency percentiles and exit codes of one replay"""
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    return {
+        'messages': len(results),
+        'seconds': round(elapsed, 3),
+        'messages_per_second': round(len(results) / elapsed, 2) if elapsed > 0 else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50), 1),
+        'p95_ms': round(percentile(latencies, 0.95), 1),
+        'p99_ms': round(percentile(latencies, 0.99), 1),
+        'max_ms': round(latencies[-1], 1),
+        'exit_codes': dict(Counter(code for _, code in results)),
+    }
+
+
+def run_size(rows, options, server, catids, messages, ai, smtp, directory):
+    """Seed `rows` filler articles, replay the corpus and return the report for that size"""
+    print(f"Seeding {rows} filler articles per database...", file=sys.stderr)
+    seed(server, rows, catids, options['seed'])
+    state = os.path.join(directory, f"rows-{rows}")
+    env = state_env(state, server, ai.url, smtp.port)
+    calls, errors, mails = ai.calls, ai.errors, len(smtp.messages)
+    print(f"Replaying {len(messages)} messages at {options['rate']}/s, concurrency {options['concurrency']}...",
+          file=sys.stderr)
+    results, elapsed = replay(messages, options['rate'], options['concurrency'], env,
+                              os.path.join(state, 'scripts.log'))
+
+    report = {'rows': rows, **summarize(results, elapsed)}
+    timing_log = env['ALERT_TIMING_LOG']
+    records = list(read_records([timing_log])) if os.path.exists(timing_log) else []
+    report['outcomes'] = dict(Counter(record.get('outcome', '') for record in records))
+    stages = aggregate(records).get('all', {})
+    for stage in ['duplicate_check', 'alias_check', 'insert']:
+        if stage in stages:
+            report[f"{stage}_p50_ms"] = round(percentile(stages[stage], 0.50), 2)
+            report[f"{stage}_p95_ms"] = round(percentile(stages[stage], 0.95), 2)
+    report['ai_calls'] = ai.calls - calls
+    report['ai_errors'] = ai.errors - errors
+    report['mails'] = len(smtp.messages) - mails
+    if options['stages'] and records:
+        print_aggregate(aggregate(records))
+    return report
+
+
+def print_report(reports):
+    print(f"{'rows':>9} {'msgs':>6} {'msg/s':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'dup p50':>8} {'dup p95':>8} {'ai':>5} {'mails':>5}  outcomes")
+    for report in reports:
+        outcomes = ' '.join(f"{name}={count}" for name, count in sorted(report['outcomes'].items()))
+        print(f"{report['rows']:>9} {report['messages']:>6} {report['messages_per_second']:>7.2f} "
+              f"{report['p50_ms']:>9.1f} {report['p95_ms']:>9.1f} {report['p99_ms']:>9.1f} "
+              f"{report.get('duplicate_check_p50_ms', 0):>8.2f} {report.get('duplicate_check_p95_ms', 0):>8.2f} "
+              f"{report['ai_calls']:>5} {report['mails']:>5}  {outcomes}")
+
+
+def print_usage():
+    """Print command line help"""
+    print("Usage: python loadtest.py [options]")
+    print("  Replay advisories through the alert scripts against local MySQL, OpenAI and SMTP stand-ins")
+    print("  --messages N: Messages per run (default: 200)")
+    print("  --rate N: Arrivals per second (default: 5)")
+    print("  --concurrency N: Alert scripts running at once, like the MTA's delivery limit (default: 8)")
+    print("  --rows N[,N...]: Filler articles per database; one run per size (default: 0)")
+    print("  --size NAME: Corpus message size: small, medium, kernel (repeatable; default: small, medium)")
+    print("  --mbox FILE: Replay this mbox instead of the synthetic corpus")
+    print("  --mysql USER[:PASS]@HOST:PORT: Use this disposable local server instead of starting mysqld")
+    print("  --ai-latency MS: Stub model response time (default: 300)")
+    print("  --ai-jitter MS: Uniform +/- jitter on the response time (default: 100)")
+    print("  --ai-errors FRACTION: Share of stub requests answered with HTTP 500 (default: 0)")
+    print("  --seed N: Corpus and filler seed (default: 1234)")
+    print("  --stages: Also print per-stage timings of each run")
+    print("  --json FILE: Write the reports to FILE")
+    print("  --keep: Keep the working directory (logs, captured mail, script state)")
+
+
+def main():
+    options = {'messages': 200, 'rate': 5.0, 'concurrency': 8, 'rows': [0], 'size': [], 'mbox': None,
+               'mysql': None, 'ai-latency': 300.0, 'ai-jitter': 100.0, 'ai-errors': 0.0, 'seed': 1234,
+               'stages': False, 'json': None, 'keep': False}
+    args = sys.argv[1:]
+    while args:
+        arg = args.pop(0)
+        name, _, value = arg.partition('=')
+        if name in ['--help', '-h']:
+            print_usage()
+            sys.exit(0)
+        if name in ['--stages', '--keep']:
+            options[name[2:]] = True
+            continue
+        if name[2:] not in options or not name.startswith('--'):
+            print(f"Error: unknown option {arg}")
+            sys.exit(1)
+        if not value:
+            if not args:
+                print(f"Error: {name} requires a value")
+                sys.exit(1)
+            value = args.pop(0)
+        key = name[2:]
+        if key == 'rows':
+            options[key] = [int(x) for x in value.split(',')]
+        elif key == 'size':
+            options[key].append(value)
+        elif key in ['messages', 'concurrency']:
+            options[key] = max(1, int(value))
+        elif key == 'seed':
+            options[key] = int(value)
+        elif key in ['rate', 'ai-latency', 'ai-jitter', 'ai-errors']:
+            options[key] = float(value)
+        else:
+            options[key] = value
+    if options['rate'] <= 0:
+        print("Error: --rate must be positive")
+        sys.exit(1)
+
+    directory = tempfile.mkdtemp(prefix='alerts-loadtest-')
+    mysqld = None
+    ai = AIStub(options['ai-latency'] / 1000, options['ai-jitter'] / 1000, options['ai-errors'], options['seed'])
+    smtp = SmtpSink(os.path.join(directory, 'mail'))
+    for server_thread in [ai, smtp]:
+        threading.Thread(target=server_thread.serve_forever, daemon=True).start()
+    try:
+        if options['mysql']:
+            server = parse_server(options['mysql'])
+        else:
+            server = {'user': 'root', 'password': '', 'host': '127.0.0.1', 'port': free_port()}
+            mysqld = start_mysqld(directory, server['port'])
+            if not mysqld:
+                print("Error: no mysqld on PATH; start a disposable server and pass --mysql, e.g.")
+                print("  docker run --rm -p 3399:3306 -e MYSQL_ALLOW_EMPTY_PASSWORD=1 mysql:8.0")
+                print("  python loadtest.py --mysql root@127.0.0.1:3399")
+                sys.exit(1)
+        if server['host'] not in ['127.0.0.1', 'localhost', '::1']:
+            print(f"Error: {server['host']} is not a loopback address; the harness only seeds local servers")
+            sys.exit(1)
+
+        from advisory import Advisory
+        catids = sorted(set(Advisory().category_map.values()))
+        messages = build_corpus(options['messages'], options['seed'], options['size'], options['mbox'])
+        reports = [run_size(rows, options, server, catids, messages, ai, smtp, directory)
+                   for rows in options['rows']]
+        print_report(reports)
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(reports, f, indent=2)
+    finally:
+        ai.shutdown()
+        smtp.shutdown()
+        if mysqld:
+            mysqld.terminate()
+            mysqld.wait()
+        if options['keep']:
+            print(f"Working directory kept: {directory}", file=sys.stderr)
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped mbox offset index with a resumable import checkpoint.
+
+The index stores the byte offset of every "From " separator in a compact
+array written next to the mbox (<mbox>.idx). Messages are then read as
+(offset, length) slices of the mapping without loading the archive, and
+<mbox>.idx.done records the end offset of the last committed message so an
+interrupted import can pick up where it stopped.
+"""
+
+import os
+import sys
+import mmap
+import struct
+from array import array
+
+INDEX_SUFFIX = '.idx'
+CHECKPOINT_SUFFIX = '.idx.done'
+INDEX_MAGIC = b'MBXIDX1\0'
+INDEX_HEADER = struct.Struct('<8sQQ')  # magic, mbox size, offset count
+
+_mappings = {}
+
+
+def open_mapping(path):
+    """Return a read-only mapping of the mbox, cached per process"""
+    mm = _mappings.get(path)
+    if mm is None:
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _mappings[path] = mm
+    return mm
+
+
+def scan_offsets(mm, start=0, offsets=None):
+    """Append the offset of every 'From ' separator at or after start"""
+    if offsets is None:
+        offsets = array('Q')
+    if start == 0 and mm[:5] == b'From ':
+        offsets.append(0)
+    pos = max(start - 1, 0)
+    while True:
+        pos = mm.find(b'\nFrom ', pos)
+        if pos == -1:
+            break
+        offsets.append(pos + 1)
+        pos += 1
+    return offsets
+
+
+def load_index(path):
+    """Return (mbox size, offsets) from the index file, or (0, None) if missing or corrupt"""
+    try:
+        with open(path + INDEX_SUFFIX, 'rb') as f:
+            magic, size, count = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+            if magic != INDEX_MAGIC:
+                return 0, None
+            offsets = array('Q')
+            offsets.fromfile(f, count)
+            return size, offsets
+    except (OSError, EOFError, struct.error):
+        return 0, None
+
+
+def write_index(path, size, offsets):
+    """Atomically write the index file next to the mbox"""
+    tmp_path = path + INDEX_SUFFIX + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, size, len(offsets)))
+        offsets.tofile(f)
+    os.replace(tmp_path, path + INDEX_SUFFIX)
+
+
+def get_index(path):
+    """
+    Return the separator offsets for an mbox, building or extending the index.
+    An mbox that only grew since the last index is scanned from the old end;
+    one that shrank is rescanned from the start.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return array('Q')
+
+    indexed_size, offsets = load_index(path)
+    if offsets is not None and indexed_size == size:
+        return offsets
+
+    mm = open_mapping(path)
+    if len(mm) != size:
+        # Stale mapping from before the file grew
+        _mappings.pop(path).close()
+        mm = open_mapping(path)
+
+    if offsets is not None and 0 < indexed_size < size:
+        offsets = scan_offsets(mm, indexed_size, offsets)
+    else:
+        offsets = scan_offsets(mm)
+    write_index(path, size, offsets)
+    return offsets
+
+
+def iter_ranges(path, offsets, start_offset=0):
+    """Yield (offset, length) for each message starting at or after start_offset"""
+    size = os.path.getsize(path)
+    for i, offset in enumerate(offsets):
+        if offset < start_offset:
+            continue
+        end = offsets[i + 1] if i + 1 < len(offsets) else size
+        yield offset, end - offset
+
+
+def read_message(path, offset, length):
+    """Decode one message slice, dropping its 'From ' separator line"""
+    view = memoryview(open_mapping(path))[offset:offset + length]
+    newline = open_mapping(path).find(b'\n', offset, offset + length)
+    body_start = newline - offset + 1 if newline != -1 else 0
+    try:
+        return str(view[body_start:], 'utf-8', 'ignore')
+    finally:
+        view.release()
+
+
+def load_checkpoint(path):
+    """Return the end offset of the last committed message, or 0"""
+    try:
+        with open(path + CHECKPOINT_SUFFIX, 'r') as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def save_checkpoint(path, offset):
+    """Atomically record the end offset of the last committed message"""
+    tmp_path = path + CHECKPOINT_SUFFIX + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(f"{offset}\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path + CHECKPOINT_SUFFIX)
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ['--help', '-h']:
+        print("Usage: python mbox_index.py MBOX [MBOX ...]")
+        print("  Build or refresh the offset index written to MBOX.idx")
+        sys.exit(0)
+
+    for path in sys.argv[1:]:
+        offsets = get_index(path)
+        print(f"{path}: {len(offsets)} messages, resume offset {load_checkpoint(path)}")
+
+
+if __name__ == "__main__":
+    main()
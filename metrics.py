@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Ingestion metrics in the Prometheus text exposition format.
+
+Counters and histograms live in this process. The one-shot alert scripts
+call write_textfile() on exit, which merges this run's values into a
+persistent state file under a lock and rewrites the .prom file for
+node_exporter's textfile collector. Long-running processes such as bulk
+imports can instead serve the live values with start_http_server().
+"""
+
+import os
+import sys
+import json
+import fcntl
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_TEXTFILE = os.getenv('METRICS_TEXTFILE', '/home/alerts/scripts_linstage/metrics/alerts.prom')
+METRICS_STATE = os.getenv('METRICS_STATE', '/home/alerts/scripts_linstage/metrics/alerts-state.json')
+
+# Seconds; parse stages are sub-millisecond, AI calls and alias retries take seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LAG_BUCKETS = (60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400, 3 * 86400, 7 * 86400)
+COUNT_BUCKETS = (1, 2, 4, 8, 12, 16, 24, 32, 64)
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """Base for labelled metrics; values are keyed by a tuple of label values"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def merge(self, values, key, value):
+        """Add a stored value into values"""
+        values[key] = values.get(key, 0) + value
+
+    def render(self, values):
+        lines = self.header()
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}")
+        return lines
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            # [per-bucket counts (non-cumulative, last is +Inf), sum, count]
+            data = self.values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            data[0][index] += 1
+            data[1] += value
+            data[2] += 1
+
+    def merge(self, values, key, value):
+        """Add a stored [counts, sum, count] into values"""
+        data = values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+        if len(value[0]) != len(data[0]):
+            return  # Buckets changed since the state was written; drop the old data
+        data[0] = [a + b for a, b in zip(data[0], value[0])]
+        data[1] += value[1]
+        data[2] += value[2]
+
+    def render(self, values):
+        lines = self.header()
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket
+                le = bound if bound == '+Inf' else format_value(bound)
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, key)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+REGISTRY = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+MESSAGES = register(Counter(
+    'alerts_messages_total', 'Advisory emails processed by distro and outcome', ['distro', 'outcome']))
+STAGE_SECONDS = register(Histogram(
+    'alerts_stage_seconds', 'Time spent per ingestion stage for one message', ['stage']))
+AI_ALIAS_SECONDS = register(Histogram(
+    'alerts_ai_alias_seconds', 'Latency of AI alias requests, successful or not'))
+AI_ALIAS_FALLBACKS = register(Counter(
+    'alerts_ai_alias_fallbacks_total', 'Aliases built by the regex fallback after an AI failure'))
+DB_ROUND_TRIPS = register(Histogram(
+    'alerts_db_round_trips', 'Database statements executed per advisory insert', buckets=COUNT_BUCKETS))
+INSERT_LAG_SECONDS = register(Histogram(
+    'alerts_insert_lag_seconds', 'Delay between the advisory Date header and its insert', ['distro'],
+    buckets=LAG_BUCKETS))
+ADMISSIONS = register(Counter(
+    'alerts_admission_total', 'Admission decisions for incoming mail; shed mail is deferred with EX_TEMPFAIL',
+    ['decision', 'reason']))
+SCHED_QUEUE_DEPTH = register(Histogram(
+    'alerts_sched_queue_depth', 'Inserts of the same severity class already waiting on arrival', ['severity'],
+    buckets=(0,) + COUNT_BUCKETS))
+SCHED_WAIT_SECONDS = register(Histogram(
+    'alerts_sched_wait_seconds', 'Time an insert waited for a scheduler slot', ['severity'],
+    buckets=WAIT_BUCKETS))
+
+
+def render(snapshot=None):
+    """Text exposition of every registered metric (or of a merged snapshot)"""
+    lines = []
+    for metric in REGISTRY:
+        values = snapshot.get(metric.name, {}) if snapshot is not None else metric.values
+        lines.extend(metric.render(values))
+    return '\n'.join(lines) + '\n'
+
+
+def load_values(metric, state):
+    """A metric's values from the JSON state"""
+    values = {}
+    for key, value in state.get(metric.name, []):
+        metric.merge(values, tuple(key), value)
+    return values
+
+
+def write_textfile(path=METRICS_TEXTFILE, state_path=METRICS_STATE):
+    """Add this process's values to the persistent state and rewrite the textfile"""
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(state_path) or '.', exist_ok=True)
+        with open(state_path + '.lock', 'w') as lock:
+            # Concurrent alert scripts take turns so no run's counts are lost
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(state_path) as f:
+                    state = json.load(f)
+            except (FileNotFoundError, ValueError):
+                state = {}
+
+            snapshot = {}
+            for metric in REGISTRY:
+                with metric.lock:
+                    current, metric.values = metric.values, {}
+                values = load_values(metric, state)
+                for key, value in current.items():
+                    metric.merge(values, key, value)
+                snapshot[metric.name] = values
+
+            atomic_write(state_path, json.dumps(
+                {name: [[list(key), value] for key, value in values.items()] for name, values in snapshot.items()}))
+            atomic_write(path, render(snapshot))
+    except OSError as e:
+        print(f"Error writing metrics: {e}")
+
+
+def atomic_write(path, text):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ['/', '/metrics']:
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, addr=''):
+    """Serve /metrics from a daemon thread; returns the server"""
+    server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving metrics on http://{addr or '0.0.0.0'}:{server.server_address[1]}/metrics")
+    return server
+
+
+def main():
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print("Usage: python metrics.py [STATE_FILE]")
+        print(f"  Print the accumulated metrics (default: {METRICS_STATE})")
+        sys.exit(0)
+    state_path = sys.argv[1] if len(sys.argv) > 1 else METRICS_STATE
+    with open(state_path) as f:
+        state = json.load(f)
+    sys.stdout.write(render({metric.name: load_values(metric, state) for metric in REGISTRY}))
+
+
+if __name__ == "__main__":
+    main()
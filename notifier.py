@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Queued, coalescing notification emails.
+
+Advisory.send_failed and send_copy hand events to a per-process Notifier
+instead of forking sendmail. Critical events are sent as soon as its
+background thread picks them up. The rest are grouped by recipient, distro
+and reason, and one digest per group is sent once the group's window has
+passed, over a single reused SMTP connection to the local MTA. If SMTP is
+unavailable the message falls back to /usr/sbin/sendmail.
+
+The alert scripts run once per message, so the groups live in a SQLite queue
+(NOTIFY_DB) shared by every process. Whoever finds no drainer holding the
+queue's lock starts `notifier.py --drain --wait` in the background. That
+one process sends each group when its window is up and exits once the queue
+is empty. `--drain` alone sends what is due, e.g. from cron. With NOTIFY_DB
+empty, events are grouped in memory per process and flushed at exit.
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import queue
+import atexit
+import sqlite3
+import smtplib
+import threading
+import subprocess
+from email.message import EmailMessage
+from sqlite_store import open_store
+
+# '' keeps the groups in memory per process
+NOTIFY_DB = os.getenv('NOTIFY_DB', '/home/alerts/scripts_linstage/notify.sqlite3')
+NOTIFY_WINDOW = float(os.getenv('NOTIFY_WINDOW', 300))
+NOTIFY_SMTP_HOST = os.getenv('NOTIFY_SMTP_HOST', 'localhost')
+NOTIFY_SMTP_PORT = int(os.getenv('NOTIFY_SMTP_PORT', 25))
+# First wait of a drainer after a failed send, doubling up to the window
+RETRY_SECONDS = 30
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY, grp TEXT NOT NULL, time REAL NOT NULL, "
+    "event TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS grp_idx ON events (grp, time)",
+]
+
+SENDER = 'alerts@guardiandigital.com'
+FAILED_TO = 'dwreski@guardiandigital.com'
+COPY_TO = 'reports@guardiandigital.com'
+SCRIPT_HEADER = '<gambit:~alerts/scripts/advisory.py>'
+SIGNATURE = '-- Automatic Advisory Inserter'
+
+
+def failed_message(events):
+    """One failure email; several events of a group become a digest"""
+    first = events[0]
+    msg = EmailMessage()
+    msg['X-Script-Name'] = SCRIPT_HEADER
+    msg['From'] = SENDER
+    msg['To'] = FAILED_TO
+    if len(events) == 1:
+        error_details = f"\nError/Reason:\n{first['reason']}\n" if first['reason'] else ""
+        msg['Subject'] = f"{first['distro']} Advisory insert failed"
+        msg.set_content(f"The following advisory failed to be inserted.\n\n"
+                        f"subject: {first['title']}\n{error_details}\n{SIGNATURE}")
+        return msg
+
+    msg['Subject'] = f"{first['distro']} Advisory insert failed: {len(events)} x {first['kind']}"
+    lines = [f"The following {len(events)} advisories failed to be inserted ({first['kind']}).", ""]
+    for event in events:
+        lines.append(f"{time.strftime('%H:%M:%S', time.localtime(event['time']))} subject: {event['title']}")
+        if event['reason'] and event['reason'] != event['title']:
+            lines.append(f"    {event['reason']}")
+    lines += ["", SIGNATURE]
+    msg.set_content('\n'.join(lines))
+    return msg
+
+
+def copy_message(events):
+    """Inserted-advisory copy; several become one digest"""
+    first = events[0]
+    msg = EmailMessage()
+    msg['X-Script-Name'] = SCRIPT_HEADER
+    msg['From'] = SENDER
+    msg['To'] = COPY_TO
+    if len(events) == 1:
+        msg['Subject'] = f"Automatically Inserted Advisory for {first['distro']}"
+    else:
+        msg['Subject'] = f"Automatically Inserted Advisories for {first['distro']} ({len(events)})"
+    parts = ["The following advisories have been inserted into the database." if len(events) > 1 else
+             "The following advisory has been inserted into the database.",
+             "Please log into linuxsecurity.com, check the advisory and publish.", ""]
+    for event in events:
+        parts += [f"-Title: {event['title']}", "", "-Short Description:", event['intro_text'], "",
+                  "-Full Text:", event['full_text'], ""]
+    parts.append(SIGNATURE)
+    msg.set_content('\n'.join(parts))
+    return msg
+
+
+class SmtpTransport:
+    """Sends messages over one SMTP connection, reconnecting when it drops"""
+
+    def __init__(self, host=NOTIFY_SMTP_HOST, port=NOTIFY_SMTP_PORT):
+        self.host = host
+        self.port = port
+        self.smtp = None
+
+    def __call__(self, msg):
+        for attempt in range(2):
+            try:
+                if self.smtp is None:
+                    self.smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+                self.smtp.send_message(msg)
+                return
+            except (smtplib.SMTPServerDisconnected, OSError) as e:
+                self.close()
+                if attempt:
+                    print(f"SMTP unavailable ({e}), falling back to sendmail")
+                    sendmail(msg)
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except Exception:
+                pass
+            self.smtp = None
+
+
+def sendmail(msg):
+    """Hand a message to the local sendmail binary"""
+    proc = subprocess.Popen(['/usr/sbin/sendmail', '-odb', '-t'], stdin=subprocess.PIPE)
+    proc.communicate(input=msg.as_bytes())
+    if proc.returncode:
+        raise OSError(f"sendmail exited with status {proc.returncode}")
+
+
+def message_for(events):
+    return copy_message(events) if events[0]['type'] == 'copy' else failed_message(events)
+
+
+class NotifyQueue:
+    """Pending events of every process in SQLite, read and deleted by one drainer at a time"""
+
+    def __init__(self, path=NOTIFY_DB):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self.connection = None
+
+    def connect(self):
+        if self.connection is None:
+            # Written from the Notifier thread, closed from the thread calling close()
+            self.connection = open_store(self.path, SCHEMA, timeout=10, check_same_thread=False)
+        return self.connection
+
+    def put(self, event):
+        with self.connect() as connection:
+            connection.execute("INSERT INTO events (grp, time, event) VALUES (?, ?, ?)",
+                               (json.dumps([event['type'], event['distro'], event['kind']]), event['time'],
+                                json.dumps(event, default=str)))
+
+    def due(self, window, everything=False):
+        """[(event ids, events)] of every group whose oldest event is at least window old"""
+        connection = self.connect()
+        groups = [grp for grp, first in connection.execute("SELECT grp, MIN(time) FROM events GROUP BY grp")
+                  if everything or time.time() - first >= window]
+        result = []
+        for grp in groups:
+            rows = connection.execute("SELECT id, event FROM events WHERE grp = ? ORDER BY time, id",
+                                      (grp,)).fetchall()
+            result.append(([row_id for row_id, _ in rows], [json.loads(event) for _, event in rows]))
+        return result
+
+    def delete(self, ids):
+        with self.connect() as connection:
+            connection.executemany("DELETE FROM events WHERE id = ?", [(row_id,) for row_id in ids])
+
+    def next_due(self, window):
+        """When the oldest group comes due, or None if the queue is empty"""
+        first = self.connect().execute("SELECT MIN(time) FROM events").fetchone()[0]
+        return None if first is None else first + window
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def drain(notify_queue, window=NOTIFY_WINDOW, transport=None, wait=False):
+    """
+    Send the digests that are due while holding the queue's lock; with wait,
+    keep sending each group as its window passes until the queue is empty.
+    A digest that can't be sent stays queued, and a waiting drainer backs
+    off before trying again. Returns the number of messages sent.
+    """
+    transport = transport or SmtpTransport()
+    sent = 0
+    retry = RETRY_SECONDS
+    lock = open(notify_queue.lock_path, 'a')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        while True:
+            failed = False
+            for ids, events in notify_queue.due(window):
+                try:
+                    transport(message_for(events))
+                except Exception as e:
+                    # The rest would fail the same way
+                    print(f"Error sending notification email, keeping it queued: {e}")
+                    failed = True
+                    break
+                notify_queue.delete(ids)
+                sent += 1
+            if not wait:
+                break
+            if failed:
+                time.sleep(retry)
+                retry = min(retry * 2, max(window, RETRY_SECONDS))
+                continue
+            retry = RETRY_SECONDS
+            due = notify_queue.next_due(window)
+            if due is None:
+                # An event queued while we held the lock found no drainer to start; look once more
+                fcntl.flock(lock, fcntl.LOCK_UN)
+                if notify_queue.next_due(window) is None:
+                    break
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                continue
+            time.sleep(min(window, max(0.0, due - time.time())) or 0.01)
+    finally:
+        lock.close()
+        if hasattr(transport, 'close'):
+            transport.close()
+    return sent
+
+
+def start_drainer():
+    """Run `notifier.py --drain --wait` detached from this process"""
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), '--drain', '--wait'], start_new_session=True,
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class Notifier:
+    """Background queue that coalesces notification events into digests"""
+
+    def __init__(self, window=NOTIFY_WINDOW, transport=None, path=NOTIFY_DB, spawn=start_drainer):
+        self.window = window
+        self.transport = transport or SmtpTransport()
+        self.queue = queue.Queue()
+        self.groups = {}
+        self.shared = NotifyQueue(path) if path else None
+        self.spawn = spawn
+        self.spawned_at = 0.0
+        self.thread = threading.Thread(target=self._run, name='notifier', daemon=True)
+        self.thread.start()
+
+    def failed(self, title, distro, reason=None, kind='failed', critical=False):
+        self._put({'type': 'failed', 'title': title, 'distro': distro, 'reason': reason or '',
+                   'kind': kind, 'critical': critical})
+
+    def copy(self, title, intro_text, full_text, distro):
+        self._put({'type': 'copy', 'title': title, 'intro_text': intro_text, 'full_text': full_text,
+                   'distro': distro, 'kind': 'copy', 'critical': False})
+
+    def _put(self, event):
+        event['time'] = time.time()
+        self.queue.put(event)
+
+    def flush(self):
+        """Send every pending digest now and wait until they are sent"""
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        if self.shared:
+            self.shared.close()
+        if hasattr(self.transport, 'close'):
+            self.transport.close()
+
+    def _run(self):
+        while True:
+            due = min((events[0]['time'] + self.window for events in self.groups.values()), default=None)
+            timeout = None if due is None else max(0.0, due - time.time())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False
+
+            if item is None or isinstance(item, threading.Event):
+                self._send_due(everything=True)
+                if item is None:
+                    return
+                item.set()
+                continue
+            if item:
+                if item['critical']:
+                    self._send([item])
+                elif self.shared:
+                    self._share(item)
+                else:
+                    self.groups.setdefault((item['type'], item['distro'], item['kind']), []).append(item)
+            self._send_due()
+
+    def _share(self, event):
+        """Queue an event for the drainer, starting one if none holds the lock"""
+        try:
+            self.shared.put(event)
+            with open(self.shared.lock_path, 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # A drainer is running and will pick the event up
+        except (OSError, sqlite3.Error) as e:
+            print(f"Error queueing notification, sending it now: {e}")
+            self._send([event])
+            return
+        # Events of one burst would otherwise each start a drainer before the first takes the lock
+        if time.time() - self.spawned_at > 5:
+            self.spawned_at = time.time()
+            self.spawn()
+
+    def _send_due(self, everything=False):
+        now = time.time()
+        for key in list(self.groups):
+            if everything or now - self.groups[key][0]['time'] >= self.window:
+                self._send(self.groups.pop(key))
+
+    def _send(self, events):
+        msg = message_for(events)
+        try:
+            self.transport(msg)
+        except Exception as e:
+            print(f"Error sending notification email: {e}")
+
+
+_notifier = None
+_lock = threading.Lock()
+
+
+def get_notifier():
+    """The process-wide notifier, flushed and closed at exit"""
+    global _notifier
+    with _lock:
+        if _notifier is None:
+            _notifier = Notifier()
+            atexit.register(_notifier.close)
+        return _notifier
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ['--help', '-h'] or args[0] != '--drain':
+        print("Usage: python notifier.py --drain [--wait]")
+        print("  --drain: Send the digests whose window has passed")
+        print("  --wait: Keep sending as windows pass until the queue is empty")
+        print(f"  Queue: {NOTIFY_DB or '(disabled)'} (NOTIFY_DB), window {NOTIFY_WINDOW:g}s (NOTIFY_WINDOW)")
+        sys.exit(0 if not args or args[0] in ['--help', '-h'] else 1)
+    if not NOTIFY_DB:
+        print("Error: NOTIFY_DB is empty, events are not shared between processes")
+        sys.exit(1)
+    notify_queue = NotifyQueue()
+    try:
+        print(f"Sent {drain(notify_queue, wait='--wait' in args)} notification emails")
+    finally:
+        notify_queue.close()
+
+
+if __name__ == "__main__":
+    main()
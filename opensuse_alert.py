@@ -1,11 +1,12 @@
 #!/usr/bin/env python3
 
+import os
 import sys
 import re
-import email
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from advisory import Advisory
+from alert_dispatch import run
+from backfill import run_backfill
+
+OPENSUSE_CATID = 202
 
 
 def extract_introtext_from_content(content):
@@ -144,113 +145,32 @@ def extract_introtext_fallback(lines):
     return ""
 
 
-def update_missing_introtext(test_mode=False, limit=None, specific_ids=None):
+def extract_short_desc(content):
     """
-    Update records that have empty or null introtext fields.
+    Short description for the openSUSE parser spec: the introtext, or failing
+    that the first descriptive line after the headers.
     """
-    advisory_handler = Advisory()
-    databases = ["lsv7", "lsv7j5beta"]
-    
-    for dbname in databases:
-        print(f"\nProcessing database: {dbname}")
-        
-        connection = advisory_handler.db_connect(dbname)
-        if not connection:
-            print(f"Failed to connect to database {dbname}")
+    short_desc = extract_introtext_from_content(content)
+    if short_desc:
+        return short_desc
+
+    for line in content.split('\n'):
+        line = line.strip()
+        # Skip empty lines and headers
+        if not line or line.startswith('#') or ':' in line[:50]:
             continue
-        
-        cursor = connection.cursor()
-        
-        # Find records with empty introtext but non-empty fulltext
-        if specific_ids:
-            # Query for multiple specific IDs
-            placeholders = ','.join(['%s'] * len(specific_ids))
-            query = f"""
-            SELECT id, title, introtext, `fulltext`, created
-            FROM xu5gc_content 
-            WHERE id IN ({placeholders})
-            AND catid = 202 
-            AND (introtext IS NULL OR introtext = '' OR TRIM(introtext) = '')
-            AND `fulltext` IS NOT NULL 
-            AND `fulltext` != ''
-            ORDER BY id
-            """
-            cursor.execute(query, specific_ids)
-        else:
-            # Query for records with missing introtext
-            query = """
-            SELECT id, title, introtext, `fulltext`, created
-            FROM xu5gc_content 
-            WHERE catid = 202 
-            AND (introtext IS NULL OR introtext = '' OR TRIM(introtext) = '')
-            AND `fulltext` IS NOT NULL 
-            AND `fulltext` != ''
-            ORDER BY created DESC
-            """
-            
-            if limit:
-                query += f" LIMIT {limit}"
-            
-            cursor.execute(query)
-        
-        records = cursor.fetchall()
-        
-        if specific_ids:
-            if records:
-                found_ids = [str(record[0]) for record in records]
-                missing_ids = [str(id) for id in specific_ids if str(id) not in found_ids]
-                print(f"Found {len(records)} records with IDs: {', '.join(found_ids)}")
-                if missing_ids:
-                    print(f"Missing or invalid IDs: {', '.join(missing_ids)}")
-            else:
-                print(f"No records found with IDs {', '.join(map(str, specific_ids))} or records don't meet criteria")
-                cursor.close()
-                advisory_handler.db_disconnect(connection)
-                continue
-        else:
-            print(f"Found {len(records)} records with missing introtext")
-        
-        updated_count = 0
-        
-        for record in records:
-            record_id, title, current_introtext, fulltext, created = record
-            
-            # Remove HTML tags for easier parsing
-            content = re.sub(r'<[^>]+>', '', fulltext)
-            content = re.sub(r'&lt;', '<', content)
-            content = re.sub(r'&gt;', '>', content)
-            content = re.sub(r'&amp;', '&', content)
-            
-            # Extract introtext from fulltext using the same function
-            new_introtext = extract_introtext_from_content(content)
-            
-            if new_introtext:
-                # Truncate if too long
-                if len(new_introtext) >= 400:
-                    new_introtext = new_introtext[:400] + " [More...]"
-                
-                print(f"\nID: {record_id}")
-                print(f"Title: {title}")
-                print(f"Created: {created}")
-                print(f"Current introtext: '{current_introtext}'")
-                print(f"New introtext: '{new_introtext}'")
-                
-                if not test_mode:
-                    # Update the record
-                    update_query = "UPDATE xu5gc_content SET introtext = %s WHERE id = %s"
-                    cursor.execute(update_query, (new_introtext, record_id))
-                    updated_count += 1
-                    print("✓ Updated")
-                else:
-                    print("✓ Would update (test mode)")
-                    updated_count += 1
-            else:
-                print(f"\nID: {record_id} - No introtext pattern found in: {title}")
-        
-        cursor.close()
-        advisory_handler.db_disconnect(connection)
-        
-        print(f"\nDatabase {dbname}: {'Would update' if test_mode else 'Updated'} {updated_count} records")
+        # Look for descriptive text
+        if len(line) > 20 and not line.startswith('Announcement ID'):
+            return line
+    return ""
+
+
+def update_missing_introtext(test_mode=False, limit=None, specific_ids=None, chunk_size=500, jobs=1):
+    """
+    Update openSUSE records that have empty or null introtext fields.
+    See backfill.py, which handles every category with a parser spec.
+    """
+    run_backfill([OPENSUSE_CATID], test_mode, limit, specific_ids, chunk_size, jobs)
 
 
 def main():
@@ -264,273 +184,57 @@ def main():
         if test_mode:
             sys.argv.remove('--test')
         
-        # Check for limit and ids parameters
+        # Check for limit, ids and jobs parameters
         limit = None
         specific_ids = None
-        i = 0
-        while i < len(sys.argv[1:]):
-            arg = sys.argv[i + 1]
-            if arg.startswith('--limit='):
-                limit = int(arg.split('=')[1])
-                sys.argv.remove(arg)
-                break
-            elif arg == '--limit':
-                if i + 1 < len(sys.argv[1:]):
-                    limit = int(sys.argv[i + 2])
-                    sys.argv.remove(arg)
-                    sys.argv.remove(str(limit))
-                    break
-                else:
-                    print("Error: --limit requires a value")
-                    sys.exit(1)
-            elif arg.startswith('--ids='):
-                ids_str = arg.split('=')[1]
-                specific_ids = [int(x.strip()) for x in ids_str.split(',')]
-                sys.argv.remove(arg)
-                break
-            elif arg == '--ids':
-                if i + 1 < len(sys.argv[1:]):
-                    ids_str = sys.argv[i + 2]
-                    specific_ids = [int(x.strip()) for x in ids_str.split(',')]
-                    sys.argv.remove(arg)
-                    sys.argv.remove(ids_str)
-                    break
-                else:
-                    print("Error: --ids requires a comma-separated list of values")
+        jobs = os.cpu_count() or 1
+        args = sys.argv[1:]
+        while args:
+            arg = args.pop(0)
+            name, _, value = arg.partition('=')
+            if name in ['--limit', '--ids', '--jobs'] and not value:
+                if not args:
+                    print(f"Error: {name} requires a value")
                     sys.exit(1)
+                value = args.pop(0)
+            if name == '--limit':
+                limit = int(value)
+            elif name == '--ids':
+                specific_ids = [int(x.strip()) for x in value.split(',')]
+            elif name == '--jobs':
+                jobs = max(1, int(value))
             elif arg in ['--help', '-h']:
-                print("Usage: python opensuse_alert.py --update-missing [--test] [--limit N] [--ids N,N,N]")
+                print("Usage: python opensuse_alert.py --update-missing [--test] [--limit N] [--ids N,N,N] [--jobs N]")
                 print("  --update-missing: Update existing records with missing introtext")
                 print("  --test: Run in test mode (don't actually update)")
                 print("  --limit N or --limit=N: Limit to N records per database")
                 print("  --ids N,N,N or --ids=N,N,N: Update multiple specific record IDs (comma-separated)")
+                print("  --jobs N or --jobs=N: Reparse with N processes (default: CPU count)")
                 sys.exit(0)
-            i += 1
-        
+
         if test_mode:
             print("Running in TEST MODE - no actual updates will be made")
         
-        update_missing_introtext(test_mode, limit, specific_ids)
+        update_missing_introtext(test_mode, limit, specific_ids, jobs=jobs)
         return
     
     # Check for help
     if '--help' in sys.argv or '-h' in sys.argv:
-        print("Usage: python opensuse_alert.py [--test] [email_file]")
+        print("Usage: python opensuse_alert.py [--test] [--profile] [email_file]")
         print("  --test: Run in test mode (don't insert into database)")
+        print("  --profile: Add a cProfile/tracemalloc summary to the timing record")
         print("  email_file: Read email from file instead of stdin")
         print("")
         print("Database update mode:")
-        print("  python opensuse_alert.py --update-missing [--test] [--limit=N] [--ids=N,N,N]")
+        print("  python opensuse_alert.py --update-missing [--test] [--limit=N] [--ids=N,N,N] [--jobs=N]")
         print("  --update-missing: Update existing records with missing introtext")
         print("  --test: Run in test mode (don't actually update)")
         print("  --limit=N: Limit to N records per database")
         print("  --ids=N,N,N: Update multiple specific record IDs (comma-separated)")
+        print("  --jobs=N: Reparse with N processes (default: CPU count)")
         sys.exit(0)
     
-    # Check for test mode
-    test_mode = '--test' in sys.argv
-    if test_mode:
-        sys.argv.remove('--test')
-    
-    # Read email from file or stdin
-    if len(sys.argv) > 1:
-        # Read from file specified as command line argument
-        email_file = sys.argv[1]
-        try:
-            with open(email_file, 'r', encoding='utf-8') as f:
-                raw_email = f.read()
-            print(f"Reading email from file: {email_file}")
-        except FileNotFoundError:
-            print(f"Error: File '{email_file}' not found")
-            sys.exit(1)
-        except Exception as e:
-            print(f"Error reading file '{email_file}': {e}")
-            sys.exit(1)
-    else:
-        # Read from stdin (original behavior)
-        raw_email = sys.stdin.read()
-    
-    # Parse email
-    msg = email.message_from_string(raw_email)
-    
-    # Get headers
-    subject = msg.get('Subject', '')
-    from_header = msg.get('From', '')
-    adv_date = msg.get('Date', '')
-    
-    # Clean up date
-    adv_date = adv_date.replace('\n', '').replace('\r', '')
-    
-    # Extract email body
-    def extract_text_parts(msg):
-        """Extract text parts from email message"""
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                if (content_type.startswith('text/plain') and 
-                    not part.get_filename()):  # Skip attachments
-                    charset = part.get_content_charset() or 'utf-8'
-                    body = part.get_payload(decode=True)
-                    if body:
-                        try:
-                            if isinstance(body, bytes):
-                                body = body.decode(charset, errors='ignore')
-                            return body
-                        except Exception as e:
-                            print(f"Error decoding body: {e}")
-                            continue
-        else:
-            # Single part message
-            body = msg.get_payload(decode=True)
-            if body:
-                charset = msg.get_content_charset() or 'utf-8'
-                try:
-                    if isinstance(body, bytes):
-                        body = body.decode(charset, errors='ignore')
-                    return body
-                except Exception as e:
-                    print(f"Error decoding single part body: {e}")
-        return ""
-    
-    mail_content = extract_text_parts(msg)
-    
-    if not mail_content:
-        print("No mail content found")
-        sys.exit(1)
-    
-    # Initialize variables
-    short_desc = ""
-    advisory = mail_content
-    vendor = ""
-    
-    # Clean up subject and extract vendor info
-    subject = re.sub(r'\. +', '. ', subject)
-    subject = re.sub(r'\s+', ' ', subject)
-    subject = re.sub(r'\n', ' ', subject)
-    subject = re.sub(r'\t', ' ', subject)
-    subject = re.sub(r'^ +', '', subject)
-    subject = re.sub(r' +$', '', subject)
-    subject = re.sub(r'the linux kernel', 'kernel', subject, flags=re.IGNORECASE)
-    subject = subject.strip()
-    
-    # Parse different subject formats
-    if re.search(r'\[security-announce\] openSUSE-SU-(\d+):(\d+)-(\d+): (.*)$', subject):
-        match = re.search(r'\[security-announce\] openSUSE-SU-(\d+):(\d+)-(\d+): (.*)$', subject)
-        subject = f"openSUSE: {match.group(1)}:{match.group(2)}-{match.group(3)}: {match.group(4)}"
-        vendor = "opensuse"
-    elif re.search(r'\[opensuse-security-announce\]\s+openSUSE-SU-(\d+):(\d+)-(\d+): (\w+): Security update for (.*)', subject):
-        match = re.search(r'\[opensuse-security-announce\]\s+openSUSE-SU-(\d+):(\d+)-(\d+): (\w+): Security update for (.*)', subject)
-        subject = f"openSUSE: {match.group(1)}:{match.group(2)}-{match.group(3)} {match.group(4)}: {match.group(5)}"
-        vendor = "opensuse"
-    elif re.search(r'SUSE-SU-(\d+):(\d+)-(\d+): (\w+): Security update for (.*)', subject):
-        match = re.search(r'SUSE-SU-(\d+):(\d+)-(\d+): (\w+): Security update for (.*)', subject)
-        subject = f"openSUSE: {match.group(1)}:{match.group(2)}-{match.group(3)} {match.group(4)}: {match.group(5)}"
-        vendor = "opensuse"
-    elif re.search(r'SUSE-SU-(\d+):(\d+)-(\d+): (\w+): (.*) on GA media', subject):
-        match = re.search(r'SUSE-SU-(\d+):(\d+)-(\d+): (\w+): (.*) on GA media', subject)
-        subject = f"openSUSE: {match.group(1)}:{match.group(2)}-{match.group(3)} {match.group(4)}: {match.group(5)}"
-        vendor = "opensuse"
-    elif re.search(r'openSUSE-SU-(\d+):(\d+)-(\d+): Security update for (.*)', subject):
-        match = re.search(r'openSUSE-SU-(\d+):(\d+)-(\d+): Security update for (.*)', subject)
-        subject = f"openSUSE: {match.group(1)}:{match.group(2)}-{match.group(3)}: {match.group(4)}"
-        vendor = "opensuse"
-    elif re.search(r'openSUSE-SU-(\d+):(\d+)-(\d+): (\w+): Recommended update for (.*)', subject):
-        match = re.search(r'openSUSE-SU-(\d+):(\d+)-(\d+): (\w+): Recommended update for (.*)', subject)
-        subject = f"openSUSE: {match.group(1)}:{match.group(2)}-{match.group(3)}: {match.group(4)}: {match.group(5)}"
-        vendor = "opensuse"
-    elif re.search(r'openSUSE-SU-4(\d+)-(\d+): (\w+): Security update for (.*)', subject):
-        match = re.search(r'openSUSE-SU-4(\d+)-(\d+): (\w+): Security update for (.*)', subject)
-        subject = f"openSUSE: 4{match.group(1)}-{match.group(2)} {match.group(3)}: {match.group(4)}"
-        vendor = "opensuse"
-    elif re.search(r'openSUSE-SU-(\d+)-(\d+)-(\d+): (\w+): Security update for (.*)', subject):
-        match = re.search(r'openSUSE-SU-(\d+)-(\d+)-(\d+): (\w+): Security update for (.*)', subject)
-        subject = f"openSUSE: {match.group(1)}-{match.group(2)}-{match.group(3)} {match.group(4)}: {match.group(5)}"
-        vendor = "opensuse"
-    elif re.search(r'openSUSE-SU-(\d+)-(\d+)-(\d+): (\w+): Recommended update (?:of|for) (.*)', subject):
-        match = re.search(r'openSUSE-SU-(\d+)-(\d+)-(\d+): (\w+): Recommended update (?:of|for) (.*)', subject)
-        subject = f"openSUSE: {match.group(1)}-{match.group(2)}-{match.group(3)} {match.group(4)}: {match.group(5)}"
-        vendor = "opensuse"
-    else:
-        # Send failure notification and exit
-        error_msg = "Subject does not match any known OpenSUSE security advisory pattern"
-        advisory_handler = Advisory()
-        advisory_handler.send_failed(subject, "opensuse", error_msg)
-        print("send failed due to subject or vendor mismatch")
-        sys.exit(0)
-    
-    # Clean up subject further
-    subject = re.sub(r'Security update for', '', subject)
-    subject = re.sub(r' \(Live .*', '', subject)
-    subject = re.sub(r'update to', '', subject)
-    subject = re.sub(r'update for', '', subject)
-    subject = re.sub(r' to .*', '', subject)
-    subject = re.sub(r' +', ' ', subject)
-    subject = re.sub(r'important: (.*):.*', r'important: \1', subject)
-    subject = re.sub(r'critical: (.*):.*', r'critical: \1', subject)
-    subject = re.sub(r'moderate: (.*):.*', r'critical: \1', subject)
-    subject = re.sub(r'moderate', '', subject, flags=re.IGNORECASE)
-    subject = re.sub(r'important', '', subject, flags=re.IGNORECASE)
-    subject = re.sub(r'security', '', subject, flags=re.IGNORECASE)
-    subject = re.sub(r'update', '', subject, flags=re.IGNORECASE)
-    subject = subject.strip()
-    
-    # Extract introtext using the new function
-    short_desc = extract_introtext_from_content(mail_content)
-    
-    # If no introtext found, try to extract from first few lines after headers
-    if not short_desc:
-        lines = mail_content.split('\n')
-        for i, line in enumerate(lines):
-            line = line.strip()
-            # Skip empty lines and headers
-            if not line or line.startswith('#') or ':' in line[:50]:
-                continue
-            # Look for descriptive text
-            if len(line) > 20 and not line.startswith('Announcement ID'):
-                short_desc = line
-                break
-    
-    # Clean up short description
-    if short_desc:
-        short_desc = re.sub(r'\. +', '. ', short_desc)
-        short_desc = re.sub(r'\s+', ' ', short_desc)
-        short_desc = re.sub(r'\n', ' ', short_desc)
-        short_desc = re.sub(r'^\s+', '', short_desc)
-        short_desc = re.sub(r'\s+$', '', short_desc)
-        short_desc = short_desc.strip()
-        
-        # Truncate if too long
-        if len(short_desc) >= 400:
-            short_desc = short_desc[:400] + " [More...]"
-    
-    # In test mode, just show the parsed content
-    if test_mode:
-        print("\n" + "="*60)
-        print("PARSED EMAIL CONTENT (TEST MODE)")
-        print("="*60)
-        print(f"Original Subject: {msg.get('Subject', '')}")
-        print(f"Formatted Subject: {subject}")
-        print(f"Date: {adv_date}")
-        print(f"Vendor: {vendor}")
-        print(f"Short Description ({len(short_desc)} chars): {short_desc}")
-        print("\nFull Advisory Content:")
-        print("-" * 40)
-        print(advisory[:500] + "..." if len(advisory) > 500 else advisory)
-        print("="*60)
-        print("Test mode - no database insertion attempted")
-        return
-    
-    # Insert advisory into database (production mode)
-    try:
-        advisory_handler = Advisory()
-        advisory_handler.insert_advisory(subject, short_desc, advisory, vendor, adv_date)
-        print(f"Successfully inserted: {subject}")
-    except Exception as e:
-        error_msg = f"Database insertion error: {str(e)}"
-        print(f"Error inserting advisory: {e}")
-        advisory_handler = Advisory()
-        advisory_handler.send_failed(subject, vendor, error_msg)
-        sys.exit(1)
+    run(sys.argv, spec_name='opensuse', script_name='opensuse_alert.py')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of parse results, keyed by message content.
+
+MTA retries, `--test` reruns and repeated bulk imports feed the same raw
+message through the parser again. The engine looks each message up here
+first, under the SHA-256 of the raw text, the forced spec name and the
+engine fingerprint (specs plus parsing code, see SpecEngine.fingerprint),
+so a change to either never serves stale results. Hits skip MIME parsing,
+decoding and every spec regex.
+
+Entries are ParsedAdvisory.to_bytes() blobs in a small SQLite database.
+Once their total size, kept as a running total by triggers, passes
+PARSE_CACHE_MAX_MB, the least recently used entries are evicted down to 90%
+of that.
+"""
+
+import os
+import sys
+import time
+import atexit
+import sqlite3
+import hashlib
+import threading
+from parser_engine import ParsedAdvisory
+from sqlite_store import open_store
+
+# '' disables the cache
+PARSE_CACHE_DB = os.getenv('PARSE_CACHE_DB', '/home/alerts/scripts_linstage/parse-cache.sqlite3')
+PARSE_CACHE_MAX_MB = float(os.getenv('PARSE_CACHE_MAX_MB', 64))
+EVICT_TO = 0.9
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS parsed (key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, "
+    "used_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS used_at_idx ON parsed (used_at)",
+    # Running total of parsed.size, so a put doesn't sum the table
+    "CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 1), size INTEGER NOT NULL)",
+    "CREATE TRIGGER IF NOT EXISTS parsed_insert AFTER INSERT ON parsed "
+    "BEGIN UPDATE totals SET size = size + new.size; END",
+    "CREATE TRIGGER IF NOT EXISTS parsed_update AFTER UPDATE OF size ON parsed "
+    "BEGIN UPDATE totals SET size = size + new.size - old.size; END",
+    "CREATE TRIGGER IF NOT EXISTS parsed_delete AFTER DELETE ON parsed "
+    "BEGIN UPDATE totals SET size = size - old.size; END",
+]
+
+EVICT_SQL = """
+DELETE FROM parsed WHERE key IN (
+    SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY used_at DESC, key) AS kept FROM parsed)
+    WHERE kept > ?
+)
+"""
+
+
+class ParseCache:
+    """Content-addressed ParsedAdvisory store with a size bound"""
+
+    def __init__(self, path=PARSE_CACHE_DB, max_bytes=PARSE_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.connection = None
+
+    @staticmethod
+    def key(raw, spec_name, fingerprint):
+        digest = hashlib.sha256(f"{fingerprint}\0{spec_name or ''}\0".encode('utf-8'))
+        digest.update(raw.encode('utf-8', errors='surrogateescape'))
+        return digest.hexdigest()
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = open_store(self.path, SCHEMA, timeout=5)
+        return self.connection
+
+    def get(self, key):
+        """The cached ParsedAdvisory for key, or None"""
+        if not self.path:
+            return None
+        try:
+            with self.connect() as connection:
+                row = connection.execute("SELECT data FROM parsed WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                try:
+                    parsed = ParsedAdvisory.from_bytes(row[0])
+                except ValueError:
+                    # Written by another record format; parse again and replace it
+                    connection.execute("DELETE FROM parsed WHERE key = ?", (key,))
+                    return None
+                connection.execute("UPDATE parsed SET used_at = ? WHERE key = ?", (time.time(), key))
+                return parsed
+        except sqlite3.Error as e:
+            # The cache is an optimisation; parse the message instead
+            print(f"Error reading parse cache: {e}")
+            return None
+
+    def put(self, key, parsed):
+        """Store a parse result, evicting the least recently used entries past the size bound"""
+        if not self.path:
+            return
+        data = parsed.to_bytes()
+        if len(data) > self.max_bytes:
+            return
+        try:
+            with self.connect() as connection:
+                # An upsert rather than INSERT OR REPLACE, whose implicit delete skips the triggers
+                connection.execute("INSERT INTO parsed (key, data, size, used_at) VALUES (?, ?, ?, ?) "
+                                   "ON CONFLICT (key) DO UPDATE SET data = excluded.data, size = excluded.size, "
+                                   "used_at = excluded.used_at", (key, data, len(data), time.time()))
+                row = connection.execute("SELECT size FROM totals").fetchone()
+                if row is None:
+                    # First put into this file; the triggers keep it from here on
+                    row = connection.execute("SELECT COALESCE(SUM(size), 0) FROM parsed").fetchone()
+                    connection.execute("INSERT INTO totals (id, size) VALUES (1, ?)", row)
+                total = row[0]
+                if total > self.max_bytes:
+                    connection.execute(EVICT_SQL, (int(self.max_bytes * EVICT_TO),))
+        except sqlite3.Error as e:
+            print(f"Error writing parse cache: {e}")
+
+    def stats(self):
+        """Return (entries, total bytes)"""
+        entries, size = self.connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM parsed").fetchone()
+        return entries, size
+
+    def clear(self):
+        """Delete every entry, returning how many were removed"""
+        with self.connect() as connection:
+            return connection.execute("DELETE FROM parsed").rowcount
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+_parse_cache = None
+_lock = threading.Lock()
+
+
+def get_parse_cache():
+    """The process-wide parse cache, closed at exit"""
+    global _parse_cache
+    with _lock:
+        if _parse_cache is None:
+            _parse_cache = ParseCache()
+            atexit.register(_parse_cache.close)
+        return _parse_cache
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ['--help', '-h']:
+        print("Usage: python parse_cache.py --stats | --clear")
+        print(f"  Cache: {PARSE_CACHE_DB or '(disabled)'} (PARSE_CACHE_DB), up to {PARSE_CACHE_MAX_MB:g} MB")
+        sys.exit(0)
+    if not PARSE_CACHE_DB:
+        print("Error: PARSE_CACHE_DB is empty, the parse cache is disabled")
+        sys.exit(1)
+    cache = ParseCache()
+    try:
+        if args[0] == '--stats':
+            entries, size = cache.stats()
+            print(f"{entries} entries, {size / 1024 / 1024:.1f} MB of {PARSE_CACHE_MAX_MB:g} MB")
+        elif args[0] == '--clear':
+            print(f"Removed {cache.clear()} entries")
+        else:
+            print(f"Error: unknown option {args[0]}")
+            sys.exit(1)
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
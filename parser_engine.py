@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Spec-driven advisory parsing engine.
+
+A parser spec is a plain dict (see parser_specs.py) describing how to recognise
+a distro's announcement subject, build the advisory title, and pull the body
+and short description out of the message. Specs are compiled once into
+CompiledSpec objects and SpecEngine dispatches each message to the spec whose
+detect pattern matches its subject. Results are ParsedAdvisory records, which
+can also be served from the on-disk parse cache (see parse_cache.py).
+"""
+
+import sys
+import re
+import email
+import marshal
+import hashlib
+import importlib
+import importlib.util
+from collections.abc import MutableMapping
+from functools import lru_cache
+from timing import NULL_TIMER
+
+
+REPLY_RE = re.compile(r'^(R|r)(E|e):')
+FOLD_RE = re.compile(r'\r?\n[ \t]*')
+CVE_RE = re.compile(r'\bCVE-\d{4}-\d{4,}\b', re.IGNORECASE)
+# Bump when ParsedAdvisory's fields change; older serialized records then fail to load
+PARSED_FORMAT = 1
+
+
+def extract_cves(text):
+    """Distinct CVE ids in text, upper-cased and sorted"""
+    return sorted({cve.upper() for cve in CVE_RE.findall(text or '')})
+
+
+class SkipMessage(Exception):
+    """Raised for messages that are not advisories and should be ignored"""
+
+
+class ParseError(Exception):
+    """Raised when a message looks like an advisory but cannot be parsed"""
+
+    def __init__(self, reason, subject='', file_type='', exit_code=0, kind='parse_error'):
+        super().__init__(reason)
+        self.reason = reason
+        self.subject = subject
+        self.file_type = file_type
+        self.exit_code = exit_code
+        # Outcome label for metrics, e.g. 'subject_mismatch'
+        self.kind = kind
+
+
+class _Fields(dict):
+    """Template fields; unknown names format as an empty string"""
+
+    def __missing__(self, key):
+        return ''
+
+
+class ParsedAdvisory(MutableMapping):
+    """
+    One parsed advisory. Fields are attributes, and the record also reads and
+    writes like the dict the engine used to return, so parsed['title'],
+    parsed.get('cves') and dict(parsed) keep working. The sender is stored as
+    `sender` and keyed as 'from'.
+    """
+
+    __slots__ = ('spec', 'distro', 'file_type', 'subject', 'sender', 'message_id', 'title', 'short_desc', 'body',
+                 'date', 'advisory_id', 'package', 'severity', 'cves', 'fields')
+    KEYS = tuple('from' if name == 'sender' else name for name in __slots__)
+    ATTRS = dict(zip(KEYS, __slots__))
+
+    def __init__(self, spec='', distro='', file_type='', subject='', sender='', message_id='', title='',
+                 short_desc='', body='', date='', advisory_id='', package='', severity='', cves=(), fields=None):
+        self.spec = spec
+        self.distro = distro
+        self.file_type = file_type
+        self.subject = subject
+        self.sender = sender
+        self.message_id = message_id
+        self.title = title
+        self.short_desc = short_desc
+        self.body = body
+        self.date = date
+        self.advisory_id = advisory_id
+        self.package = package
+        self.severity = severity
+        self.cves = list(cves)
+        self.fields = dict(fields or {})
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self.ATTRS[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, self.ATTRS[key], value)
+        except KeyError:
+            raise KeyError(f"ParsedAdvisory has no field {key!r}") from None
+
+    def __delitem__(self, key):
+        raise TypeError("ParsedAdvisory fields cannot be deleted")
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __repr__(self):
+        return f"ParsedAdvisory(spec={self.spec!r}, title={self.title!r}, date={self.date!r})"
+
+    def to_bytes(self):
+        """Compact binary form: the field values in slot order, marshalled"""
+        return marshal.dumps((PARSED_FORMAT, tuple(getattr(self, name) for name in self.__slots__)))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Inverse of to_bytes; raises ValueError for data in another format"""
+        try:
+            version, values = marshal.loads(data)
+        except (EOFError, TypeError, ValueError) as e:
+            raise ValueError(f"not a serialized ParsedAdvisory: {e}") from None
+        if version != PARSED_FORMAT or len(values) != len(cls.__slots__):
+            raise ValueError(f"ParsedAdvisory format {version}, expected {PARSED_FORMAT}")
+        return cls(*values)
+
+    def __reduce__(self):
+        # Pickled through the binary form when results cross a process pool
+        return ParsedAdvisory.from_bytes, (self.to_bytes(),)
+
+
+def read_input(email_file=None):
+    """Read a raw email from a file or stdin, exiting on failure"""
+    if email_file:
+        try:
+            with open(email_file, 'r', encoding='utf-8', errors='ignore') as f:
+                buf = f.read()
+            print(f"Reading email from file: {email_file}")
+        except FileNotFoundError:
+            print(f"Error: File '{email_file}' not found")
+            sys.exit(1)
+        except Exception as e:
+            print(f"Error reading file '{email_file}': {e}")
+            sys.exit(1)
+    else:
+        try:
+            buf = sys.stdin.read()
+        except Exception as e:
+            print(f"Error reading input: {e}")
+            sys.exit(1)
+
+    if not buf.strip():
+        print("No input received")
+        sys.exit(1)
+    return buf
+
+
+def extract_text(msg, raw=""):
+    """Return the first text/plain body of a message, falling back to the raw buffer"""
+    if msg.is_multipart():
+        for part in msg.walk():
+            content_type = part.get_content_type()
+            if content_type.startswith('text/plain') and not part.get_filename():
+                charset = part.get_content_charset() or 'utf-8'
+                body = part.get_payload(decode=True)
+                if body:
+                    try:
+                        if isinstance(body, bytes):
+                            body = body.decode(charset, errors='ignore')
+                        return body
+                    except Exception as e:
+                        print(f"Error decoding body: {e}")
+                        continue
+    else:
+        body = msg.get_payload(decode=True)
+        if body:
+            charset = msg.get_content_charset() or 'utf-8'
+            try:
+                if isinstance(body, bytes):
+                    body = body.decode(charset, errors='ignore')
+                return body
+            except Exception as e:
+                print(f"Error decoding single part body: {e}")
+
+    return raw
+
+
+def compile_subs(rules):
+    """Compile a list of (pattern, replacement[, flags]) substitutions"""
+    compiled = []
+    for rule in rules or ():
+        flags = rule[2] if len(rule) > 2 else 0
+        compiled.append((re.compile(rule[0], flags), rule[1]))
+    return compiled
+
+
+def apply_subs(subs, text):
+    """Apply compiled substitutions in order"""
+    for regex, repl in subs:
+        text = regex.sub(repl, text)
+    return text
+
+
+def resolve_callable(ref):
+    """Resolve a 'module:function' reference (or pass a callable through)"""
+    if callable(ref):
+        return ref
+    module_name, func_name = ref.split(':')
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+class CompiledSpec:
+    """A parser spec with all of its patterns compiled"""
+
+    def __init__(self, spec):
+        self.name = spec['name']
+        self.distro = spec['distro']
+        self.file_type = spec.get('file_type', self.distro)
+        self.detect = spec['detect']
+        self.ignore_case = spec.get('ignore_case', False)
+        self.require = tuple(spec.get('require', ()))
+        self.skip_replies = spec.get('skip_replies', True)
+        self.coalesce = spec.get('coalesce')
+
+        flags = re.IGNORECASE if spec.get('ignore_case') else 0
+        self.subject_cleanup = compile_subs(spec.get('subject_cleanup'))
+        self.subject_patterns = [(re.compile(pattern, flags), template)
+                                 for pattern, template in spec['subject_patterns']]
+        self.mismatch_error = spec.get(
+            'mismatch_error', f"Subject does not match any known {self.name} advisory pattern")
+        self.title_cleanup = compile_subs(spec.get('title_cleanup'))
+
+        # Fields: name -> (source, [regex], cleanup, default)
+        self.fields = {}
+        for field_name, rule in spec.get('fields', {}).items():
+            self.fields[field_name] = (
+                rule.get('source', 'body'),
+                [re.compile(p, re.MULTILINE | flags) for p in rule.get('patterns', ())],
+                compile_subs(rule.get('cleanup')),
+                rule.get('default', ''),
+            )
+
+        body = spec.get('body', {})
+        self.body_start = re.compile(body['start']) if body.get('start') else None
+        self.body_end = re.compile(body['end']) if body.get('end') else None
+        self.skip_leading_blank = body.get('skip_leading_blank', False)
+        self.empty_error = body.get('empty_error', "No advisory content found in email body")
+
+        short = spec.get('short_desc', {})
+        self.short_extractor = short.get('extractor')
+        self.stored_extractor = short.get('stored_extractor')
+        self.short_start = re.compile(short['start']) if short.get('start') else None
+        self.short_skip_block = short.get('skip_block', False)
+        self.short_end = re.compile(short['end']) if short.get('end') else None
+        self.short_max_lines = short.get('max_lines')
+        self.short_line_cleanup = compile_subs(short.get('line_cleanup'))
+        self.short_required = short.get('required')
+        self.short_cleanup = compile_subs(short.get('cleanup'))
+        self.short_truncate = short.get('truncate')
+        self.short_default = short.get('default', '')
+
+    def _extractor(self, stored=False):
+        """Resolve the custom short description extractor on first use"""
+        if stored and self.stored_extractor:
+            if isinstance(self.stored_extractor, str):
+                self.stored_extractor = resolve_callable(self.stored_extractor)
+            return self.stored_extractor
+        if isinstance(self.short_extractor, str):
+            self.short_extractor = resolve_callable(self.short_extractor)
+        return self.short_extractor
+
+    def clean_subject(self, subject):
+        """Unfold and normalise a raw Subject header"""
+        subject = FOLD_RE.sub(' ', subject).strip()
+        return apply_subs(self.subject_cleanup, subject).strip()
+
+    def match_subject(self, subject):
+        """Return (template, subject fields) for the first matching pattern, or (None, None)"""
+        for regex, template in self.subject_patterns:
+            match = regex.search(subject)
+            if match:
+                return template, {k: v.strip() for k, v in match.groupdict().items() if v is not None}
+        return None, None
+
+    def extract_fields(self, subject, body, fields):
+        """Fill spec fields from subject groups, then subject/body patterns"""
+        for field_name, (source, patterns, cleanup, default) in self.fields.items():
+            value = fields.get(field_name)
+            if not value:
+                text = subject if source == 'subject' else body
+                for regex in patterns:
+                    match = regex.search(text)
+                    if match:
+                        value = match.group(1) if regex.groups else match.group(0)
+                        break
+            value = apply_subs(cleanup, value).strip() if value else default
+            fields[field_name] = value
+        return fields
+
+    def extract_body(self, text):
+        """Return the advisory body lines between the spec's start and end markers"""
+        lines = text.split('\n')
+        body = []
+        started = self.body_start is None
+        for line in lines:
+            line = line.rstrip('\r')
+            if not started:
+                if self.body_start.search(line):
+                    started = True
+                continue
+            if self.body_end and self.body_end.search(line):
+                break
+            if self.skip_leading_blank and not body and not line.strip():
+                continue
+            body.append(line)
+        return body
+
+    def extract_short_desc(self, lines):
+        """Collect the short description from body lines; None if a required section is missing"""
+        started = self.short_start is None
+        in_block = False
+        collected = []
+        for line in lines:
+            if not started:
+                if self.short_start.search(line):
+                    started = True
+                    in_block = self.short_skip_block
+                continue
+            if in_block:
+                # Skip the rest of the block holding the start marker
+                if not line.strip():
+                    in_block = False
+                continue
+            if self.short_end and self.short_end.search(line):
+                break
+            # Per-line subs, so a rule like '====.+' cannot reach past its own line
+            line = apply_subs(self.short_line_cleanup, line).strip()
+            if line:
+                collected.append(line)
+                if self.short_max_lines and len(collected) >= self.short_max_lines:
+                    break
+        if not started:
+            return None
+        return ' '.join(collected)
+
+    def parse_body(self, text, timer=NULL_TIMER):
+        """Parse message text into (body, short_desc)"""
+        lines = self.extract_body(text)
+        body = '\n'.join(lines) + '\n' if lines else ''
+        timer.lap('body')
+        return body, self.build_short_desc(body, lines)
+
+    def build_short_desc(self, body, lines=None, stored=False):
+        """
+        Short description from an extracted body. stored=True is for fulltext
+        already in the database (backfill.py) and uses the spec's
+        stored_extractor when it has one.
+        """
+        if self.short_extractor:
+            short_desc = self._extractor(stored)(body)
+        else:
+            short_desc = self.extract_short_desc(body.split('\n') if lines is None else lines)
+            if short_desc is None and self.short_required:
+                raise ParseError(self.short_required, file_type=self.file_type)
+        short_desc = apply_subs(self.short_cleanup, short_desc or '').strip()
+
+        if self.short_truncate and len(short_desc) >= self.short_truncate:
+            short_desc = short_desc[:self.short_truncate] + " [More...]"
+        if not short_desc:
+            short_desc = self.short_default
+        return short_desc
+
+    def parse_message(self, msg, raw="", timer=NULL_TIMER):
+        """Parse an email.message.Message into a ParsedAdvisory"""
+        subject = self.clean_subject(msg.get('Subject', ''))
+        adv_date = msg.get('Date', '').strip().replace('\n', '').replace('\r', '')
+
+        if self.skip_replies and REPLY_RE.match(subject):
+            raise SkipMessage(f"Reply email, skipping: {subject}")
+        if self.require and not any(token in subject for token in self.require):
+            raise SkipMessage(f"Not a {self.name} advisory: {subject}")
+
+        template, fields = self.match_subject(subject)
+        if template is None:
+            raise ParseError(self.mismatch_error, subject, self.file_type, kind='subject_mismatch')
+        timer.lap('subject')
+
+        text = extract_text(msg, raw)
+        timer.lap('decode')
+        if not text:
+            raise ParseError("No mail content found", subject, self.file_type, exit_code=1)
+
+        try:
+            body, short_desc = self.parse_body(text, timer)
+        except ParseError as e:
+            e.subject = subject
+            raise
+        timer.lap('short_desc')
+        if not body.strip():
+            raise ParseError(self.empty_error, f"No advisory content: {subject}", self.file_type, exit_code=1)
+
+        fields = self.extract_fields(subject, body, fields)
+        cves = extract_cves(f"{subject}\n{body}")
+        title = template.format_map(_Fields(fields))
+        title = apply_subs(self.title_cleanup, title).strip()
+        timer.lap('fields')
+
+        return ParsedAdvisory(
+            spec=self.name,
+            distro=self.distro,
+            file_type=self.file_type,
+            subject=subject,
+            sender=msg.get('From', ''),
+            message_id=(msg.get('Message-ID') or '').strip(),
+            title=title,
+            short_desc=short_desc,
+            body=body,
+            date=adv_date,
+            advisory_id=fields.get('advisory_id', ''),
+            package=fields.get('package', ''),
+            severity=fields.get('severity', '').lower(),
+            cves=cves,
+            fields=fields,
+        )
+
+
+class SpecEngine:
+    """Dispatches messages to compiled parser specs"""
+
+    def __init__(self, specs):
+        self.source_specs = specs
+        self._fingerprint = None
+        self.specs = [CompiledSpec(spec) for spec in specs]
+        self.by_name = {spec.name: spec for spec in self.specs}
+        # One alternation over every spec's detect pattern so dispatch is a single search;
+        # ignore_case is scoped to its own alternative, as match_subject applies it per spec
+        self.detector = re.compile('|'.join(f'(?P<s{i}>(?i:{spec.detect}))' if spec.ignore_case else
+                                            f'(?P<s{i}>{spec.detect})'
+                                            for i, spec in enumerate(self.specs)))
+
+    def detect(self, subject):
+        """Return the spec whose detect pattern matches the subject, or None"""
+        match = self.detector.search(FOLD_RE.sub(' ', subject))
+        if not match:
+            return None
+        return self.specs[int(match.lastgroup[1:])]
+
+    @property
+    def fingerprint(self):
+        """Hash of the specs and the parsing code, so cached results die with any change to either"""
+        if self._fingerprint is None:
+            digest = hashlib.sha256(repr((PARSED_FORMAT, self.source_specs)).encode('utf-8'))
+            paths = [__file__]
+            # From the source specs: CompiledSpec swaps its references for the functions on first use
+            references = [spec.get('short_desc', {}).get(key) for spec in self.source_specs
+                          for key in ('extractor', 'stored_extractor')]
+            for module_name in sorted({ref.split(':')[0] for ref in references if isinstance(ref, str)}):
+                module_spec = importlib.util.find_spec(module_name)
+                if module_spec and module_spec.origin:
+                    paths.append(module_spec.origin)
+            for path in paths:
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def parse(self, raw, spec_name=None, timer=NULL_TIMER, cache=None):
+        """
+        Parse a raw email string, optionally forcing a named spec; stages are
+        charged to timer. With a ParseCache, a message parsed before is
+        returned from it without parsing; skipped and failed messages are
+        not cached.
+        """
+        if cache is not None:
+            key = cache.key(raw, spec_name, self.fingerprint)
+            parsed = cache.get(key)
+            timer.lap('parse_cache')
+            if parsed is not None:
+                return parsed
+        parsed = self._parse(raw, spec_name, timer)
+        if cache is not None:
+            cache.put(key, parsed)
+            timer.lap('parse_cache')
+        return parsed
+
+    def _parse(self, raw, spec_name, timer):
+        msg = email.message_from_string(raw)
+        timer.lap('mime')
+        if spec_name:
+            spec = self.by_name[spec_name]
+        else:
+            spec = self.detect(msg.get('Subject', ''))
+            if spec is None:
+                raise SkipMessage(f"No parser spec matches subject: {msg.get('Subject', '')}")
+        timer.lap('detect')
+        return spec.parse_message(msg, raw, timer)
+
+
+@lru_cache(maxsize=1)
+def get_engine():
+    """Return the process-wide engine compiled from parser_specs.SPECS"""
+    from parser_specs import SPECS
+    return SpecEngine(SPECS)
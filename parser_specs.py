@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Declarative parser specs, one per advisory feed.
+
+Each spec is compiled once by parser_engine.CompiledSpec. Keys:
+
+  name, distro       spec name and Advisory.category_map key
+  file_type          os name used in failure notifications
+  detect             pattern used by the dispatcher to pick this spec
+  require            subject must contain one of these strings, else skip
+  ignore_case        compile subject patterns case-insensitively
+  subject_cleanup    (pattern, repl[, flags]) subs applied to the subject first
+  subject_patterns   (pattern, title template) pairs, first match wins; named
+                     groups and fields are available to the template
+  mismatch_error     failure reason when no subject pattern matches
+  title_cleanup      subs applied to the formatted title
+  fields             name -> {source: subject|body, patterns, cleanup, default}
+  body               {start, end, skip_leading_blank}: advisory body markers
+  short_desc         {start, skip_block, end, max_lines, line_cleanup, required,
+                      cleanup, truncate, default}; line_cleanup subs run on each
+                      line before joining, lines left blank are dropped. Or
+                     {extractor: 'module:function'}, plus an optional
+                      stored_extractor used on fulltext already in the
+                      database (backfill.py)
+  coalesce           {group_by, release, title, release_line}: hold and merge
+                     per-release announcements of one build (coalesce.py)
+"""
+
+import re
+
+
+DEBIAN = {
+    'name': 'debian',
+    'distro': 'debian',
+    'file_type': 'DEBIAN',
+    'detect': r'\[DSA[ -]\d+-\d+\]',
+    'require': ['SECURITY'],
+    'ignore_case': True,
+    'subject_patterns': [
+        (r'\[SECURITY\] \[DSA[ -](?P<num>\d+)-(?P<rev>\d+)\]\s+(?P<summary>.*)',
+         'Debian: DSA-{num}-{rev}: {summary}'),
+    ],
+    'mismatch_error': 'Failed to parse subject - no matching DSA pattern found',
+    'title_cleanup': [(r'(moderate|important|security|update)', '', re.IGNORECASE)],
+    'fields': {
+        'advisory_id': {'source': 'subject', 'patterns': [r'(DSA[ -]\d+-\d+)'], 'cleanup': [(r' ', '-')]},
+        'package': {'source': 'subject', 'patterns': [r'\d\]\s+(?:New\s+)?(\S+)']},
+        # DSAs only cover stable-release security fixes
+        'severity': {'source': 'subject', 'patterns': [r'\b(critical|important|moderate|low)\b'], 'default': 'important'},
+    },
+    'body': {'start': r'Hash:', 'end': r'^-----BEGIN PGP SIGNATURE'},
+    'short_desc': {
+        'start': r'^(Vulnerability|Package(s)?)\s+:',
+        'skip_block': True,
+        'max_lines': 5,
+        'required': 'Failed to find Package section in email body',
+        'cleanup': [(r' +', ' ')],
+        'default': 'Security update',
+    },
+}
+
+DEBIAN_LTS = {
+    'name': 'deblts',
+    'distro': 'deblts',
+    'file_type': 'DEBLTS',
+    'detect': r'\[DLA[ -]\d+-\d+\]',
+    'require': ['SECURITY'],
+    'ignore_case': True,
+    'subject_patterns': [
+        (r'\[SECURITY\] \[DLA[ -](?P<num>\d+)-(?P<rev>\d+)\]\s+(?P<summary>.*)',
+         'Debian LTS: DLA-{num}-{rev}: {summary}'),
+    ],
+    'mismatch_error': 'Failed to parse subject - no matching DLA pattern found',
+    'title_cleanup': [(r'(moderate|important|security|update)', '', re.IGNORECASE)],
+    'fields': {
+        'advisory_id': {'source': 'subject', 'patterns': [r'(DLA[ -]\d+-\d+)'], 'cleanup': [(r' ', '-')]},
+        'package': {'source': 'subject', 'patterns': [r'\d\]\s+(\S+)']},
+        'severity': {'source': 'subject', 'patterns': [r'\b(critical|important|moderate|low)\b'], 'default': 'moderate'},
+    },
+    'body': {'start': r'Hash:', 'end': r'^-----BEGIN PGP SIGNATURE'},
+    'short_desc': {
+        'start': r'^(Vulnerability|Package(s)?)\s+:',
+        'skip_block': True,
+        'max_lines': 5,
+        'required': 'Failed to find Package section in email body',
+        'cleanup': [(r' +', ' ')],
+        'default': 'Security update',
+    },
+}
+
+FEDORA = {
+    'name': 'fedora',
+    'distro': 'fedora',
+    'file_type': 'fedora',
+    'detect': r'\[SECURITY\] Fedora \d+',
+    'require': ['SECURITY'],
+    'subject_patterns': [
+        (r'\[SECURITY\] Fedora (?P<version>\d+)', 'Fedora {version}: {package} {advisory_id}'),
+    ],
+    'mismatch_error': 'fedora version mismatched',
+    'fields': {
+        'advisory_id': {'patterns': [r'^FEDORA-(\S+)', r'(CVE-\S+)']},
+        'package': {'patterns': [r'^Name\s+:\s*(.*)'], 'cleanup': [(r'\r', '')]},
+        'package_version': {'patterns': [r'^Version\s+:\s*(.*)'], 'cleanup': [(r'\r', '')]},
+        'severity': {'default': 'moderate'},
+    },
+    # The same build is announced once per Fedora release; see coalesce.py
+    'coalesce': {
+        'group_by': ['package', 'package_version'],
+        'release': 'version',
+        'title': 'Fedora {releases}: {package} {advisory_ids}',
+        'release_line': 'Fedora {version}: {advisory_id}',
+    },
+    'short_desc': {
+        'start': r'^Update Information',
+        'end': r'-{72}',
+        'max_lines': 5,
+        'line_cleanup': [(r'====.+', '')],
+        'cleanup': [(r'\s+', ' ')],
+        'truncate': 400,
+    },
+}
+
+MAGEIA = {
+    'name': 'mageia',
+    'distro': 'mageia',
+    'file_type': 'MAGEIA',
+    'detect': r'MGAS?A-\d+-\d+',
+    'require': ['MGASA-', 'MGAA-'],
+    'ignore_case': True,
+    'subject_cleanup': [(r'[\r\n\x0b\x0c]', '')],
+    # Order matters - more specific patterns first
+    'subject_patterns': [
+        (r'MGASA-(?P<year>\d+)-(?P<num>\d+):\s*Updated\s+(?P<package>.*?)\s+packages?\s+fix\s+security\s+vulnerabilities?',
+         'Mageia {year}-{num}: {package}'),
+        (r'MGASA-(?P<year>\d+)-(?P<num>\d+):\s*Updated\s+(?P<package>.*?)\s+packages?\s+fix\s+a\s+security\s+vulnerability',
+         'Mageia {year}-{num}: {package}'),
+        (r'MGASA-(?P<year>\d+)-(?P<num>\d+):\s*New\s+(?P<package>.*?)\s+(.*?)\s+fixes\s+bugs\s+and',
+         'Mageia {year}-{num}: {package}'),
+        (r'MGAA-(?P<year>\d+)-(?P<num>\d+):\s*Updated\s+(?P<package>.*?)\s+packages?\s+fix\s+bugs?',
+         'Mageia {year}-{num}: {package}'),
+        (r'MGASA-(?P<year>\d+)-(?P<num>\d+)\s*-\s*Updated\s+(?P<package>.*?)\s+packages?\s+fix\s+security\s+vulnerabilities?',
+         'Mageia {year}-{num}: {package}'),
+        (r'MGASA-(?P<year>\d+)-(?P<num>\d+)\s*-\s*(?P<package>.*?)\s+(.*?)\s+fixes?\s+security\s+vulnerabilities?',
+         'Mageia {year}-{num}: {package}'),
+        # Generic fallback - just extract the advisory number
+        (r'MGASA-(?P<year>\d+)-(?P<num>\d+)', 'Mageia {year}-{num}: {package}'),
+        (r'MGAA-(?P<year>\d+)-(?P<num>\d+)', 'Mageia {year}-{num}: {package}'),
+    ],
+    'mismatch_error': 'Failed to parse subject - no matching pattern found',
+    'title_cleanup': [(r'Security Advisory Updates', '')],
+    'fields': {
+        'advisory_id': {'source': 'subject', 'patterns': [r'(MGAS?A-\d+-\d+)']},
+        # Comma/&/and separated package lists - take only the first one
+        'package': {
+            'source': 'subject',
+            'patterns': [r'Updated\s+([\w-]+)'],
+            'cleanup': [(r'\s*(?:,|&| and ).*$', ''), (r'[&\s]+', ' ')],
+            'default': 'unknown',
+        },
+        # MGASA is a security advisory, MGAA a bugfix-only one
+        'severity': {
+            'source': 'subject',
+            'patterns': [r'(MGAS?A)-'],
+            'cleanup': [(r'MGASA', 'moderate', re.IGNORECASE), (r'MGAA', 'low', re.IGNORECASE)],
+            'default': 'moderate',
+        },
+    },
+    'body': {'skip_leading_blank': True},
+    'short_desc': {'end': r'^Publication date:', 'default': 'Security update'},
+}
+
+OPENSUSE = {
+    'name': 'opensuse',
+    'distro': 'opensuse',
+    'file_type': 'opensuse',
+    'detect': r'SUSE-SU-\d+',
+    'subject_cleanup': [
+        (r'\. +', '. '),
+        (r'\s+', ' '),
+        (r'the linux kernel', 'kernel', re.IGNORECASE),
+    ],
+    'subject_patterns': [
+        (r'\[security-announce\] openSUSE-SU-(?P<year>\d+):(?P<num>\d+)-(?P<rev>\d+): (?P<summary>.*)$',
+         'openSUSE: {year}:{num}-{rev}: {summary}'),
+        (r'\[opensuse-security-announce\]\s+openSUSE-SU-(?P<year>\d+):(?P<num>\d+)-(?P<rev>\d+): (?P<severity>\w+): Security update for (?P<summary>.*)',
+         'openSUSE: {year}:{num}-{rev} {severity}: {summary}'),
+        (r'SUSE-SU-(?P<year>\d+):(?P<num>\d+)-(?P<rev>\d+): (?P<severity>\w+): Security update for (?P<summary>.*)',
+         'openSUSE: {year}:{num}-{rev} {severity}: {summary}'),
+        (r'SUSE-SU-(?P<year>\d+):(?P<num>\d+)-(?P<rev>\d+): (?P<severity>\w+): (?P<summary>.*) on GA media',
+         'openSUSE: {year}:{num}-{rev} {severity}: {summary}'),
+        (r'openSUSE-SU-(?P<year>\d+):(?P<num>\d+)-(?P<rev>\d+): Security update for (?P<summary>.*)',
+         'openSUSE: {year}:{num}-{rev}: {summary}'),
+        (r'openSUSE-SU-(?P<year>\d+):(?P<num>\d+)-(?P<rev>\d+): (?P<severity>\w+): Recommended update for (?P<summary>.*)',
+         'openSUSE: {year}:{num}-{rev}: {severity}: {summary}'),
+        (r'openSUSE-SU-4(?P<year>\d+)-(?P<num>\d+): (?P<severity>\w+): Security update for (?P<summary>.*)',
+         'openSUSE: 4{year}-{num} {severity}: {summary}'),
+        (r'openSUSE-SU-(?P<year>\d+)-(?P<num>\d+)-(?P<rev>\d+): (?P<severity>\w+): Security update for (?P<summary>.*)',
+         'openSUSE: {year}-{num}-{rev} {severity}: {summary}'),
+        (r'openSUSE-SU-(?P<year>\d+)-(?P<num>\d+)-(?P<rev>\d+): (?P<severity>\w+): Recommended update (?:of|for) (?P<summary>.*)',
+         'openSUSE: {year}-{num}-{rev} {severity}: {summary}'),
+    ],
+    'mismatch_error': 'Subject does not match any known OpenSUSE security advisory pattern',
+    'title_cleanup': [
+        (r'Security update for', ''),
+        (r' \(Live .*', ''),
+        (r'update to', ''),
+        (r'update for', ''),
+        (r' to .*', ''),
+        (r' +', ' '),
+        (r'important: (.*):.*', r'important: \1'),
+        (r'critical: (.*):.*', r'critical: \1'),
+        (r'moderate: (.*):.*', r'critical: \1'),
+        (r'moderate', '', re.IGNORECASE),
+        (r'important', '', re.IGNORECASE),
+        (r'security', '', re.IGNORECASE),
+        (r'update', '', re.IGNORECASE),
+    ],
+    'fields': {
+        'advisory_id': {'source': 'subject', 'patterns': [r'((?:open)?SUSE-SU-\d+[:-]\d+-\d+)']},
+        'package': {'source': 'subject', 'patterns': [r'update (?:for|of) ([\w.+-]+)']},
+        # Usually filled from the subject pattern's severity group
+        'severity': {'source': 'subject', 'patterns': [r'\b(critical|important|moderate|low)\b'], 'default': 'moderate'},
+    },
+    'short_desc': {
+        'extractor': 'opensuse_alert:extract_short_desc',
+        # No first-descriptive-line guess when backfilling stored articles
+        'stored_extractor': 'opensuse_alert:extract_introtext_from_content',
+        'cleanup': [(r'\. +', '. '), (r'\s+', ' ')],
+        'truncate': 400,
+    },
+}
+
+UBUNTU = {
+    'name': 'ubuntu',
+    'distro': 'ubuntu',
+    'file_type': 'ubuntu',
+    'detect': r'USN-\d+-\d+',
+    'subject_patterns': [
+        (r'\[?USN-(?P<num>\d+)-(?P<rev>\d+)\]?:?\s+(?P<summary>.*)', 'Ubuntu {num}-{rev}: {summary}'),
+    ],
+    'mismatch_error': 'Failed to parse subject - no matching USN pattern found',
+    'title_cleanup': [(r'(security|update)', '', re.IGNORECASE), (r' +', ' ')],
+    'fields': {
+        'advisory_id': {'source': 'subject', 'patterns': [r'(USN-\d+-\d+)']},
+        'package': {'patterns': [r'^Software Description:\s*\n-\s+([\w.+-]+)']},
+        'severity': {'default': 'moderate'},
+    },
+    'body': {'end': r'^-----BEGIN PGP SIGNATURE', 'skip_leading_blank': True},
+    'short_desc': {
+        'start': r'^Summary:',
+        'end': r'^Software Description:',
+        'max_lines': 5,
+        'cleanup': [(r'\s+', ' ')],
+        'truncate': 400,
+        'default': 'Security update',
+    },
+}
+
+# Dispatch order: the first spec whose detect pattern matches the subject wins
+SPECS = [DEBIAN, DEBIAN_LTS, FEDORA, MAGEIA, OPENSUSE, UBUNTU]
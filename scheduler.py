@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Severity-ordered, per-distro fair scheduling of advisory inserts.
+
+Each alert script is its own process, so during a release storm dozens of
+them insert at once and a critical DSA waits behind every large SUSE kernel
+advisory that got there first. The dispatcher now takes one of SCHED_SLOTS
+insert slots from a SQLite ticket table shared by all scripts. A free slot
+goes to the waiting ticket with the highest severity class. Within a class,
+the distro served least recently wins, then the earliest arrival. Tickets
+move up one class for every SCHED_AGING seconds they wait, so low severity
+work is delayed but never starved. Tickets of processes that died are
+reaped. Queue depth at arrival and wait time are recorded per class, and
+`scheduler.py --status` shows the live queue.
+
+The same ordering is applied to spool replays through order().
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+from contextlib import contextmanager
+import metrics
+from sqlite_store import open_store
+
+SCHED_DB = os.getenv('SCHED_DB', '/home/alerts/scripts_linstage/scheduler.sqlite3')
+# Concurrent inserts allowed; 0 disables scheduling
+SCHED_SLOTS = int(os.getenv('SCHED_SLOTS', 4))
+SCHED_AGING = float(os.getenv('SCHED_AGING', 300))
+POLL_SECONDS = 0.05
+
+SCHEMA = [
+    # started_at is NULL while a ticket waits
+    "CREATE TABLE IF NOT EXISTS tickets (id INTEGER PRIMARY KEY AUTOINCREMENT, pid INTEGER NOT NULL, "
+    "severity TEXT NOT NULL, distro TEXT NOT NULL, arrived_at REAL NOT NULL, started_at REAL)",
+    "CREATE TABLE IF NOT EXISTS served (distro TEXT PRIMARY KEY, served_at REAL NOT NULL)",
+]
+
+SEVERITY_CLASSES = ['critical', 'important', 'moderate', 'low']
+SEVERITY_ALIASES = {'urgent': 'critical', 'high': 'important', 'medium': 'moderate', 'negligible': 'low'}
+DEFAULT_CLASS = 'moderate'
+
+
+def severity_class(severity):
+    """Scheduling class for a parsed severity; unknown values are moderate"""
+    severity = (severity or '').strip().lower()
+    severity = SEVERITY_ALIASES.get(severity, severity)
+    return severity if severity in SEVERITY_CLASSES else DEFAULT_CLASS
+
+
+def pick(waiting, last_served, now, aging=SCHED_AGING):
+    """
+    Next of waiting (id, class, distro, arrived_at) tuples to run: highest
+    aged class, then least recently served distro, then earliest arrival.
+    """
+    def rank(ticket):
+        _, severity, distro, arrived_at = ticket
+        level = SEVERITY_CLASSES.index(severity)
+        if aging:
+            level = max(0, level - int((now - arrived_at) // aging))
+        return level, last_served.get(distro, 0.0), arrived_at
+    return min(waiting, key=rank, default=None)
+
+
+def order(items, key):
+    """Items sorted into the order the scheduler would run them; key gives (class, distro, arrived_at)"""
+    waiting = [(index, *key(item)) for index, item in enumerate(items)]
+    last_served = {}
+    ordered = []
+    while waiting:
+        ticket = pick(waiting, last_served, now=0, aging=0)
+        waiting.remove(ticket)
+        # Serving order stands in for time so distros take turns
+        last_served[ticket[2]] = len(ordered) + 1
+        ordered.append(items[ticket[0]])
+    return ordered
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class InsertScheduler:
+    """Cross-process insert slots handed out by severity and distro fairness"""
+
+    def __init__(self, path=SCHED_DB, slots=SCHED_SLOTS, aging=SCHED_AGING):
+        self.path = path
+        self.slots = slots
+        self.aging = aging
+        self.connection = None
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = open_store(self.path, SCHEMA, timeout=30, isolation_level=None)
+        return self.connection
+
+    @contextmanager
+    def slot(self, severity, distro):
+        """Block until this advisory may insert; yields the seconds waited"""
+        if self.slots <= 0:
+            yield 0.0
+            return
+        severity = severity_class(severity)
+        ticket = None
+        try:
+            ticket = self.enqueue(severity, distro)
+            waited = self.wait(ticket, severity)
+        except sqlite3.Error as e:
+            # Scheduling is only an optimisation; never hold up an insert on it
+            print(f"Error scheduling insert, continuing unscheduled: {e}")
+            if ticket is not None:
+                # Left waiting, it would block the queue until this process exits
+                self.release(ticket)
+            self.close()
+            yield 0.0
+            return
+        try:
+            yield waited
+        finally:
+            self.release(ticket)
+
+    def enqueue(self, severity, distro):
+        connection = self.connect()
+        with self.transaction(connection):
+            ticket = connection.execute(
+                "INSERT INTO tickets (pid, severity, distro, arrived_at) VALUES (?, ?, ?, ?)",
+                (os.getpid(), severity, distro, time.time())).lastrowid
+            depth = connection.execute("SELECT COUNT(*) FROM tickets WHERE started_at IS NULL AND severity = ?",
+                                       (severity,)).fetchone()[0]
+        metrics.SCHED_QUEUE_DEPTH.observe(depth, severity=severity)
+        return ticket
+
+    def wait(self, ticket, severity):
+        connection = self.connect()
+        while True:
+            with self.transaction(connection):
+                self.reap(connection)
+                running = connection.execute("SELECT COUNT(*) FROM tickets WHERE started_at IS NOT NULL").fetchone()[0]
+                if running < self.slots:
+                    now = time.time()
+                    waiting = connection.execute(
+                        "SELECT id, severity, distro, arrived_at FROM tickets WHERE started_at IS NULL").fetchall()
+                    last_served = dict(connection.execute("SELECT distro, served_at FROM served").fetchall())
+                    head = pick(waiting, last_served, now, self.aging)
+                    if head and head[0] == ticket:
+                        connection.execute("UPDATE tickets SET started_at = ? WHERE id = ?", (now, ticket))
+                        connection.execute("INSERT OR REPLACE INTO served (distro, served_at) VALUES (?, ?)",
+                                           (head[2], now))
+                        waited = now - head[3]
+                        metrics.SCHED_WAIT_SECONDS.observe(waited, severity=severity)
+                        return waited
+            time.sleep(POLL_SECONDS * random.uniform(0.5, 1.5))
+
+    def reap(self, connection):
+        """Drop tickets whose process has gone"""
+        for ticket, pid in connection.execute("SELECT id, pid FROM tickets").fetchall():
+            if pid != os.getpid() and not pid_alive(pid):
+                connection.execute("DELETE FROM tickets WHERE id = ?", (ticket,))
+
+    def release(self, ticket):
+        try:
+            self.connect().execute("DELETE FROM tickets WHERE id = ?", (ticket,))
+        except sqlite3.Error as e:
+            print(f"Error releasing insert slot {ticket}: {e}")
+
+    @contextmanager
+    def transaction(self, connection):
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def waiting(self):
+        """Inserts waiting for a slot; 0 if the queue can't be read"""
+        try:
+            return self.connect().execute("SELECT COUNT(*) FROM tickets WHERE started_at IS NULL").fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error reading insert queue: {e}")
+            return 0
+
+    def status(self):
+        """{class: (waiting, running, oldest wait seconds)}"""
+        now = time.time()
+        status = {severity: (0, 0, 0.0) for severity in SEVERITY_CLASSES}
+        for severity, waiting, running, oldest in self.connect().execute(
+                "SELECT severity, SUM(started_at IS NULL), SUM(started_at IS NOT NULL), "
+                "MIN(CASE WHEN started_at IS NULL THEN arrived_at END) FROM tickets GROUP BY severity"):
+            status[severity] = (waiting, running, now - oldest if oldest else 0.0)
+        return status
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ['--help', '-h']:
+        print("Usage: python scheduler.py --status")
+        print("  --status: Waiting and running inserts per severity class")
+        print(f"  Queue: {SCHED_DB} (SCHED_DB), {SCHED_SLOTS} slots (SCHED_SLOTS), "
+              f"aging {SCHED_AGING:g}s (SCHED_AGING)")
+        sys.exit(0)
+    if args[0] != '--status':
+        print(f"Error: unknown option {args[0]}")
+        sys.exit(1)
+    scheduler = InsertScheduler()
+    try:
+        print(f"{'class':<10} {'waiting':>8} {'running':>8} {'oldest wait':>12}")
+        for severity, (waiting, running, oldest) in scheduler.status().items():
+            print(f"{severity:<10} {waiting:>8} {running:>8} {oldest:>11.1f}s")
+    finally:
+        scheduler.close()
+
+
+if __name__ == "__main__":
+    main()
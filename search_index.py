@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Local SQLite full-text mirror of ingested advisories.
+
+Checking whether an advisory, CVE or package is already carried used to mean
+LIKE scans over xu5gc_content.fulltext on the production server. Every
+successful insert is now also written to a local SQLite database with an
+FTS5 index over title, introtext and body. Distro, advisory id, package and
+CVE ids are stored as indexed facets next to it, so lookups answer in
+milliseconds without touching MySQL. `--bootstrap` fills the mirror from the
+existing content table by keyset on id. Its progress is checkpointed per
+database, apart from the live inserts, so it resumes where it stopped
+rather than after the newest article a live insert mirrored.
+
+Facets are taken from the stored title and body rather than the parsed
+message, so live inserts, replays and bootstrapped rows get the same ones.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import sqlite3
+import threading
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from parser_engine import extract_cves
+from sqlite_store import open_store
+
+# '' disables the mirror
+SEARCH_DB = os.getenv('SEARCH_DB', '/home/alerts/scripts_linstage/search.sqlite3')
+BOOTSTRAP_CHUNK = 1000
+CHECKPOINT_FILE = '/home/alerts/scripts_linstage/search-bootstrap-checkpoint.json'
+
+SCHEMA = [
+    # article_id is the row's id in the first database it was inserted into
+    "CREATE TABLE IF NOT EXISTS advisories (id INTEGER PRIMARY KEY, title TEXT NOT NULL UNIQUE, "
+    "distro TEXT NOT NULL, advisory_id TEXT NOT NULL, package TEXT NOT NULL, created TEXT NOT NULL, "
+    "article_id INTEGER, introtext TEXT NOT NULL, body TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS distro_idx ON advisories (distro, created)",
+    "CREATE INDEX IF NOT EXISTS advisory_id_idx ON advisories (advisory_id)",
+    "CREATE INDEX IF NOT EXISTS package_idx ON advisories (package)",
+    "CREATE INDEX IF NOT EXISTS article_idx ON advisories (article_id)",
+    "CREATE TABLE IF NOT EXISTS cves (cve TEXT NOT NULL, advisory INTEGER NOT NULL, "
+    "PRIMARY KEY (cve, advisory)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS cve_advisory_idx ON cves (advisory)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS advisories_fts USING fts5("
+    "title, introtext, body, content='advisories', content_rowid='id')",
+]
+
+ADVISORY_ID_RE = re.compile(r'\b(DSA-\d+-\d+|DLA-\d+-\d+|FEDORA-\d{4}-[0-9a-f]+|MGAS?A-\d+-\d+|'
+                            r'(?:open)?SUSE-SU-\d+:\d+-\d+|USN-\d+-\d+)\b', re.IGNORECASE)
+# Body lines naming the package (Debian, Fedora, Ubuntu); otherwise the title's last part
+BODY_PACKAGE_RES = [
+    re.compile(r'^Package\s*:\s*([\w.+-]+)', re.MULTILINE),
+    re.compile(r'^Name\s*:\s*([\w.+-]+)', re.MULTILINE),
+    re.compile(r'^Software Description:\s*\n-\s+([\w.+-]+)', re.MULTILINE),
+]
+TITLE_PACKAGE_RE = re.compile(r':\s*([\w.+-]+)[^:]*$')
+HTML_RE = re.compile(r'<[^>]+>|&lt;|&gt;|&amp;')
+HTML_ENTITIES = {'&lt;': '<', '&gt;': '>', '&amp;': '&'}
+WORD_RE = re.compile(r'[\w.+-]{3,}')
+
+
+def extract_facets(title, body):
+    """{advisory_id, package, cves} found in an advisory's title and body"""
+    match = ADVISORY_ID_RE.search(title) or ADVISORY_ID_RE.search(body)
+    package = ''
+    for regex in BODY_PACKAGE_RES:
+        found = regex.search(body)
+        if found:
+            package = found.group(1)
+            break
+    else:
+        found = TITLE_PACKAGE_RE.search(title)
+        if found:
+            package = found.group(1)
+    return {
+        'advisory_id': match.group(1).upper() if match else '',
+        'package': package.lower(),
+        'cves': extract_cves(f"{title}\n{body}"),
+    }
+
+
+def iso_date(adv_date):
+    """Date header or MySQL created value as 'YYYY-MM-DD HH:MM:SS', now if it can't be parsed"""
+    if not isinstance(adv_date, datetime):
+        try:
+            adv_date = parsedate_to_datetime(adv_date)
+        except (TypeError, ValueError, IndexError):
+            try:
+                adv_date = datetime.fromisoformat(str(adv_date))
+            except ValueError:
+                adv_date = datetime.now()
+    return adv_date.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def fts_query(text):
+    """Free text as an FTS5 query of quoted terms, so punctuation in ids can't break the syntax"""
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+
+class SearchIndex:
+    """SQLite mirror of advisories with an FTS5 index and facet tables"""
+
+    def __init__(self, path=SEARCH_DB):
+        self.path = path
+        self.connection = None
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = open_store(self.path, SCHEMA, timeout=30)
+        return self.connection
+
+    def _upsert(self, connection, title, introtext, body, distro, created, article_id):
+        facets = extract_facets(title, body)
+        old = connection.execute("SELECT id, title, introtext, body FROM advisories WHERE title = ?",
+                                 (title,)).fetchone()
+        if old:
+            # External content tables need the old text to drop its terms
+            connection.execute("INSERT INTO advisories_fts (advisories_fts, rowid, title, introtext, body) "
+                               "VALUES ('delete', ?, ?, ?, ?)", old)
+            connection.execute("UPDATE advisories SET distro = ?, advisory_id = ?, package = ?, created = ?, "
+                               "article_id = ?, introtext = ?, body = ? WHERE id = ?",
+                               (distro, facets['advisory_id'], facets['package'], created, article_id,
+                                introtext, body, old[0]))
+            connection.execute("DELETE FROM cves WHERE advisory = ?", (old[0],))
+            row_id = old[0]
+        else:
+            row_id = connection.execute(
+                "INSERT INTO advisories (title, distro, advisory_id, package, created, article_id, introtext, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (title, distro, facets['advisory_id'], facets['package'], created, article_id,
+                 introtext, body)).lastrowid
+        connection.execute("INSERT INTO advisories_fts (rowid, title, introtext, body) VALUES (?, ?, ?, ?)",
+                           (row_id, title, introtext, body))
+        connection.executemany("INSERT OR IGNORE INTO cves (cve, advisory) VALUES (?, ?)",
+                               [(cve, row_id) for cve in facets['cves']])
+        return row_id
+
+    def add(self, title, introtext, body, distro, adv_date, article_id=None):
+        """Mirror one inserted advisory, replacing any earlier copy of the title"""
+        if not self.path:
+            return
+        try:
+            with self.connect() as connection:
+                self._upsert(connection, title, introtext or '', body or '', distro.lower(), iso_date(adv_date),
+                             article_id)
+        except sqlite3.Error as e:
+            # The mirror is only a lookup aid; the insert already succeeded
+            print(f"Error writing search index: {e}")
+
+    def add_many(self, rows):
+        """Mirror (title, introtext, body, distro, created, article_id) rows in one transaction"""
+        with self.connect() as connection:
+            for title, introtext, body, distro, created, article_id in rows:
+                self._upsert(connection, title, introtext or '', body or '', distro, iso_date(created), article_id)
+
+    def search(self, text=None, distro=None, advisory_id=None, package=None, cve=None, limit=20):
+        """
+        Matching advisories, best first for text searches and newest first
+        otherwise, as dicts with a highlighted snippet of the body
+        """
+        conditions = []
+        params = []
+        if text:
+            conditions.append("advisories_fts MATCH ?")
+            params.append(fts_query(text))
+        if distro:
+            conditions.append("a.distro = ?")
+            params.append(distro.lower())
+        if advisory_id:
+            conditions.append("a.advisory_id = ?")
+            params.append(advisory_id.upper())
+        if package:
+            conditions.append("a.package = ?")
+            params.append(package.lower())
+        if cve:
+            conditions.append("a.id IN (SELECT advisory FROM cves WHERE cve = ?)")
+            params.append(cve.upper())
+        if text:
+            source = ("advisories_fts JOIN advisories a ON a.id = advisories_fts.rowid",
+                      "snippet(advisories_fts, 2, '[', ']', '...', 12)", "bm25(advisories_fts, 10, 3, 1)")
+        else:
+            source = ("advisories a", "substr(a.introtext, 1, 120)", "a.created DESC")
+        query = (f"SELECT a.id, a.title, a.distro, a.advisory_id, a.package, a.created, a.article_id, {source[1]} "
+                 f"FROM {source[0]}{' WHERE ' + ' AND '.join(conditions) if conditions else ''} "
+                 f"ORDER BY {source[2]} LIMIT ?")
+        connection = self.connect()
+        results = []
+        for row_id, title, distro, adv_id, package, created, article_id, snippet in connection.execute(
+                query, (*params, limit)):
+            results.append({'title': title, 'distro': distro, 'advisory_id': adv_id, 'package': package,
+                            'created': created, 'article_id': article_id, 'snippet': snippet,
+                            'cves': [cve for (cve,) in connection.execute(
+                                "SELECT cve FROM cves WHERE advisory = ? ORDER BY cve", (row_id,))]})
+        return results
+
+    def similar(self, title, limit=10):
+        """Other advisories sharing the most terms with a title, for near-duplicate checks"""
+        terms = sorted({word.lower() for word in WORD_RE.findall(title)})
+        if not terms:
+            return []
+        query = ' OR '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        rows = self.connect().execute(
+            "SELECT a.title, a.distro, a.created, a.article_id FROM advisories_fts "
+            "JOIN advisories a ON a.id = advisories_fts.rowid "
+            "WHERE advisories_fts MATCH ? AND a.title != ? ORDER BY bm25(advisories_fts, 10, 1, 0) LIMIT ?",
+            (f"title : ({query})", title, limit))
+        return [{'title': t, 'distro': d, 'created': c, 'article_id': a} for t, d, c, a in rows]
+
+    def stats(self):
+        """{distro: advisories}, plus the number of distinct CVEs under 'cves'"""
+        connection = self.connect()
+        counts = dict(connection.execute("SELECT distro, COUNT(*) FROM advisories GROUP BY distro ORDER BY distro"))
+        counts['cves'] = connection.execute("SELECT COUNT(DISTINCT cve) FROM cves").fetchone()[0]
+        return counts
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+_search_index = None
+_lock = threading.Lock()
+
+
+def get_search_index():
+    """The process-wide search index, closed at exit"""
+    global _search_index
+    with _lock:
+        if _search_index is None:
+            _search_index = SearchIndex()
+            atexit.register(_search_index.close)
+        return _search_index
+
+
+def strip_html(fulltext):
+    """Stored fulltext without the <pre><font> wrapper and entities"""
+    return HTML_RE.sub(lambda m: HTML_ENTITIES.get(m.group(0), ''), fulltext or '')
+
+
+def iter_content(connection, start_id=0, chunk_size=BOOTSTRAP_CHUNK):
+    """Yield chunks of published (id, catid, title, introtext, fulltext, created) rows by keyset on id"""
+    cursor = connection.cursor(buffered=False)
+    last_id = start_id
+    try:
+        while True:
+            cursor.execute("SELECT id, catid, title, introtext, `fulltext`, created FROM xu5gc_content "
+                           f"WHERE state = 1 AND id > %s ORDER BY id LIMIT {int(chunk_size)}", (last_id,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            yield rows
+            last_id = rows[-1][0]
+            if len(rows) < chunk_size:
+                break
+    finally:
+        cursor.close()
+
+
+def bootstrap(index, checkpoint, database=None, chunk_size=BOOTSTRAP_CHUNK):
+    """Mirror the published articles of a database after its checkpointed id; returns the count"""
+    from advisory import Advisory
+    advisory_handler = Advisory()
+    database = database or advisory_handler.databases[0]
+    # Categories shared by several distros are mirrored under the first listed
+    distros = {}
+    for distro, catid in advisory_handler.category_map.items():
+        distros.setdefault(catid, distro)
+
+    connection = advisory_handler.db_connect(database)
+    if not connection:
+        raise Exception(f"failed to connect to MySQL database {database}")
+    key = f"search:{database}"
+    start_id = checkpoint.get(key) or 0
+    if start_id:
+        print(f"{database}: resuming after id {start_id}")
+    total = 0
+    start = time.perf_counter()
+    try:
+        for rows in iter_content(connection, start_id, chunk_size):
+            index.add_many([(title, introtext, strip_html(fulltext), distros.get(catid, 'other'), created, record_id)
+                            for record_id, catid, title, introtext, fulltext, created in rows])
+            checkpoint.set(key, rows[-1][0])
+            total += len(rows)
+            print(f"{database}: {total} advisories mirrored, last id {rows[-1][0]} "
+                  f"({total / (time.perf_counter() - start):.0f}/s)")
+    finally:
+        advisory_handler.db_disconnect(connection)
+    return total
+
+
+def print_usage():
+    print("Usage: python search_index.py [options] [TEXT]")
+    print("  TEXT: Full-text search over title, introtext and body")
+    print("  --distro NAME, --advisory ID, --package NAME, --cve CVE-YYYY-NNNN: Filter by facet")
+    print("  --similar TITLE: Advisories with titles close to TITLE")
+    print("  --limit N: Maximum results (default: 20)")
+    print("  --json: One JSON object per result")
+    print("  --stats: Advisories per distro and distinct CVEs")
+    print("  --bootstrap [--database NAME] [--restart]: Mirror existing articles from MySQL")
+    print("    --restart: Discard the saved checkpoint and mirror from the first article")
+    print(f"  Index: {SEARCH_DB or '(disabled)'} (SEARCH_DB)")
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ['--help', '-h']:
+        print_usage()
+        sys.exit(0)
+    if not SEARCH_DB:
+        print("Error: SEARCH_DB is empty, the search index is disabled")
+        sys.exit(1)
+
+    options = {'limit': 20}
+    words = []
+    while args:
+        arg = args.pop(0)
+        if arg in ['--json', '--stats', '--bootstrap', '--restart']:
+            options[arg[2:]] = True
+        elif arg in ['--distro', '--advisory', '--package', '--cve', '--similar', '--limit', '--database']:
+            if not args:
+                print(f"Error: {arg} requires a value")
+                sys.exit(1)
+            options[arg[2:]] = int(args.pop(0)) if arg == '--limit' else args.pop(0)
+        elif arg.startswith('--'):
+            print(f"Error: unknown option {arg}")
+            sys.exit(1)
+        else:
+            words.append(arg)
+
+    index = SearchIndex()
+    try:
+        if options.get('bootstrap'):
+            from backfill import Checkpoint
+            checkpoint = Checkpoint(os.getenv('SEARCH_BOOTSTRAP_CHECKPOINT', CHECKPOINT_FILE))
+            database = options.get('database')
+            if options.get('restart'):
+                from advisory import Advisory
+                checkpoint.set(f"search:{database or Advisory().databases[0]}", None)
+            print(f"Mirrored {bootstrap(index, checkpoint, database)} advisories into {index.path}")
+            return
+        if options.get('stats'):
+            for name, count in index.stats().items():
+                print(f"{name:<12} {count}")
+            return
+
+        start = time.perf_counter()
+        if options.get('similar'):
+            results = index.similar(options['similar'], options['limit'])
+        else:
+            results = index.search(' '.join(words) or None, options.get('distro'), options.get('advisory'),
+                                   options.get('package'), options.get('cve'), options['limit'])
+        elapsed = (time.perf_counter() - start) * 1000
+        for result in results:
+            if options.get('json'):
+                print(json.dumps(result))
+                continue
+            print(f"{result['created']} [{result['distro']}] {result['title']}  (article {result['article_id']})")
+            if result.get('cves'):
+                print(f"    {' '.join(result['cves'])}")
+            if result.get('snippet'):
+                print(f"    {' '.join(result['snippet'].split())}")
+        print(f"{len(results)} results in {elapsed:.1f} ms", file=sys.stderr)
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
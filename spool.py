@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Durable local spool for parsed advisories awaiting their database insert.
+
+The alert scripts append every parsed advisory to an fsynced, append-only
+journal before touching MySQL and append a matching 'done' record once the
+insert has an outcome. Anything left pending (the database was down, the
+script died) is drained by the replay worker, which inserts in batches over
+one connection per database and backs off exponentially while the database
+stays unreachable. Advisories that keep failing once the database is back
+are given up on after MAX_ATTEMPTS and reported with send_failed.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import fcntl
+import re
+import random
+from contextlib import contextmanager
+from datetime import datetime
+
+SPOOL_DIR = os.getenv('SPOOL_DIR', '/home/alerts/scripts_linstage/spool')
+# Every advisory body is journaled; past this size finished entries are compacted away
+SPOOL_COMPACT_BYTES = int(os.getenv('SPOOL_COMPACT_BYTES', 4 * 1024 * 1024))
+JOURNAL = 'spool.jsonl'
+MAX_ATTEMPTS = 5
+# Entries this young may still be being inserted by the script that spooled them;
+# older ones are left alone too while that script is alive (it may wait minutes for
+# an insert slot, see scheduler.py)
+REPLAY_GRACE = 60
+RECORD_PREFIX_RE = re.compile(rb'\{"op": "(\w+)", "id": "(\w+)"')
+
+
+class Spool:
+    """Append-only JSONL journal of 'add', 'fail' and 'done' records"""
+
+    def __init__(self, directory=SPOOL_DIR, compact_bytes=SPOOL_COMPACT_BYTES):
+        self.directory = directory
+        self.path = os.path.join(directory, JOURNAL)
+        self.compact_bytes = compact_bytes
+
+    @contextmanager
+    def locked(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _append(self, records):
+        line = ''.join(json.dumps(record, default=str) + '\n' for record in records).encode('utf-8')
+        with self.locked():
+            created = not os.path.exists(self.path)
+            fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                size = os.fstat(fd).st_size
+                # A crash mid-write leaves a partial line; start ours on a fresh one
+                if size and os.pread(fd, 1, size - 1) != b'\n':
+                    line = b'\n' + line
+                os.write(fd, line)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            if created:
+                dir_fd = os.open(self.directory, os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+
+    def append(self, advisory):
+        """Spool an advisory dict; returns its spool id"""
+        spool_id = uuid.uuid4().hex
+        self._append([{'op': 'add', 'id': spool_id, 'time': time.time(), 'pid': os.getpid(),
+                       'advisory': advisory}])
+        return spool_id
+
+    def ack(self, spool_id, outcome):
+        """Mark an entry finished with its insert outcome"""
+        self._append([{'op': 'done', 'id': spool_id, 'time': time.time(), 'outcome': outcome}])
+        self.compact_if_large()
+
+    def fail(self, spool_id, error):
+        """Record a failed insert attempt for an entry"""
+        self._append([{'op': 'fail', 'id': spool_id, 'time': time.time(), 'error': str(error)}])
+
+    def read(self):
+        """Replay the journal into {id: entry} for pending entries, in spool order"""
+        pending = {}
+        try:
+            f = open(self.path, encoding='utf-8')
+        except FileNotFoundError:
+            return pending
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn write from a crash
+                op, spool_id = record.get('op'), record.get('id')
+                if op == 'add':
+                    pending[spool_id] = {'id': spool_id, 'time': record['time'], 'pid': record.get('pid'),
+                                         'attempts': 0, 'error': '', 'advisory': record['advisory']}
+                elif op == 'fail' and spool_id in pending:
+                    pending[spool_id]['attempts'] += 1
+                    pending[spool_id]['error'] = record.get('error', '')
+                elif op == 'done':
+                    pending.pop(spool_id, None)
+        return pending
+
+    def backlog(self):
+        """Number of pending entries, without decoding the advisories"""
+        pending = set()
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return 0
+        with f:
+            for line in f:
+                # Records are written as {"op": ..., "id": ..., ...}
+                match = RECORD_PREFIX_RE.match(line)
+                if not match:
+                    continue
+                if match.group(1) == b'add':
+                    pending.add(match.group(2))
+                elif match.group(1) == b'done':
+                    pending.discard(match.group(2))
+        return len(pending)
+
+    def compact_if_large(self):
+        """Compact once the journal passes compact_bytes; returns whether it did"""
+        try:
+            if os.path.getsize(self.path) <= self.compact_bytes:
+                return False
+        except OSError:
+            return False
+        self.compact()
+        return True
+
+    def compact(self):
+        """Rewrite the journal with only pending entries; returns how many remain"""
+        with self.locked():
+            pending = self.read()
+            records = []
+            for entry in pending.values():
+                records.append({'op': 'add', 'id': entry['id'], 'time': entry['time'], 'pid': entry['pid'],
+                                'advisory': entry['advisory']})
+                records.extend({'op': 'fail', 'id': entry['id'], 'time': entry['time'],
+                                'error': entry['error']} for _ in range(entry['attempts']))
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, default=str) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        return len(pending)
+
+
+def replay(spool, batch_size=20, max_backoff=300, once=False, grace=REPLAY_GRACE):
+    """Insert pending entries in batches until the spool is empty; returns outcome counts"""
+    from advisory import Advisory
+    from dedup_cache import DedupCache
+    from scheduler import order, pid_alive, severity_class
+    import metrics
+
+    def in_flight(entry):
+        if entry['time'] > time.time() - grace:
+            return True
+        return bool(entry['pid']) and entry['pid'] != os.getpid() and pid_alive(entry['pid'])
+
+    stats = {}
+    backoff = 1
+    while True:
+        pending = [entry for entry in spool.read().values() if not in_flight(entry)]
+        # After an outage the backlog goes in the order the live scheduler would use
+        pending = order(pending, lambda entry: (severity_class(entry['advisory'].get('severity')),
+                                                entry['advisory']['distro'], entry['time']))
+        if not pending:
+            break
+
+        retry = False
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            advisory_handler = Advisory()
+            try:
+                outcomes = advisory_handler.insert_advisories([entry['advisory'] for entry in batch])
+            except Exception as e:
+                # Could not connect: nothing in the batch was attempted
+                print(f"Database unavailable: {e}")
+                retry = True
+                break
+
+            for entry, outcome in zip(batch, outcomes):
+                advisory = entry['advisory']
+                if outcome == 'failed':
+                    spool.fail(entry['id'], "insert failed")
+                    if entry['attempts'] + 1 < MAX_ATTEMPTS:
+                        retry = True
+                        continue
+                    outcome = 'gave_up'
+                    advisory_handler.send_failed(advisory['title'], advisory['distro'],
+                                                 f"Spooled insert failed {MAX_ATTEMPTS} times; dropped from spool",
+                                                 kind='spool_gave_up', critical=True)
+                spool.ack(entry['id'], outcome)
+                print(f"{outcome}: [{advisory['distro']}] {advisory['title']}")
+                stats[outcome] = stats.get(outcome, 0) + 1
+                metrics.MESSAGES.inc(distro=advisory['distro'], outcome=f"replay_{outcome}")
+                if outcome in ['inserted', 'duplicate']:
+                    DedupCache().add(advisory.get('dedup_keys', []), advisory['title'])
+
+        if not retry:
+            backoff = 1
+            continue
+        if once:
+            print(f"{len(spool.read())} entries left pending")
+            break
+        delay = backoff * random.uniform(0.5, 1.0)
+        print(f"Retrying in {delay:.0f}s")
+        time.sleep(delay)
+        backoff = min(max_backoff, backoff * 2)
+
+    if stats:
+        spool.compact()
+        metrics.write_textfile()
+    else:
+        # Acked live entries leave their bodies behind even when there is nothing to replay
+        spool.compact_if_large()
+    return stats
+
+
+def print_pending(spool):
+    pending = spool.read()
+    now = time.time()
+    print(f"{len(pending)} pending in {spool.path}")
+    for entry in pending.values():
+        advisory = entry['advisory']
+        age = now - entry['time']
+        attempts = f" attempts={entry['attempts']} last_error={entry['error']!r}" if entry['attempts'] else ''
+        print(f"{entry['id']} {datetime.fromtimestamp(entry['time']).isoformat(timespec='seconds')} "
+              f"age={age:.0f}s [{advisory['distro']}] {advisory['title']}{attempts}")
+
+
+def print_usage():
+    print("Usage: python spool.py COMMAND")
+    print("  --list: Show pending advisories")
+    print("  --show ID: Print a pending entry as JSON")
+    print("  --replay [--once] [--batch N]: Insert pending advisories, backing off while MySQL is down")
+    print("  --drop ID: Remove an entry without inserting it")
+    print("  --compact: Rewrite the journal with only pending entries")
+    print(f"  Spool directory: {SPOOL_DIR} (SPOOL_DIR)")
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ['--help', '-h']:
+        print_usage()
+        sys.exit(0)
+    spool = Spool()
+    command = args[0]
+    if command == '--list':
+        print_pending(spool)
+    elif command in ['--show', '--drop'] and len(args) > 1:
+        entry = spool.read().get(args[1])
+        if not entry:
+            print(f"No pending entry {args[1]}")
+            sys.exit(1)
+        if command == '--show':
+            print(json.dumps(entry, indent=2, default=str))
+        else:
+            spool.ack(entry['id'], 'dropped')
+            print(f"Dropped {entry['id']}: {entry['advisory']['title']}")
+    elif command == '--replay':
+        batch_size = int(args[args.index('--batch') + 1]) if '--batch' in args else 20
+        with open(os.path.join(spool.directory, 'replay.lock'), 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                print("Another replay is already running")
+                sys.exit(0)
+            stats = replay(spool, batch_size, once='--once' in args)
+        print(f"Replay finished: {stats or 'nothing to do'}")
+    elif command == '--compact':
+        print(f"{spool.compact()} entries pending after compaction")
+    else:
+        print(f"Error: unknown command {' '.join(args)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Opening of the local SQLite stores kept next to the alert scripts.
+
+sqlite3.connect creates the file before any schema exists, so whether the
+file exists says nothing about whether its tables do: a first run that
+crashed or hit a lock timeout in between, or a second script opening the
+file in that gap, would leave it without tables for good. open_store runs
+the store's idempotent CREATE ... IF NOT EXISTS statements on every open
+instead; once they exist these are schema lookups that take no lock.
+"""
+
+import sqlite3
+
+
+def open_store(path, schema, synchronous='NORMAL', **kwargs):
+    """
+    Connect to path in WAL mode and create whatever part of schema is
+    missing. Keyword arguments go to sqlite3.connect. Errors close the
+    connection and propagate, so the caller can fail open and retry on its
+    next call.
+    """
+    connection = sqlite3.connect(path, **kwargs)
+    try:
+        connection.execute(f"PRAGMA synchronous={synchronous}")
+        # Stored in the file, so this only switches once; WAL lets concurrent
+        # alert scripts read while one writes
+        connection.execute("PRAGMA journal_mode=WAL")
+        for statement in schema:
+            connection.execute(statement)
+        connection.commit()
+    except sqlite3.Error:
+        connection.close()
+        raise
+    return connection
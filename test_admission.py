@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Tests for load-aware admission and the shared circuit breakers"""
+
+import admission
+import metrics
+from advisory import Advisory
+from breaker import CircuitBreaker
+from scheduler import InsertScheduler
+from spool import Spool
+
+
+class FailingClient:
+    """Chat completions stand-in that always raises"""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = self
+        self.completions = self
+
+    def create(self, **kwargs):
+        self.calls += 1
+        raise TimeoutError("upstream timed out")
+
+
+def test_breaker_state_is_shared_and_half_opens(tmp_path):
+    first = CircuitBreaker('mysql', threshold=2, cooldown=60, directory=str(tmp_path))
+    second = CircuitBreaker('mysql', threshold=2, cooldown=60, directory=str(tmp_path))
+    first.failure()
+    assert second.state() == 'closed'
+    second.failure()
+    assert first.state() == 'open' and not first.allow()
+    assert first.state(now=first.load()['opened_at'] + 61) == 'half_open'
+    second.success()
+    assert first.state() == 'closed'
+
+
+def test_open_ai_breaker_skips_the_model():
+    client = FailingClient()
+    advisory = Advisory(alias_client=client, alias_breaker=CircuitBreaker('openai', 2, 300, directory=''))
+    for number in range(4):
+        assert advisory.title_alias_base(f"DSA-{number}-1 curl - security update") == \
+            f"dsa-{number}-1-curl-security-update"
+    assert client.calls == 2
+
+
+def test_shed_reasons_in_order_and_counted(tmp_path, monkeypatch):
+    monkeypatch.setattr(admission, 'ADMIT_MAX_SPOOL', 2)
+    monkeypatch.setattr(admission, 'ADMIT_MAX_QUEUED', 1)
+    spool = Spool(str(tmp_path / 'spool'))
+    scheduler = InsertScheduler(str(tmp_path / 'scheduler.sqlite3'))
+    db = CircuitBreaker('mysql', 1, 60, directory='')
+    ai = CircuitBreaker('openai', 1, 60, directory='')
+    checks = {'spool': spool, 'scheduler': scheduler, 'db_breaker': db, 'ai_breaker': ai}
+    metrics.ADMISSIONS.values.clear()
+
+    assert admission.admit(**checks) is None
+    scheduler.enqueue('moderate', 'opensuse')
+    assert admission.admit(**checks) == 'insert_queue'
+    done = spool.append({'title': 'a', 'distro': 'debian'})
+    spool.append({'title': 'b', 'distro': 'debian'})
+    spool.ack(done, 'inserted')
+    assert spool.backlog() == len(spool.read()) == 1
+    spool.append({'title': 'c', 'distro': 'debian'})
+    assert admission.admit(**checks) == 'spool_backlog'
+    ai.failure()
+    assert admission.admit(**checks) == 'ai_breaker'
+    db.failure()
+    assert admission.admit(**checks) == 'db_breaker'
+
+    assert metrics.ADMISSIONS.values == {('admit', ''): 1, ('shed', 'insert_queue'): 1, ('shed', 'spool_backlog'): 1,
+                                         ('shed', 'ai_breaker'): 1, ('shed', 'db_breaker'): 1}
@@ -1,24 +1,33 @@
 #!/usr/bin/env python3
-"""Test script to compare AI-generated aliases vs old approach"""
+"""
+Offline benchmark of title alias generation.
 
+Recorded model responses in alias_fixtures.json are served by a local stub
+client, with optional latency and failure injection, so the alias stage can
+be measured without network access. Each strategy (legacy regex, AI, cached,
+local fallback) is scored on alias length, under-40-character compliance,
+uniqueness and wall time. Run with --record to refresh the fixtures from the
+real API.
+"""
+
+import os
 import re
+import sys
+import json
+import time
+import random
+from types import SimpleNamespace
+from advisory import Advisory, ALIAS_MODEL, ALIAS_USER_PREFIX
+
+FIXTURE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'alias_fixtures.json')
+MAX_ALIAS_LENGTH = 40
 
-# Test cases with long titles
-test_titles = [
-    "DSA-6059-1 thunderbird - security update",
-    "Debian DSA-6059-1 : thunderbird - security update",
-    "FEDORA-2024-123 kernel security and bug fix update",
-    "openSUSE-SU-2024:0123-1: Security update for chromium",
-    "Ubuntu USN-1234-1: Apache HTTP Server vulnerabilities",
-    "[SECURITY] [DLA 3456-1] nginx security update",
-    "openSUSE: 2025:3744-1 : aws-cli, local-npm-registry, python-boto3, python-botocore, python-coverage, python-flaky, python-pluggy, python-pytest, python-pytest-cov, python-pytest-html, python-pytest-metada",
-]
 
 def old_clean_title_alias(title):
     """Old approach - just removing unwanted terms"""
 
     alias = title.lower()
-    
+
     # Apply various cleaning rules
     alias = re.sub(r'security and bug fix (update)?', '', alias)
     alias = re.sub(r'-security-advisory-update-', '-', alias)
@@ -45,37 +54,191 @@ def old_clean_title_alias(title):
     alias = re.sub(r'[ :!@#$%^&*()+=./]', '-', alias)
     alias = re.sub(r'--', '-', alias)
     alias = re.sub(r'-$', '', alias)
-    
+
     return alias.strip()
 
-def new_clean_title_alias(title):
-    """New AI approach - imported from advisory.py"""
-    from advisory import Advisory
+
+def load_fixtures(path=FIXTURE_FILE):
+    """Return {title: recorded response content}"""
+    with open(path) as f:
+        return json.load(f)['responses']
+
+
+def save_fixtures(responses, path=FIXTURE_FILE):
+    """Write recorded responses, atomically"""
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'model': ALIAS_MODEL, 'responses': responses}, f, indent=2)
+        f.write('\n')
+    os.replace(tmp, path)
+
+
+def request_title(messages):
+    """Recover the advisory title from an alias request"""
+    return messages[-1]['content'][len(ALIAS_USER_PREFIX):]
+
+
+class ReplayClient:
+    """Stands in for the OpenAI client, answering from recorded responses"""
+
+    def __init__(self, responses, latency=0.0, jitter=0.0, failure_rate=0.0, seed=0):
+        self.responses = responses
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        self.calls += 1
+        delay = self.latency + self.rng.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        if self.rng.random() < self.failure_rate:
+            raise TimeoutError("injected upstream failure")
+        title = request_title(messages)
+        if title not in self.responses:
+            raise KeyError(f"no recorded response for: {title}")
+        message = SimpleNamespace(content=self.responses[title])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class RecordingClient:
+    """Wraps a real client and keeps each response's content by title"""
+
+    def __init__(self, client):
+        self.client = client
+        self.responses = {}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        response = self.client.chat.completions.create(model=model, messages=messages, **kwargs)
+        self.responses[request_title(messages)] = response.choices[0].message.content
+        return response
+
+
+def measure(name, titles, alias_func):
+    """Run alias_func over titles and score the resulting aliases"""
+    start = time.perf_counter()
+    aliases = [alias_func(title) for title in titles]
+    elapsed = time.perf_counter() - start
+    lengths = [len(alias) for alias in aliases]
+    return {
+        'strategy': name,
+        'aliases': aliases,
+        'seconds': elapsed,
+        'avg_length': sum(lengths) / len(lengths),
+        'max_length': max(lengths),
+        'under_limit': sum(1 for length in lengths if length < MAX_ALIAS_LENGTH),
+        'unique': len(set(aliases)),
+        'count': len(aliases),
+    }
+
+
+def run_benchmark(responses, latency=0.0, jitter=0.0, failure_rate=0.0):
+    """Measure the alias stage under each strategy; returns one result per strategy"""
+    titles = list(responses)
+    client = ReplayClient(responses, latency, jitter, failure_rate)
+    advisory = Advisory(alias_client=client)
+    failing = Advisory(alias_client=ReplayClient(responses, latency, jitter, failure_rate=1.0))
+    return [
+        measure('legacy', titles, old_clean_title_alias),
+        measure('ai', titles, advisory.title_alias_base),
+        # Same instance again: every title is now answered from the cache
+        measure('cached', titles, advisory.title_alias_base),
+        measure('fallback', titles, failing.title_alias_base),
+    ]
+
+
+def print_results(results):
+    print(f"{'strategy':<10} {'seconds':>8} {'ms/alias':>9} {'avg len':>8} {'max len':>8} "
+          f"{'<' + str(MAX_ALIAS_LENGTH) + ' chars':>10} {'unique':>7}")
+    for r in results:
+        print(f"{r['strategy']:<10} {r['seconds']:>8.3f} {r['seconds'] / r['count'] * 1000:>9.2f} "
+              f"{r['avg_length']:>8.1f} {r['max_length']:>8} "
+              f"{r['under_limit']:>6}/{r['count']:<3} {r['unique']:>3}/{r['count']:<3}")
+
+
+def record(titles):
+    """Call the real API for titles and store the responses as fixtures"""
     advisory = Advisory()
-    alias = advisory.clean_title_alias(title)
-    # Remove random ID for comparison
-    return '-'.join(alias.split('-')[:-1])
-
-def test_comparison():
-    """Compare old vs new approach"""
-    print("COMPARISON: Old Approach vs AI-Powered Approach")
-    print("=" * 100)
-    
-    for title in test_titles:
-        old_alias = old_clean_title_alias(title)
-        new_alias = new_clean_title_alias(title)
-        
-        print(f"\nTitle: {title[:80]}{'...' if len(title) > 80 else ''}")
-        print(f"  OLD: {old_alias} ({len(old_alias)} chars)")
-        print(f"  NEW: {new_alias} ({len(new_alias)} chars)")
-        
-        savings = len(old_alias) - len(new_alias)
-        if savings > 0:
-            print(f"  ✓ SHORTER by {savings} chars ({int(savings/len(old_alias)*100)}% reduction)")
-        elif savings < 0:
-            print(f"  ⚠ LONGER by {abs(savings)} chars")
+    recorder = RecordingClient(advisory.get_alias_client())
+    advisory.alias_client = recorder
+    for title in titles:
+        advisory.title_alias_base(title)
+    save_fixtures(recorder.responses)
+    print(f"Recorded {len(recorder.responses)} responses to {FIXTURE_FILE}")
+
+
+def test_ai_strategy_replays_fixtures():
+    responses = load_fixtures()
+    client = ReplayClient(responses)
+    advisory = Advisory(alias_client=client)
+    title = "DSA-6059-1 thunderbird - security update"
+    assert advisory.title_alias_base(title) == "thunderbird-dsa-6059-1"
+    assert re.fullmatch(r"thunderbird-dsa-6059-1-\d+", advisory.clean_title_alias(title))
+    # The second call was served from the per-title cache
+    assert client.calls == 1
+
+
+def test_failed_upstream_falls_back_and_retries():
+    responses = load_fixtures()
+    client = ReplayClient(responses, failure_rate=1.0)
+    advisory = Advisory(alias_client=client)
+    title = "[SECURITY] [DLA 3456-1] nginx security update"
+    assert advisory.title_alias_base(title) == "security-dla-3456-1-nginx-security-update"
+    # Fallback aliases are not cached, so the model is asked again next time
+    client.failure_rate = 0.0
+    assert advisory.title_alias_base(title) == "nginx-dla-3456-1"
+    assert client.calls == 2
+
+
+def test_benchmark_quality():
+    results = {r['strategy']: r for r in run_benchmark(load_fixtures())}
+    ai = results['ai']
+    assert ai['under_limit'] == ai['count']
+    assert ai['unique'] == ai['count']
+    assert results['cached']['aliases'] == ai['aliases']
+    assert results['fallback']['aliases'] != ai['aliases']
+
+
+def main():
+    latency = jitter = failure_rate = 0.0
+    args = list(sys.argv[1:])
+    while args:
+        arg = args.pop(0)
+        if arg in ['--help', '-h']:
+            print("Usage: python test_alias_generation.py [options]")
+            print("  --latency SECONDS: Delay added to each stub model call (default: 0)")
+            print("  --jitter SECONDS: Extra random delay of up to this much per call")
+            print("  --failure-rate FRACTION: Share of AI calls that fail and fall back")
+            print("  --record: Refresh alias_fixtures.json from the real API")
+            sys.exit(0)
+        if arg == '--record':
+            record(list(load_fixtures()))
+            return
+        name, _, value = arg[2:].partition('=')
+        if name not in ['latency', 'jitter', 'failure-rate']:
+            print(f"Error: unknown option {arg}")
+            sys.exit(1)
+        if not value:
+            value = args.pop(0) if args else ''
+        try:
+            value = float(value)
+        except ValueError:
+            print(f"Error: invalid value for --{name}: {value}")
+            sys.exit(1)
+        if name == 'latency':
+            latency = value
+        elif name == 'jitter':
+            jitter = value
         else:
-            print(f"  = SAME length")
+            failure_rate = value
+
+    results = run_benchmark(load_fixtures(), latency, jitter, failure_rate)
+    print_results(results)
+
 
 if __name__ == "__main__":
-    test_comparison()
+    main()
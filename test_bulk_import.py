@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Tests for bulk import batching and mbox checkpoints"""
+
+import advisory
+import bulk_import
+import metrics
+
+
+class FakeAdvisory:
+    outcomes = []
+    # Batches before the database goes away; None keeps it up
+    up_for = None
+
+    def insert_advisories(self, advisories, notify=False):
+        if FakeAdvisory.up_for is not None:
+            if not FakeAdvisory.up_for:
+                raise Exception("failed to connect to MySQL database lsv7")
+            FakeAdvisory.up_for -= 1
+        return [FakeAdvisory.outcomes.pop(0) for _ in advisories]
+
+
+def test_checkpoint_stops_before_a_failed_insert(monkeypatch):
+    saved = {}
+    monkeypatch.setattr(bulk_import.mbox_index, 'save_checkpoint', lambda path, end: saved.__setitem__(path, end))
+    monkeypatch.setattr(advisory, 'Advisory', FakeAdvisory)
+    monkeypatch.setattr(metrics.MESSAGES, 'values', {})
+    parsed = {'distro': 'debian', 'title': 'Debian: DSA-1-1: curl', 'date': ''}
+    batch = [(('mbox', 'a.mbox', (offset, 100)), parsed) for offset in range(0, 400, 100)]
+    batch.append((('mbox', 'b.mbox', (0, 50)), parsed))
+    held = set()
+
+    FakeAdvisory.outcomes = ['inserted', 'failed', 'inserted', 'duplicate', 'inserted']
+    stats = {}
+    bulk_import.flush(batch, stats, dry_run=False, held=held)
+    assert saved == {'a.mbox': 100, 'b.mbox': 50}
+    assert held == {'a.mbox'} and stats == {'inserted': 3, 'insert_failed': 1, 'duplicate': 1}
+
+    # Later successes in the same run don't move a held checkpoint past the failure
+    FakeAdvisory.outcomes = ['inserted', 'inserted']
+    bulk_import.flush([(('mbox', 'a.mbox', (400, 100)), parsed), (('mbox', 'b.mbox', (50, 50)), parsed)],
+                      stats, dry_run=False, held=held)
+    assert saved == {'a.mbox': 100, 'b.mbox': 100}
+
+
+def test_unreachable_database_stops_the_import(monkeypatch):
+    saved = {}
+    monkeypatch.setattr(bulk_import.mbox_index, 'save_checkpoint', lambda path, end: saved.__setitem__(path, end))
+    monkeypatch.setattr(advisory, 'Advisory', FakeAdvisory)
+    monkeypatch.setattr(metrics.MESSAGES, 'values', {})
+    parsed = {'distro': 'debian', 'title': 'Debian: DSA-1-1: curl', 'date': ''}
+    results = [('parsed', ('mbox', 'a.mbox', (offset, 100)), parsed) for offset in range(0, 500, 100)]
+    results.insert(1, ('failed', ('mbox', 'a.mbox', (50, 10)), ('parse_error', '', "no subject")))
+    monkeypatch.setattr(bulk_import, 'iter_messages', lambda paths, resume: iter(results))
+    monkeypatch.setattr(bulk_import, 'parse_one', lambda item: item)
+    FakeAdvisory.outcomes = ['inserted'] * 2
+    monkeypatch.setattr(FakeAdvisory, 'up_for', 1)
+    options = dict(bulk_import.parse_args(['bulk_import.py', 'a.mbox']), jobs=1, batch_size=2)
+    stats = bulk_import.run_import(options)
+    assert stats['aborted'].startswith("Database unavailable")
+    assert stats['inserted'] == 2 and stats['insert_failed'] == 2 and stats['failed'] == 1
+    assert saved == {'a.mbox': 200}
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Tests for merging per-release Fedora announcements"""
+
+import alert_dispatch
+import coalesce
+from advisory import Advisory
+from coalesce import CoalesceStore
+from dedup_cache import DedupCache
+from parse_cache import ParseCache
+from parser_engine import get_engine
+from scheduler import InsertScheduler
+from spool import Spool
+from timing import StageTimer
+import bench_corpus
+
+
+def fedora_parsed(release, advisory_id, version='6.1.7'):
+    (_, _, raw), = bench_corpus.generate_corpus(sizes=['small'], distros=['fedora'])[:1]
+    parsed = get_engine().parse(raw, 'fedora')
+    parsed['fields'] = dict(parsed['fields'], version=str(release), advisory_id=advisory_id,
+                            package='curl', package_version=version)
+    parsed['title'] = f"Fedora {release}: curl {advisory_id}"
+    return parsed
+
+
+def test_fedora_spec_extracts_group_fields():
+    parsed = get_engine().parse(bench_corpus.generate_corpus(sizes=['small'], distros=['fedora'])[0][2])
+    rule = get_engine().by_name['fedora'].coalesce
+    assert parsed['fields']['package_version'].startswith('6.1.')
+    assert coalesce.group_key(parsed, rule) == f"fedora|{parsed['package']}|{parsed['fields']['package_version']}"
+
+
+def test_combine_lists_every_release_once():
+    rule = get_engine().by_name['fedora'].coalesce
+    entries = []
+    for release, advisory_id in [(42, 'FEDORA-2025-b'), (41, 'FEDORA-2025-a'), (42, 'FEDORA-2025-b')]:
+        entry = dict(fedora_parsed(release, advisory_id))
+        entry['dedup_keys'] = [f"mid:{release}"]
+        entries.append(entry)
+
+    advisory = coalesce.combine(entries, rule)
+    assert advisory['title'] == 'Fedora 41, 42: curl FEDORA-2025-a FEDORA-2025-b'
+    assert advisory['body'].startswith('Fedora 41: FEDORA-2025-a\nFedora 42: FEDORA-2025-b\n\n')
+    assert advisory['dedup_keys'] == ['mid:41', 'mid:42']
+    assert coalesce.combine(entries[:1], rule)['title'] == 'Fedora 42: curl FEDORA-2025-b'
+
+
+def test_held_groups_persist_until_due(tmp_path):
+    path = str(tmp_path / 'coalesce.sqlite3')
+    spool = Spool(str(tmp_path / 'spool'))
+    rule = get_engine().by_name['fedora'].coalesce
+    store = CoalesceStore(path, window=600)
+    for release, advisory_id in [(41, 'FEDORA-2025-a'), (42, 'FEDORA-2025-b')]:
+        parsed = fedora_parsed(release, advisory_id)
+        store.hold(coalesce.group_key(parsed, rule), parsed, [])
+    other = fedora_parsed(42, 'FEDORA-2025-c', version='8.0')
+    store.hold(coalesce.group_key(other, rule), other, [])
+    assert store.release(spool) == []
+    store.close()
+
+    # A restarted script sees the same held groups
+    store = CoalesceStore(path, window=600)
+    assert [count for _, _, count in store.groups()] == [2, 1]
+    released = store.release(spool, everything=True)
+    assert [advisory['title'] for _, advisory in released] == [
+        'Fedora 41, 42: curl FEDORA-2025-a FEDORA-2025-b', 'Fedora 42: curl FEDORA-2025-c']
+    assert list(spool.read()) == [spool_id for spool_id, _ in released]
+    assert store.groups() == []
+
+
+def test_unusable_store_inserts_the_advisory_on_its_own(tmp_path, monkeypatch):
+    (_, _, raw), = bench_corpus.generate_corpus(sizes=['small'], distros=['fedora'])[:1]
+    spool = Spool(str(tmp_path / 'spool'))
+    monkeypatch.setattr(alert_dispatch, 'COALESCE_WINDOW', 600)
+    # A directory where the database file should be
+    monkeypatch.setattr(alert_dispatch, 'CoalesceStore', lambda: CoalesceStore(str(tmp_path)))
+    monkeypatch.setattr(alert_dispatch, 'DedupCache', lambda: DedupCache(str(tmp_path / 'dedup.sqlite3')))
+    monkeypatch.setattr(alert_dispatch, 'get_parse_cache', lambda: ParseCache(''))
+    monkeypatch.setattr(alert_dispatch, 'Spool', lambda: spool)
+    monkeypatch.setattr(alert_dispatch, 'InsertScheduler', lambda: InsertScheduler(slots=0))
+    inserted = []
+    monkeypatch.setattr(Advisory, 'insert_advisory', lambda self, title, *args, **kwargs:
+                        inserted.append(title) or 'inserted')
+
+    outcome, parsed, exit_code = alert_dispatch.process(raw, 'fedora', False, StageTimer())
+    assert (outcome, exit_code) == ('inserted', None)
+    assert inserted == [parsed['title']]
+    assert list(spool.read()) == []
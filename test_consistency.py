@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Tests for the cross-database consistency checker"""
+
+import zlib
+import hashlib
+from datetime import datetime
+import consistency
+from advisory import Advisory
+
+
+class FakeDatabase:
+    """xu5gc_content rows (id, catid, title, state) answering the checker's queries"""
+
+    def __init__(self, titles, catid=87, removed=()):
+        self.rows = [(i + 1, catid, title, 0 if title in removed else 1) for i, title in enumerate(titles)]
+        self.queries = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def execute(self, sql, params=()):
+        self.db.queries.append(sql)
+        published = [row for row in self.db.rows if row[3] == 1]
+        bucket = lambda title: zlib.crc32(title.encode()) % params[0]
+        if 'BIT_XOR' in sql:
+            catids = set(params[1:])
+            sums = {}
+            for _, catid, title, _ in published:
+                if catids and catid not in catids:
+                    continue
+                count, checksum = sums.get((catid, bucket(title)), (0, 0))
+                digest = int(hashlib.md5(title.encode()).hexdigest()[:16], 16)
+                sums[(catid, bucket(title))] = (count + 1, checksum ^ digest)
+            self.result = [(catid, b, count, checksum) for (catid, b), (count, checksum) in sums.items()]
+        elif 'MOD(CRC32' in sql:
+            self.result = [(catid, bucket(title), record_id, title) for record_id, catid, title, _ in published
+                           if bucket(title) in params[2:]]
+        elif 'WHERE id IN' in sql:
+            self.result = [(record_id, catid, title, 'alias', 'intro', '<pre>CVE-2025-0001</pre>',
+                            datetime(2025, 9, 22, 10, 0), '{"image_intro": "x"}', '')
+                           for record_id, catid, title, _ in self.db.rows if record_id in params]
+        elif 'GET_LOCK' in sql or 'RELEASE_LOCK' in sql:
+            self.result = [(1,)]
+        elif 'WHERE title = %s' in sql:
+            self.result = [(1, title) for _, _, title, state in self.db.rows if title == params[0] and state == 1]
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def close(self):
+        pass
+
+
+TITLES = [f"Debian: DSA-{n}-1: package{n}" for n in range(200)]
+
+
+def test_plan_lists_titles_missing_on_either_side():
+    lsv7 = FakeDatabase(TITLES[:150] + ["Debian: DSA-999-1: only-in-lsv7"])
+    beta = FakeDatabase(TITLES[:10] + TITLES[11:], removed={TITLES[20]})
+    plan, stats = consistency.plan_repairs({'lsv7': lsv7, 'lsv7j5beta': beta}, buckets=64)
+
+    assert [(e['source'], e['title']) for e in plan if e['source'] == 'lsv7'] == [
+        ('lsv7', TITLES[10]), ('lsv7', TITLES[20]), ('lsv7', "Debian: DSA-999-1: only-in-lsv7")]
+    assert [e['title'] for e in plan if e['source'] == 'lsv7j5beta'] == TITLES[150:]
+    assert plan[0] == {'source': 'lsv7', 'target': 'lsv7j5beta', 'catid': 87, 'id': 11, 'title': TITLES[10]}
+    assert stats['rows'] == {'lsv7': 151, 'lsv7j5beta': 198}
+    assert stats['mismatched_buckets'] < stats['buckets']
+
+
+def test_identical_databases_skip_the_drilldown():
+    plan, stats = consistency.plan_repairs({'lsv7': FakeDatabase(TITLES), 'lsv7j5beta': FakeDatabase(TITLES)})
+    assert plan == [] and stats['mismatched_buckets'] == 0
+
+
+def test_repair_copies_in_batches_and_skips_titles_added_since(monkeypatch):
+    lsv7 = FakeDatabase(TITLES[:5])
+    beta = FakeDatabase(TITLES[:1])
+    plan, _ = consistency.plan_repairs({'lsv7': lsv7, 'lsv7j5beta': beta}, buckets=8)
+    beta.rows.append((2, 87, TITLES[3], 1))
+    written = []
+    monkeypatch.setattr(Advisory, 'write_article', lambda self, cursor, dbname, catid, title, alias, *rest, notify=True:
+                        written.append((dbname, catid, title, alias, rest, notify)) or 'inserted')
+
+    counts = consistency.repair(plan, Advisory(), {'lsv7': lsv7, 'lsv7j5beta': beta}, batch_size=2)
+    assert counts == {'copied': 3, 'skipped': 1}
+    assert [title for _, _, title, _, _, _ in written] == [TITLES[1], TITLES[2], TITLES[4]]
+    # Repairs never mail the alerts address
+    assert not any(notify for *_, notify in written)
+    dbname, catid, _, alias, (intro, fulltext, distro, created, images, attribs, cves), _ = written[0]
+    assert (dbname, catid, alias, distro, created) == ('lsv7j5beta', 87, 'alias', 'debian', '2025-09-22 10:00:00')
+    assert images == {'image_intro': 'x'} and attribs == {} and cves == ['CVE-2025-0001']
+    assert sum('WHERE id IN' in sql for sql in lsv7.queries) == 2
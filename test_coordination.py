@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Tests for serializing concurrent inserts with MySQL named locks.
+
+The threaded test runs against an in-process stand-in for the server. The
+multi-process test needs a disposable MySQL-compatible server, given as
+ALERTS_TEST_MYSQL=user:password@host:port; it creates and drops its own
+database.
+"""
+
+import os
+import time
+import threading
+import multiprocessing
+import pytest
+import feed
+import ingest_log
+import metrics
+import search_index
+from advisory import Advisory
+from coordination import LockTimeout, named_lock
+
+CATEGORY_ASSET = 1
+
+
+class FakeServer:
+    """Just enough of MySQL for insert_advisory, slow enough to expose races"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.locks = {}
+        self.content = []
+        # MAX(lft) needs an article already filed under the category
+        self.assets = [(CATEGORY_ASSET, 0, 'com_content.category.87', 1), (2, CATEGORY_ASSET, 'com_content.article.1', 2)]
+
+    def connect(self):
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def is_connected(self):
+        return not self.closed
+
+    def close(self):
+        self.closed = True
+        with self.server.cond:
+            for name in [name for name, owner in self.server.locks.items() if owner is self]:
+                del self.server.locks[name]
+            self.server.cond.notify_all()
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.server = connection.server
+        self.row = None
+        self.lastrowid = None
+
+    def execute(self, sql, params=()):
+        if self.connection.closed:
+            raise ConnectionError("MySQL Connection not available")
+        sql = ' '.join(sql.split())
+        server = self.server
+        time.sleep(0.001)
+        with server.cond:
+            if sql.startswith('SELECT GET_LOCK'):
+                name, timeout = params
+                granted = server.cond.wait_for(
+                    lambda: server.locks.get(name, self.connection) is self.connection, timeout)
+                if granted:
+                    server.locks[name] = self.connection
+                self.row = (1 if granted else 0,)
+            elif sql.startswith('SELECT RELEASE_LOCK'):
+                held = server.locks.get(params[0]) is self.connection
+                if held:
+                    del server.locks[params[0]]
+                    server.cond.notify_all()
+                self.row = (1 if held else 0,)
+            elif sql.startswith('SELECT id, title FROM xu5gc_content'):
+                self.row = next(((i, t) for i, t, a in server.content if t == params[0]), None)
+            elif sql.startswith('SELECT id, alias FROM xu5gc_content'):
+                self.row = next(((i, a) for i, t, a in server.content if a == params[0]), None)
+            elif sql.startswith('INSERT INTO xu5gc_content'):
+                server.content.append((len(server.content) + 1, params[0], params[1]))
+                self.lastrowid = len(server.content)
+            elif sql.startswith('SELECT id FROM xu5gc_assets'):
+                self.row = (CATEGORY_ASSET,)
+            elif sql.startswith('SELECT MAX(lft)'):
+                self.row = (max(lft for _, parent, _, lft in server.assets if parent == params[0]),)
+            elif sql.startswith('INSERT INTO xu5gc_assets'):
+                server.assets.append((len(server.assets) + 1, params[0], params[2], params[5]))
+                self.lastrowid = len(server.assets)
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def quiet_advisory(monkeypatch):
+    monkeypatch.setattr(ingest_log, '_ingest_log', ingest_log.IngestLog(''))
+    monkeypatch.setattr(search_index, '_search_index', search_index.SearchIndex(''))
+    monkeypatch.setattr(feed, '_feed', feed.Feed(''))
+    monkeypatch.setattr(Advisory, 'send_failed', lambda self, *args, **kwargs: None)
+    monkeypatch.setattr(Advisory, 'title_alias_base', lambda self, title: title.lower().replace(' ', '-'))
+    yield
+    for metric in metrics.REGISTRY:
+        metric.values.clear()
+
+
+def test_concurrent_writers_never_duplicate_titles_or_lft(quiet_advisory):
+    server = FakeServer()
+
+    def writer(worker):
+        handler = Advisory()
+        handler.databases = ['lsv7']
+        handler.db_connect = lambda database: server.connect()
+        for i in range(6):
+            # Every writer races the others on the shared titles
+            for title in [f"Debian: DSA-{i}-1 shared", f"Debian: DSA-{worker}{i}-1 own"]:
+                handler.insert_advisory(title, 'intro', 'body', 'debian', 'Mon, 17 Nov 2025 20:05:12 +0000')
+
+    threads = [threading.Thread(target=writer, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    titles = [title for _, title, _ in server.content]
+    assert len(titles) == len(set(titles)) == 6 + 4 * 6
+    lfts = [lft for _, parent, _, lft in server.assets if parent == CATEGORY_ASSET]
+    assert len(lfts) == len(set(lfts))
+    assert not server.locks
+
+
+def test_lock_timeout_raises_and_releases_cursor():
+    server = FakeServer()
+    holder, waiter = server.connect(), server.connect()
+    with named_lock(holder.cursor(), 'alerts:insert:lsv7:87'):
+        with pytest.raises(LockTimeout):
+            with named_lock(waiter.cursor(), 'alerts:insert:lsv7:87', timeout=0.05):
+                pass
+    # A dead holder's locks go with its connection
+    with named_lock(holder.cursor(), 'alerts:insert:lsv7:87'):
+        holder.close()
+        with named_lock(waiter.cursor(), 'alerts:insert:lsv7:87', timeout=0.05):
+            pass
+
+
+MYSQL = os.getenv('ALERTS_TEST_MYSQL')
+TEST_DB = f"alerts_coordination_test_{os.getpid()}"
+
+
+def mysql_config():
+    credentials, _, address = MYSQL.rpartition('@')
+    user, _, password = credentials.partition(':')
+    host, _, port = address.partition(':')
+    return {'host': host, 'port': int(port or 3306), 'user': user, 'password': password, 'autocommit': True}
+
+
+def mysql_writer(worker, database):
+    ingest_log._ingest_log = ingest_log.IngestLog('')
+    search_index._search_index = search_index.SearchIndex('')
+    feed._feed = feed.Feed('')
+    Advisory.send_failed = lambda self, *args, **kwargs: None
+    Advisory.title_alias_base = lambda self, title: title.lower().replace(' ', '-')
+    handler = Advisory()
+    handler.db_config = dict(mysql_config())
+    handler.databases = [database]
+    for i in range(10):
+        for title in [f"Debian: DSA-{i}-1 shared", f"Debian: DSA-{worker}{i}-1 own"]:
+            handler.insert_advisory(title, 'intro', 'body', 'debian', 'Mon, 17 Nov 2025 20:05:12 +0000')
+
+
+@pytest.mark.skipif(not MYSQL, reason="set ALERTS_TEST_MYSQL=user:password@host:port to run")
+def test_processes_against_mysql():
+    import mysql.connector
+    connection = mysql.connector.connect(**mysql_config())
+    cursor = connection.cursor()
+    cursor.execute(f"CREATE DATABASE {TEST_DB}")
+    cursor.execute(f"USE {TEST_DB}")
+    cursor.execute("CREATE TABLE xu5gc_content (id INT AUTO_INCREMENT PRIMARY KEY, title VARCHAR(255), "
+                   "alias VARCHAR(400), introtext TEXT, `fulltext` MEDIUMTEXT, state INT, catid INT, created DATETIME, "
+                   "created_by INT, created_by_alias VARCHAR(255), modified VARCHAR(32), modified_by INT, "
+                   "checked_out INT, checked_out_time VARCHAR(32), publish_up DATETIME, publish_down DATETIME, "
+                   "images TEXT, urls TEXT, attribs TEXT, version INT, ordering INT, metakey TEXT, metadesc TEXT, "
+                   "metadata TEXT, access INT, hits INT, language CHAR(7), asset_id INT)")
+    cursor.execute("CREATE TABLE xu5gc_assets (id INT AUTO_INCREMENT PRIMARY KEY, parent_id INT, level INT, "
+                   "name VARCHAR(100), title VARCHAR(255), rules TEXT, lft INT, rgt INT)")
+    cursor.execute("CREATE TABLE xu5gc_workflow_associations (item_id INT, stage_id INT, extension VARCHAR(50))")
+    cursor.execute("INSERT INTO xu5gc_assets (parent_id, level, name, title, rules, lft, rgt) "
+                   "VALUES (0, 3, 'com_content.category.87', 'Debian', '{}', 1, 4), "
+                   "(1, 4, 'com_content.article.0', 'seed', '{}', 2, 3)")
+    try:
+        workers = [multiprocessing.Process(target=mysql_writer, args=(worker, TEST_DB)) for worker in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            assert worker.exitcode == 0
+
+        cursor.execute("SELECT COUNT(*), COUNT(DISTINCT title) FROM xu5gc_content")
+        assert cursor.fetchone() == (10 + 4 * 10, 10 + 4 * 10)
+        cursor.execute("SELECT COUNT(*), COUNT(DISTINCT lft) FROM xu5gc_assets WHERE level = 4")
+        count, distinct = cursor.fetchone()
+        assert count == distinct == 1 + 10 + 4 * 10
+    finally:
+        cursor.execute(f"DROP DATABASE {TEST_DB}")
+        connection.close()
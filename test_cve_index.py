@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Tests for the CVE cross-reference table and its backfill"""
+
+import cve_index
+from advisory import Advisory
+from backfill import Checkpoint
+
+
+class FakeDatabase:
+    """Content rows plus the CVE table, behind the cursor calls the backfill makes"""
+
+    def __init__(self, rows, has_table=True):
+        self.rows = rows
+        self.has_table = has_table
+        self.links = set()
+        self.batches = []
+        self.autocommit = True
+
+    def cursor(self, buffered=True):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class MissingTable(Exception):
+    errno = cve_index.ER_NO_SUCH_TABLE
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def execute(self, sql, params=()):
+        if sql.lstrip().startswith('CREATE TABLE'):
+            self.db.has_table = True
+        elif 'FROM xu5gc_content' in sql:
+            limit = int(sql.rsplit('LIMIT', 1)[1])
+            self.result = [row for row in self.db.rows if row[0] > params[0]][:limit]
+
+    def executemany(self, sql, rows):
+        if not self.db.has_table:
+            raise MissingTable("Table 'lsv7.xu5gc_advisory_cve' doesn't exist")
+        self.db.batches.append(len(rows))
+        self.db.links.update(rows)
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+def test_store_cves_tolerates_missing_table():
+    db = FakeDatabase([], has_table=False)
+    assert cve_index.store_cves(db.cursor(), 7, ['CVE-2025-0001']) == 0
+    db.has_table = True
+    assert cve_index.store_cves(db.cursor(), 7, []) == 0
+    assert cve_index.store_cves(db.cursor(), 7, ['CVE-2025-0001', 'CVE-2025-0002']) == 2
+    assert db.links == {(7, 'CVE-2025-0001'), (7, 'CVE-2025-0002')} and db.batches == [2]
+
+
+def test_backfill_batches_and_resumes(tmp_path, monkeypatch):
+    rows = [(1, "Debian: DSA-1-1: curl", "<pre>CVE-2025-0001 cve-2025-0002 CVE-2025-0001</pre>"),
+            (2, "Ubuntu 2-1: bash", "no identifiers here"),
+            (3, "Fedora 42: curl CVE-2025-0003", "")]
+    db = FakeDatabase(rows, has_table=False)
+    monkeypatch.setattr(Advisory, 'db_connect', lambda self, database: db)
+    monkeypatch.setattr(Advisory, 'db_disconnect', lambda self, connection: None)
+    checkpoint = Checkpoint(str(tmp_path / 'checkpoint.json'))
+
+    assert cve_index.backfill_database(Advisory(), 'lsv7', checkpoint, chunk_size=2, limit=2) == (2, 2)
+    assert checkpoint.get('cve:lsv7') == 2
+    rows.append((4, "Mageia 2025-0004: zlib", "CVE-2025-0004"))
+    assert cve_index.backfill_database(Advisory(), 'lsv7', checkpoint, chunk_size=2) == (2, 2)
+
+    assert db.links == {(1, 'CVE-2025-0001'), (1, 'CVE-2025-0002'), (3, 'CVE-2025-0003'), (4, 'CVE-2025-0004')}
+    assert db.batches == [2, 2]
+    assert checkpoint.get('cve:lsv7') == 4
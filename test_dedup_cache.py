@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Tests for the Message-ID / body-hash dedup cache"""
+
+import dedup_cache
+from dedup_cache import DedupCache, body_key, header_message_id, message_id_key
+
+RAW = "Message-ID: <DSA-6059-1@debian.org>\nSubject: [DSA 6059-1] thunderbird\n\nMessage-ID: <not-a-header>\n"
+
+
+def test_message_id_from_headers_only():
+    assert header_message_id(RAW) == "<DSA-6059-1@debian.org>"
+    assert message_id_key(header_message_id(RAW)) == "mid:dsa-6059-1@debian.org"
+    assert message_id_key(header_message_id("Subject: x\n\nbody\n")) is None
+
+
+def test_body_key_ignores_whitespace_and_list_footer():
+    body = "Package : thunderbird\n\nSeveral issues were fixed.\n"
+    reposted = "Package :  thunderbird\r\n\r\nSeveral issues\nwere fixed.\n\n" \
+               "_______________________________________________\nopensuse-security-announce mailing list\n"
+    assert body_key(body) == body_key(reposted)
+    assert body_key(body) != body_key(body.replace("Several", "Some"))
+    assert body_key("  \n") is None
+
+
+def test_seen_add_and_expiry(tmp_path, monkeypatch):
+    cache = DedupCache(str(tmp_path / 'dedup.sqlite3'), ttl_days=1)
+    keys = ["mid:a@example.org", body_key("advisory body")]
+    assert cache.seen(*keys) is None
+
+    cache.add(keys, "Debian: DSA-6059-1: thunderbird")
+    assert cache.seen(keys[1]) == (keys[1], "Debian: DSA-6059-1: thunderbird")
+    assert cache.seen(None, "mid:other@example.org") is None
+    assert cache.stats() == (2, 0)
+
+    # Two days later the entries have expired
+    now = dedup_cache.time.time()
+    monkeypatch.setattr(dedup_cache.time, 'time', lambda: now + 2 * 86400)
+    assert cache.seen(*keys) is None
+    assert cache.purge() == 2
+    cache.close()
+
+
+def test_unwritable_cache_is_a_miss(tmp_path):
+    cache = DedupCache(str(tmp_path / 'missing' / 'dedup.sqlite3'))
+    assert cache.seen("mid:a@example.org") is None
+    cache.add(["mid:a@example.org"])
+
+
+def test_file_left_without_schema_is_set_up(tmp_path):
+    # sqlite3.connect had created the file when the first run died
+    path = tmp_path / 'dedup.sqlite3'
+    path.touch()
+    cache = DedupCache(str(path))
+    cache.add(["mid:a@example.org"], "title")
+    assert cache.seen("mid:a@example.org") == ("mid:a@example.org", "title")
+    cache.close()
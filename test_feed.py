@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Tests for the segmented export feed"""
+
+import multiprocessing
+import feed
+
+
+def append_many(directory, worker, count):
+    writer = feed.Feed(directory, segment_records=50)
+    for i in range(count):
+        writer.append({'title': f"{worker}-{i}"})
+    writer.close()
+
+
+def test_concurrent_writers_get_consecutive_offsets(tmp_path):
+    directory = str(tmp_path / 'feed')
+    workers = [multiprocessing.Process(target=append_many, args=(directory, worker, 100)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    records = list(feed.read(0, directory))
+    assert [record['offset'] for record in records] == list(range(400))
+    assert sorted(record['title'] for record in records) == sorted(f"{w}-{i}" for w in range(4) for i in range(100))
+    assert [first for first, _ in feed.segments(directory)] == list(range(0, 400, 50))
+
+
+def test_read_resumes_from_offset_across_segments_and_pruning(tmp_path):
+    directory = str(tmp_path / 'feed')
+    writer = feed.Feed(directory, segment_records=10, keep=3)
+    for i in range(25):
+        assert writer.append({'title': f"advisory {i}"}) == i
+
+    assert [r['offset'] for r in feed.read(8, directory, limit=5)] == [8, 9, 10, 11, 12]
+    assert [r['title'] for r in feed.read(24, directory)] == ["advisory 24"]
+    assert list(feed.read(25, directory)) == []
+
+    for i in range(25, 35):
+        writer.append({'title': f"advisory {i}"})
+    # Segment 0 was pruned; a stale consumer starts at the oldest record kept
+    assert [first for first, _ in feed.segments(directory)] == [10, 20, 30]
+    assert next(feed.read(3, directory))['offset'] == 10
+
+
+def test_partial_line_is_dropped_and_consumers_advance(tmp_path):
+    directory = str(tmp_path / 'feed')
+    writer = feed.Feed(directory)
+    writer.append({'title': 'first'})
+    writer.append({'title': 'second'})
+    with open(feed.segments(directory)[-1][1], 'ab') as f:
+        f.write(b'{"offset": 2, "title": "crashed mid-wri')
+    assert [r['title'] for r in feed.read(0, directory)] == ['first', 'second']
+    assert writer.append({'title': 'third'}) == 2
+    assert [r['title'] for r in feed.read(0, directory)] == ['first', 'second', 'third']
+
+    assert [r['offset'] for r in feed.consume('newsletter', directory)] == [0, 1, 2]
+    feed.save_position('newsletter', 2, directory)
+    assert [r['title'] for r in feed.consume('newsletter', directory)] == ['third']
+    assert feed.load_position('search', directory) == 0
+    assert not feed.Feed('').append({'title': 'disabled'})
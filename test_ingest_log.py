@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Tests for the structured ingest log"""
+
+import os
+import gzip
+import json
+import multiprocessing
+from datetime import datetime
+import ingest_log
+
+
+def write_many(path, worker, count):
+    log = ingest_log.IngestLog(path)
+    for i in range(count):
+        log.write('insert', title=f"{worker}-{i} " + 'x' * 500, distro='debian', outcome='inserted')
+    log.close()
+
+
+def test_concurrent_writers_never_interleave_lines(tmp_path):
+    path = str(tmp_path / 'ingest.jsonl')
+    workers = [multiprocessing.Process(target=write_many, args=(path, worker, 300)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    with open(path) as f:
+        titles = [json.loads(line)['title'].split()[0] for line in f]
+    assert sorted(titles) == sorted(f"{worker}-{i}" for worker in range(4) for i in range(300))
+
+
+def test_size_rotation_compresses_and_prunes(tmp_path):
+    path = str(tmp_path / 'ingest.jsonl')
+    log = ingest_log.IngestLog(path, max_bytes=2000, rotate_seconds=0, keep=2)
+    for i in range(40):
+        log.write('insert', title=f"advisory {i}", distro='fedora', outcome='inserted')
+        log.flush()
+    log.close()
+
+    rotated = ingest_log.rotated_logs(path)
+    assert len(rotated) == 2
+    with gzip.open(rotated[0], 'rt') as f:
+        assert json.loads(f.readline())['event'] == 'insert'
+    assert sorted(os.listdir(tmp_path)) == sorted(['ingest.jsonl', 'ingest.jsonl.lock'] +
+                                                  [os.path.basename(name) for name in rotated])
+    titles = [record['title'] for record in ingest_log.read_records(path)]
+    assert titles == sorted(titles, key=lambda title: int(title.split()[1]))
+    assert titles[-1] == 'advisory 39'
+
+
+def test_query_filters_distro_outcome_and_time(tmp_path):
+    path = str(tmp_path / 'ingest.jsonl')
+    records = [
+        {'time': '2024-05-01T10:00:00.000', 'distro': 'debian', 'outcome': 'inserted', 'title': 'DSA-1'},
+        {'time': '2024-05-01T11:00:00.000', 'distro': 'debian', 'outcome': 'duplicate', 'title': 'DSA-1'},
+        {'time': '2024-05-02T09:00:00.000', 'distro': 'fedora', 'outcome': 'inserted', 'title': 'FEDORA-1'},
+    ]
+    with open(path, 'w') as f:
+        f.write(''.join(json.dumps(record) + '\n' for record in records) + '{torn\n')
+
+    def titles(**options):
+        return [r['title'] + ':' + r['outcome'] for r in ingest_log.query(ingest_log.read_records(path), **options)]
+
+    assert titles(distro='Debian') == ['DSA-1:inserted', 'DSA-1:duplicate']
+    assert titles(outcome='inserted') == ['DSA-1:inserted', 'FEDORA-1:inserted']
+    assert titles(since=datetime(2024, 5, 1, 10, 30), until=datetime(2024, 5, 2)) == ['DSA-1:duplicate']
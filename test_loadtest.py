@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Tests for the load-test harness stand-ins and replay"""
+
+import sys
+import json
+import time
+import smtplib
+import threading
+import urllib.error
+import urllib.request
+from email.message import EmailMessage
+import loadtest
+from dedup_cache import header_message_id
+
+
+def serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def complete(url, content):
+    request = urllib.request.Request(f"{url}/chat/completions", method='POST',
+                                     data=json.dumps({'model': 'gpt-4o-mini', 'messages': [
+                                         {'role': 'system', 'content': 'rules'},
+                                         {'role': 'user', 'content': content}]}).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def test_ai_stub_answers_aliases_with_latency_and_errors():
+    stub = serve(loadtest.AIStub(latency=0.05, jitter=0))
+    try:
+        start = time.perf_counter()
+        response = complete(stub.url, "Extract the most descriptive core words: [DSA 6059-1] thunderbird security update")
+        assert time.perf_counter() - start >= 0.05
+        assert json.loads(response['choices'][0]['message']['content']) == {'string': 'dsa-6059-1-thunderbird'}
+
+        stub.error_rate = 1.0
+        try:
+            complete(stub.url, "Extract the most descriptive core words: curl")
+            assert False, "expected HTTP 500"
+        except urllib.error.HTTPError as e:
+            assert e.code == 500
+        assert (stub.calls, stub.errors) == (2, 1)
+    finally:
+        stub.shutdown()
+
+
+def test_smtp_sink_captures_messages(tmp_path):
+    sink = serve(loadtest.SmtpSink(str(tmp_path / 'mail')))
+    try:
+        with smtplib.SMTP('127.0.0.1', sink.port, timeout=5) as smtp:
+            for subject in ['first', 'second']:
+                msg = EmailMessage()
+                msg['From'] = 'alerts@example.org'
+                msg['To'] = 'admin@example.org'
+                msg['Subject'] = subject
+                msg.set_content('.leading dot\nbody\n')
+                smtp.send_message(msg)
+        assert [m['subject'] for m in sink.messages] == ['first', 'second']
+        assert sink.messages[0]['to'] == ['<admin@example.org>']
+        assert '\n.leading dot\n' in (tmp_path / 'mail' / '000001.eml').read_text().replace('\r\n', '\n')
+    finally:
+        sink.shutdown()
+
+
+def test_replay_paces_arrivals_and_reports_percentiles(tmp_path):
+    messages = loadtest.build_corpus(30, sizes=['small'])
+    assert len({header_message_id(raw) for _, raw in messages}) == 30
+    assert {spec for spec, _ in messages} == set(loadtest.ENTRY_POINTS)
+
+    # Exit 1 for Fedora messages, 0 otherwise
+    command = [sys.executable, '-c', "import sys; sys.exit('Fedora' in sys.stdin.read())"]
+    results, elapsed = loadtest.replay(messages[:10], rate=50, concurrency=4, env=None,
+                                       log_path=str(tmp_path / 'scripts.log'), command=command)
+    assert elapsed >= 9 / 50
+    report = loadtest.summarize(results, elapsed)
+    assert report['messages'] == 10
+    assert sum(report['exit_codes'].values()) == 10 and set(report['exit_codes']) == {0, 1}
+    assert 0 < report['p50_ms'] <= report['p95_ms'] <= report['p99_ms'] <= report['max_ms']
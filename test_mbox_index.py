@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Tests for the mmap-backed mbox offset index"""
+
+import mbox_index
+
+MESSAGE = "From alerts@example.com Mon Jan  1 00:00:00 2024\nSubject: {subject}\n\nbody of {subject}\n\n"
+
+
+def write_mbox(path, subjects, mode='w'):
+    with open(path, mode) as f:
+        for subject in subjects:
+            f.write(MESSAGE.format(subject=subject))
+
+
+def test_index_and_read_ranges(tmp_path):
+    path = str(tmp_path / 'list.mbox')
+    write_mbox(path, ['one', 'two', 'three'])
+
+    offsets = mbox_index.get_index(path)
+    assert len(offsets) == 3
+    assert offsets[0] == 0
+
+    messages = [mbox_index.read_message(path, offset, length)
+                for offset, length in mbox_index.iter_ranges(path, offsets)]
+    assert messages[1].startswith("Subject: two\n")
+    assert "From alerts" not in messages[2]
+
+    # A second call loads the index written next to the mbox
+    size, stored = mbox_index.load_index(path)
+    assert list(stored) == list(offsets)
+
+
+def test_index_extends_when_mbox_grows(tmp_path):
+    path = str(tmp_path / 'list.mbox')
+    write_mbox(path, ['one', 'two'])
+    assert len(mbox_index.get_index(path)) == 2
+
+    write_mbox(path, ['three'], mode='a')
+    offsets = mbox_index.get_index(path)
+    assert len(offsets) == 3
+    last_offset, last_length = list(mbox_index.iter_ranges(path, offsets))[-1]
+    assert "three" in mbox_index.read_message(path, last_offset, last_length)
+
+
+def test_resume_from_checkpoint(tmp_path):
+    path = str(tmp_path / 'list.mbox')
+    write_mbox(path, ['one', 'two', 'three'])
+    offsets = mbox_index.get_index(path)
+    assert mbox_index.load_checkpoint(path) == 0
+
+    mbox_index.save_checkpoint(path, offsets[2])
+    remaining = list(mbox_index.iter_ranges(path, offsets, mbox_index.load_checkpoint(path)))
+    assert len(remaining) == 1
+    assert remaining[0][0] == offsets[2]
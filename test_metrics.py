@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Tests for the Prometheus metrics exporter"""
+
+import urllib.request
+import metrics
+
+
+def test_render_counter_and_histogram():
+    counter = metrics.Counter('test_messages_total', 'Messages', ['distro', 'outcome'])
+    counter.inc(distro='debian', outcome='inserted')
+    counter.inc(2, distro='debian', outcome='inserted')
+    histogram = metrics.Histogram('test_seconds', 'Latency', ['stage'], buckets=(0.1, 1))
+    histogram.observe(0.05, stage='mime')
+    histogram.observe(0.5, stage='mime')
+    histogram.observe(5, stage='mime')
+
+    text = '\n'.join(counter.render(counter.values) + histogram.render(histogram.values))
+    assert '# TYPE test_messages_total counter' in text
+    assert 'test_messages_total{distro="debian",outcome="inserted"} 3' in text
+    assert 'test_seconds_bucket{stage="mime",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{stage="mime",le="1"} 2' in text
+    assert 'test_seconds_bucket{stage="mime",le="+Inf"} 3' in text
+    assert 'test_seconds_sum{stage="mime"} 5.55' in text
+    assert 'test_seconds_count{stage="mime"} 3' in text
+
+
+def test_textfile_accumulates_across_runs(tmp_path):
+    textfile = str(tmp_path / 'alerts.prom')
+    state = str(tmp_path / 'state.json')
+    for _ in range(2):
+        # Each alert script run counts one message and writes on exit
+        metrics.MESSAGES.inc(distro='fedora', outcome='duplicate')
+        metrics.DB_ROUND_TRIPS.observe(3)
+        metrics.write_textfile(textfile, state)
+
+    with open(textfile) as f:
+        text = f.read()
+    assert 'alerts_messages_total{distro="fedora",outcome="duplicate"} 2' in text
+    assert 'alerts_db_round_trips_count 2' in text
+    assert metrics.MESSAGES.values == {}
+
+
+def test_http_endpoint():
+    metrics.MESSAGES.inc(distro='mageia', outcome='inserted')
+    server = metrics.start_http_server(0, '127.0.0.1')
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            text = response.read().decode()
+        assert 'alerts_messages_total{distro="mageia",outcome="inserted"} 1' in text
+    finally:
+        server.shutdown()
+        metrics.MESSAGES.values.clear()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Tests for coalescing notification emails"""
+
+import time
+import fcntl
+import notifier
+from notifier import Notifier, NotifyQueue
+
+
+def make_notifier(window):
+    sent = []
+    return Notifier(window=window, transport=sent.append, path=''), sent
+
+
+def test_events_coalesce_by_distro_and_kind():
+    notifier, sent = make_notifier(window=60)
+    for n in range(3):
+        notifier.failed(f"Debian: DSA-60{n}-1: pkg", 'debian', f"debian title already exists: {n}",
+                        kind='duplicate_title')
+    notifier.failed("Fedora 42: curl", 'fedora', "title already exists", kind='duplicate_title')
+    notifier.failed("Debian: DSA-700-1: x", 'debian', "failed to connect", kind='db_connect')
+    notifier.flush()
+
+    subjects = sorted(msg['Subject'] for msg in sent)
+    assert subjects == ['debian Advisory insert failed',
+                        'debian Advisory insert failed: 3 x duplicate_title',
+                        'fedora Advisory insert failed']
+    digest = next(msg for msg in sent if '3 x' in msg['Subject'])
+    assert digest.get_content().count('subject: Debian: DSA-60') == 3
+    notifier.close()
+
+
+def test_critical_events_skip_the_window():
+    notifier, sent = make_notifier(window=3600)
+    notifier.failed("Debian: DSA-1-1: a", 'debian', "dup", kind='duplicate_title')
+    notifier.failed("Debian: DSA-2-1: b", 'debian', "lost", kind='insert_error', critical=True)
+    deadline = time.time() + 5
+    while not sent and time.time() < deadline:
+        time.sleep(0.01)
+    assert [msg['Subject'] for msg in sent] == ['debian Advisory insert failed']
+    assert 'DSA-2-1' in sent[0].get_content()
+
+    # Closing sends what is still waiting for its window
+    notifier.close()
+    assert len(sent) == 2
+
+
+def test_window_expiry_sends_digest():
+    notifier, sent = make_notifier(window=0.05)
+    notifier.copy("Mageia 2025-0249: sudo", "Updated sudo", "full text", 'mageia')
+    deadline = time.time() + 5
+    while not sent and time.time() < deadline:
+        time.sleep(0.01)
+    assert sent[0]['Subject'] == 'Automatically Inserted Advisory for mageia'
+    assert sent[0]['To'] == 'reports@guardiandigital.com'
+    notifier.close()
+
+
+def test_one_shot_processes_share_one_digest(tmp_path):
+    path = str(tmp_path / 'notify.sqlite3')
+    spawned, sent = [], []
+    # Two alert script runs, each exiting right after its duplicate
+    for n in range(2):
+        process = Notifier(window=60, transport=sent.append, path=path, spawn=lambda: spawned.append(1))
+        process.failed(f"Debian: DSA-60{n}-1: pkg", 'debian', "title already exists", kind='duplicate_title')
+        process.failed("Debian: DSA-9-1: lost", 'debian', "lost", kind='insert_error', critical=True)
+        process.close()
+    assert [msg['Subject'] for msg in sent] == ['debian Advisory insert failed'] * 2
+    assert len(spawned) == 2
+
+    # While a drainer holds the lock nobody starts another
+    shared = NotifyQueue(path)
+    with open(shared.lock_path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        process = Notifier(window=60, transport=sent.append, path=path, spawn=lambda: spawned.append(1))
+        process.failed("Fedora 42: curl", 'fedora', "title already exists", kind='duplicate_title')
+        process.close()
+    assert len(spawned) == 2
+
+    digests = []
+    assert notifier.drain(shared, window=60, transport=digests.append) == 0
+    assert notifier.drain(shared, window=0.05, transport=digests.append, wait=True) == 2
+    subjects = sorted(msg['Subject'] for msg in digests)
+    assert subjects == ['debian Advisory insert failed: 2 x duplicate_title', 'fedora Advisory insert failed']
+    assert shared.next_due(60) is None
+    shared.close()
+
+
+def test_unsent_digests_stay_queued(tmp_path, monkeypatch):
+    shared = NotifyQueue(str(tmp_path / 'notify.sqlite3'))
+    shared.put({'type': 'failed', 'title': "Debian: DSA-1-1: a", 'distro': 'debian', 'reason': "dup",
+                'kind': 'duplicate_title', 'critical': False, 'time': time.time()})
+    attempts, sent = [], []
+
+    def flaky(msg):
+        attempts.append(msg)
+        if len(attempts) < 3:
+            raise OSError("sendmail exited with status 75")
+        sent.append(msg)
+
+    assert notifier.drain(shared, window=0, transport=flaky) == 0
+    assert shared.next_due(0) is not None
+
+    # A waiting drainer backs off and retries until it gets through
+    monkeypatch.setattr(notifier, 'RETRY_SECONDS', 0.01)
+    assert notifier.drain(shared, window=0, transport=flaky, wait=True) == 1
+    assert len(attempts) == 3 and len(sent) == 1
+    assert shared.next_due(0) is None
+    shared.close()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Tests for the content-keyed parse cache"""
+
+import bench_corpus
+from parser_engine import SpecEngine, get_engine
+from parse_cache import ParseCache
+from parser_specs import SPECS
+from timing import StageTimer
+
+CORPUS = bench_corpus.generate_corpus(sizes=['small'])
+
+
+def test_repeated_parse_is_served_from_cache(tmp_path, monkeypatch):
+    cache = ParseCache(str(tmp_path / 'parse.sqlite3'))
+    engine = get_engine()
+    raw = CORPUS[0][2]
+    first = engine.parse(raw, cache=cache)
+    assert cache.stats()[0] == 1
+
+    def parse_again(*args):
+        raise AssertionError("parsed again")
+    monkeypatch.setattr(SpecEngine, '_parse', parse_again)
+    timer = StageTimer()
+    again = engine.parse(raw, timer=timer, cache=cache)
+    assert again == first and again is not first
+    assert list(timer.stages_ms()) == ['parse_cache']
+
+    # A forced spec or different specs are separate entries
+    assert cache.key(raw, 'debian', engine.fingerprint) != cache.key(raw, None, engine.fingerprint)
+    assert SpecEngine(engine.source_specs[:1]).fingerprint != engine.fingerprint
+    cache.close()
+
+
+def test_fingerprint_does_not_depend_on_parse_order():
+    opensuse = next(raw for spec, _, raw in CORPUS if spec == 'opensuse')
+    expected = SpecEngine(SPECS).fingerprint
+    engine = SpecEngine(SPECS)
+    engine.parse(opensuse)
+    assert engine.fingerprint == expected
+
+
+def test_eviction_keeps_recently_used_entries_within_bound(tmp_path):
+    engine = get_engine()
+    parsed = [engine.parse(raw) for _, _, raw in CORPUS[:6]]
+    size = max(len(p.to_bytes()) for p in parsed)
+    cache = ParseCache(str(tmp_path / 'parse.sqlite3'), max_bytes=size * 3.5)
+    for i, p in enumerate(parsed[:3]):
+        cache.put(f"k{i}", p)
+    assert cache.get('k0') == parsed[0]
+
+    for i, p in enumerate(parsed[3:], 3):
+        cache.put(f"k{i}", p)
+    cache.put('k5', parsed[5])
+    entries, total = cache.stats()
+    assert cache.connect().execute("SELECT size FROM totals").fetchone()[0] == total
+    assert total <= size * 3.5 * 0.9 and entries < 6
+    assert cache.get('k5') == parsed[5]
+    assert cache.get('k1') is None and cache.get('k2') is None
+
+    assert ParseCache('').get('k5') is None
+    cache.close()
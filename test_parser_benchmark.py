@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""Tests for the synthetic benchmark corpus and the regression check"""
+
+import bench_corpus
+import bench_parsers
+from parser_engine import get_engine
+
+
+def test_corpus_parses_with_expected_spec():
+    corpus = bench_corpus.generate_corpus(sizes=['small', 'medium'])
+    assert len(corpus) == len(bench_corpus.GENERATORS) * 2 * len(bench_corpus.ENCODINGS)
+    for spec_name, variant, raw in corpus:
+        parsed = get_engine().parse(raw)
+        assert parsed['spec'] == spec_name, variant
+        assert parsed['title'] and parsed['short_desc'] and parsed['package'], variant
+
+
+def test_corpus_is_deterministic():
+    assert bench_corpus.generate_corpus(sizes=['small']) == bench_corpus.generate_corpus(sizes=['small'])
+
+
+def test_benchmark_reports_stages():
+    corpus = bench_corpus.generate_corpus(sizes=['small'], distros=['fedora'])
+    results = bench_parsers.run_benchmark(corpus, min_time=0)
+    assert set(results) == {f"fedora/small-{encoding}" for encoding in bench_corpus.ENCODINGS}
+    for result in results.values():
+        assert result['msgs_per_sec'] > 0
+        assert result['peak_kb'] > 0
+        assert set(result['stages_ms']) == set(bench_parsers.STAGES)
+
+
+def test_compare_flags_regressions():
+    baseline = {'debian/small-plain': {'msgs_per_sec': 1000.0, 'peak_kb': 20.0}}
+    ok = {'debian/small-plain': {'msgs_per_sec': 800.0, 'peak_kb': 24.0}}
+    slow = {'debian/small-plain': {'msgs_per_sec': 700.0, 'peak_kb': 30.0}}
+    assert bench_parsers.compare(ok, baseline, 0.25) == []
+    assert len(bench_parsers.compare(slow, baseline, 0.25)) == 2
+    # Messages without a baseline entry are not compared
+    assert bench_parsers.compare({'new/small-plain': slow['debian/small-plain']}, baseline, 0.25) == []
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""Tests for the spec-driven parser engine using small sample advisories"""
+
+import pickle
+from parser_engine import ParseError, ParsedAdvisory, SkipMessage, get_engine
+
+DEBIAN_EMAIL = """From: Moritz Muehlenhoff <jmm@debian.org>
+To: debian-security-announce@lists.debian.org
+Subject: [SECURITY] [DSA 6059-1] thunderbird security update
+Date: Mon, 17 Nov 2025 20:05:12 +0000
+
+-----BEGIN PGP SIGNED MESSAGE-----
+Hash: SHA512
+
+- -------------------------------------------------------------------------
+Debian Security Advisory DSA-6059-1                   security@debian.org
+https://www.debian.org/security/                       Moritz Muehlenhoff
+November 17, 2025                     https://www.debian.org/security/faq
+- -------------------------------------------------------------------------
+
+Package        : thunderbird
+CVE ID         : CVE-2025-13012 CVE-2025-13013
+
+Multiple security issues were discovered in Thunderbird, which could
+result in the execution of arbitrary code.
+
+For the stable distribution (trixie), these problems have been fixed in
+version 1:140.5.0esr-1~deb13u1.
+-----BEGIN PGP SIGNATURE-----
+
+iQIzBAEBCgAdFiEE
+-----END PGP SIGNATURE-----
+"""
+
+DEBIAN_LTS_EMAIL = """From: Debian LTS <lts@debian.org>
+Subject: [SECURITY] [DLA 3456-1] nginx security update
+Date: Tue, 04 Jun 2024 10:00:00 +0200
+
+-----BEGIN PGP SIGNED MESSAGE-----
+Hash: SHA512
+
+- -------------------------------------------------------------------------
+Debian LTS Advisory DLA-3456-1                debian-lts@lists.debian.org
+- -------------------------------------------------------------------------
+
+Package        : nginx
+Version        : 1.14.2-2+deb10u6
+CVE ID         : CVE-2024-7347
+
+A vulnerability was found in the mp4 module of nginx which could
+cause a worker process crash.
+-----BEGIN PGP SIGNATURE-----
+"""
+
+FEDORA_EMAIL = """From: updates@fedoraproject.org
+Subject: [SECURITY] Fedora 42 Update: curl-8.11.1-4.fc42
+Date: Wed, 05 Mar 2025 01:02:03 +0000
+
+--------------------------------------------------------------------------------
+Fedora Update Notification
+FEDORA-2025-4c3b2a1d0e
+2025-03-05 01:00:00.000000
+--------------------------------------------------------------------------------
+
+Name        : curl
+Product     : Fedora 42
+Version     : 8.11.1
+
+--------------------------------------------------------------------------------
+Update Information:
+
+Fix CVE-2025-0665: eventfd double close.
+--------------------------------------------------------------------------------
+"""
+
+MAGEIA_EMAIL = """From: Mageia Updates <buildsystem-daemon@mageia.org>
+Subject: MGASA-2023-0357: Updated libssh, libssh2 packages fix security vulnerabilities
+Date: Sat, 30 Dec 2023 12:00:00 +0100
+
+
+MGASA-2023-0357 - Updated libssh packages fix security vulnerabilities
+
+Publication date: 30 Dec 2023
+URL: https://advisories.mageia.org/MGASA-2023-0357.html
+"""
+
+UBUNTU_EMAIL = """From: Ubuntu Security <security@ubuntu.com>
+Subject: [USN-7000-1] Expat vulnerabilities
+Date: Tue, 20 Aug 2024 15:00:00 +0000
+
+==========================================================================
+Ubuntu Security Notice USN-7000-1
+August 20, 2024
+
+expat vulnerabilities
+==========================================================================
+
+Summary:
+
+Several security issues were fixed in Expat.
+
+Software Description:
+- expat: XML parsing C library - example application
+"""
+
+
+def test_detects_each_spec():
+    engine = get_engine()
+    assert engine.detect("[SECURITY] [DSA 6059-1] thunderbird security update").name == 'debian'
+    assert engine.detect("[SECURITY] [DLA 3456-1] nginx security update").name == 'deblts'
+    assert engine.detect("[SECURITY] Fedora 42 Update: curl-8.11.1-4.fc42").name == 'fedora'
+    assert engine.detect("MGAA-2025-0082: Updated nvidia-current packages fix bugs").name == 'mageia'
+    assert engine.detect("SUSE-SU-2025:0123-1: important: Security update for curl").name == 'opensuse'
+    assert engine.detect("[USN-7000-1] Expat vulnerabilities").name == 'ubuntu'
+    assert engine.detect("Weekly newsletter") is None
+    # Specs with ignore_case detect the way their subject patterns match
+    assert engine.detect("[SECURITY] [dsa 6059-1] thunderbird security update").name == 'debian'
+    assert engine.detect("mgasa-2025-0082: Updated curl packages fix security vulnerabilities").name == 'mageia'
+    assert engine.detect("[usn-7000-1] Expat vulnerabilities") is None
+
+
+def test_debian():
+    parsed = get_engine().parse(DEBIAN_EMAIL)
+    assert parsed['title'] == "Debian: DSA-6059-1: thunderbird"
+    assert parsed['advisory_id'] == "DSA-6059-1"
+    assert parsed['package'] == "thunderbird"
+    assert parsed['cves'] == ["CVE-2025-13012", "CVE-2025-13013"]
+    assert parsed['short_desc'].startswith("Multiple security issues were discovered in Thunderbird")
+    assert "BEGIN PGP SIGNATURE" not in parsed['body']
+
+
+def test_debian_lts():
+    parsed = get_engine().parse(DEBIAN_LTS_EMAIL)
+    assert parsed['distro'] == 'deblts'
+    assert parsed['title'] == "Debian LTS: DLA-3456-1: nginx"
+    assert parsed['short_desc'] == ("A vulnerability was found in the mp4 module of nginx which could "
+                                    "cause a worker process crash.")
+
+
+def test_fedora():
+    parsed = get_engine().parse(FEDORA_EMAIL)
+    assert parsed['title'] == "Fedora 42: curl 2025-4c3b2a1d0e"
+    assert parsed['short_desc'] == "Fix CVE-2025-0665: eventfd double close."
+    assert parsed['cves'] == ["CVE-2025-0665"]
+
+
+def test_fedora_underline_drops_only_its_own_line():
+    email = FEDORA_EMAIL.replace("Fix CVE-2025-0665: eventfd double close.\n",
+                                 "Security fixes\n==============\nFix CVE-2025-0665: eventfd double close.\n")
+    parsed = get_engine().parse(email)
+    assert parsed['short_desc'] == "Security fixes Fix CVE-2025-0665: eventfd double close."
+
+
+def test_mageia_takes_first_package():
+    parsed = get_engine().parse(MAGEIA_EMAIL)
+    assert parsed['title'] == "Mageia 2023-0357: libssh"
+    assert parsed['short_desc'] == "MGASA-2023-0357 - Updated libssh packages fix security vulnerabilities"
+
+
+def test_ubuntu():
+    parsed = get_engine().parse(UBUNTU_EMAIL)
+    assert parsed['title'] == "Ubuntu 7000-1: Expat vulnerabilities"
+    assert parsed['package'] == "expat"
+    assert parsed['short_desc'] == "Several security issues were fixed in Expat."
+    assert parsed['cves'] == []
+
+
+def test_stored_opensuse_fulltext_gets_no_guessed_description():
+    spec = get_engine().by_name['opensuse']
+    body = "Announcement ID: SUSE-SU-2025:0123-1\nRating: important\n\nPackage list:\n- curl-8.6.0-150600.4.12.1 and friends\n"
+    assert spec.build_short_desc(body) == "- curl-8.6.0-150600.4.12.1 and friends"
+    assert spec.build_short_desc(body, stored=True) == ""
+
+
+def test_reply_is_skipped():
+    raw = DEBIAN_EMAIL.replace("Subject: [SECURITY]", "Subject: Re: [SECURITY]")
+    try:
+        get_engine().parse(raw, 'debian')
+    except SkipMessage:
+        return
+    assert False, "reply was not skipped"
+
+
+def test_missing_package_section_fails():
+    raw = DEBIAN_EMAIL.replace("Package        : thunderbird\n", "")
+    raw = raw.replace("CVE ID         :", "CVE list:")
+    try:
+        get_engine().parse(raw)
+    except ParseError as e:
+        assert e.reason == "Failed to find Package section in email body"
+        return
+    assert False, "missing Package section was accepted"
+
+
+def test_parsed_advisory_reads_like_a_dict_and_round_trips():
+    parsed = get_engine().parse(DEBIAN_EMAIL)
+    assert isinstance(parsed, ParsedAdvisory) and not hasattr(parsed, '__dict__')
+    assert parsed.title == parsed['title'] and parsed['from'] == parsed.sender
+    assert parsed.get('missing', 'default') == 'default' and 'cves' in parsed
+    as_dict = dict(parsed)
+    assert list(as_dict) == list(ParsedAdvisory.KEYS) and as_dict['advisory_id'] == "DSA-6059-1"
+
+    parsed['title'] = "Debian: DSA-6059-2: thunderbird"
+    assert parsed.title == "Debian: DSA-6059-2: thunderbird"
+    try:
+        parsed['unknown'] = 1
+        assert False, "unknown field was accepted"
+    except KeyError:
+        pass
+
+    assert ParsedAdvisory.from_bytes(parsed.to_bytes()) == parsed
+    assert pickle.loads(pickle.dumps(parsed)) == parsed
+    try:
+        ParsedAdvisory.from_bytes(b'not marshalled')
+        assert False, "garbage was decoded"
+    except ValueError:
+        pass
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Tests for severity-ordered, per-distro fair insert scheduling"""
+
+import sys
+import sqlite3
+import time
+import threading
+import subprocess
+import scheduler
+from scheduler import InsertScheduler
+from parser_engine import get_engine
+
+RAW = "Subject: {subject}\nDate: Mon, 17 Nov 2025 20:05:12 +0000\n\n{body}\n"
+
+
+def test_specs_extract_severity_class():
+    engine = get_engine()
+    suse = engine.parse(RAW.format(subject="SUSE-SU-2025:0123-1: critical: Security update for curl",
+                                   body="Announcement ID: SUSE-SU-2025:0123-1\nDescription:\n\nfix\n"), 'opensuse')
+    mageia = engine.by_name['mageia'].extract_fields("MGAA-2025-0042: Updated foo packages fix bugs", '', {})
+    assert scheduler.severity_class(suse['severity']) == 'critical'
+    assert scheduler.severity_class(mageia['severity']) == 'low'
+    assert scheduler.severity_class('High') == 'important'
+    assert scheduler.severity_class('') == 'moderate'
+
+
+def test_order_prefers_severity_then_takes_turns_per_distro():
+    items = [('moderate', 'opensuse', t) for t in range(4)] + [('moderate', 'fedora', 5), ('important', 'debian', 6)]
+    ordered = [(distro, t) for _, distro, t in scheduler.order(items, lambda item: item)]
+    assert ordered == [('debian', 6), ('opensuse', 0), ('fedora', 5), ('opensuse', 1), ('opensuse', 2),
+                       ('opensuse', 3)]
+
+
+def test_slots_go_to_highest_severity_first(tmp_path):
+    path = str(tmp_path / 'scheduler.sqlite3')
+    holder = InsertScheduler(path, slots=1)
+    started = []
+
+    def insert(severity, distro):
+        with InsertScheduler(path, slots=1).slot(severity, distro):
+            started.append(distro)
+
+    with holder.slot('low', 'opensuse'):
+        threads = []
+        for severity, distro in [('low', 'opensuse'), ('moderate', 'fedora'), ('critical', 'debian')]:
+            threads.append(threading.Thread(target=insert, args=(severity, distro)))
+            threads[-1].start()
+            while sum(waiting for waiting, _, _ in holder.status().values()) < len(threads):
+                time.sleep(0.01)
+        assert holder.status()['critical'][0] == 1
+    for thread in threads:
+        thread.join()
+    assert started == ['debian', 'fedora', 'opensuse']
+
+
+def test_tickets_of_dead_processes_are_reaped(tmp_path):
+    path = str(tmp_path / 'scheduler.sqlite3')
+    dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    dead.wait()
+    s = InsertScheduler(path, slots=1)
+    s.connect().execute("INSERT INTO tickets (pid, severity, distro, arrived_at, started_at) VALUES (?, ?, ?, ?, ?)",
+                        (dead.pid, 'low', 'opensuse', time.time(), time.time()))
+    with s.slot('moderate', 'debian') as waited:
+        assert waited < 1
+
+
+def test_failed_wait_gives_its_ticket_back(tmp_path, monkeypatch):
+    path = str(tmp_path / 'scheduler.sqlite3')
+
+    def locked(self, ticket, severity):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(InsertScheduler, 'wait', locked)
+    with InsertScheduler(path, slots=1).slot('moderate', 'debian') as waited:
+        assert waited == 0.0
+        assert InsertScheduler(path).connect().execute("SELECT COUNT(*) FROM tickets").fetchone()[0] == 0
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Tests for the local full-text mirror of ingested advisories"""
+
+import search_index
+from advisory import Advisory
+from backfill import Checkpoint
+from search_index import SearchIndex, extract_facets
+
+DEBIAN_BODY = """Debian Security Advisory DSA-6012-1
+Package        : curl
+CVE ID         : CVE-2025-10148 CVE-2025-9086
+
+Two vulnerabilities were found in curl, a tool for transferring data with
+URL syntax: a cookie path overread and a predictable WebSocket mask.
+"""
+
+UBUNTU_BODY = """Ubuntu Security Notice USN-7700-1
+
+Summary:
+
+OpenSSL could be made to crash.
+
+Software Description:
+- openssl: Secure Socket Layer (SSL) cryptographic library and tools
+
+Details:
+
+A NULL dereference was found in the CMS parser (CVE-2025-9230).
+"""
+
+
+def test_facets_and_search(tmp_path):
+    assert extract_facets("Debian: DSA-6012-1: curl", DEBIAN_BODY) == {
+        'advisory_id': 'DSA-6012-1', 'package': 'curl', 'cves': ['CVE-2025-10148', 'CVE-2025-9086']}
+    assert extract_facets("openSUSE: 2025:0042-1 important: kernel", "Announcement ID: SUSE-SU-2025:0042-1") == {
+        'advisory_id': 'SUSE-SU-2025:0042-1', 'package': 'kernel', 'cves': []}
+
+    index = SearchIndex(str(tmp_path / 'search.sqlite3'))
+    index.add("Debian: DSA-6012-1: curl", "Two vulnerabilities", DEBIAN_BODY, 'Debian',
+              'Mon, 22 Sep 2025 10:00:00 +0000', article_id=101)
+    index.add("Ubuntu 7700-1: OpenSSL vulnerability", "OpenSSL could be made to crash.", UBUNTU_BODY, 'ubuntu',
+              'Tue, 30 Sep 2025 16:12:00 +0000', article_id=102)
+
+    [hit] = index.search("websocket mask")
+    assert hit['title'] == "Debian: DSA-6012-1: curl" and hit['article_id'] == 101
+    assert '[WebSocket]' in hit['snippet'] and hit['created'] == '2025-09-22 10:00:00'
+    assert [r['package'] for r in index.search(cve='cve-2025-9230')] == ['openssl']
+    assert [r['advisory_id'] for r in index.search(distro='debian')] == ['DSA-6012-1']
+    assert [r['article_id'] for r in index.search()] == [102, 101]
+    assert index.search("crash", package='curl') == []
+    assert index.search("DSA-6012-1")[0]['cves'] == ['CVE-2025-10148', 'CVE-2025-9086']
+    assert [r['title'] for r in index.similar("Debian: DSA-6013-1: curl")] == ["Debian: DSA-6012-1: curl"]
+    assert index.stats() == {'debian': 1, 'ubuntu': 1, 'cves': 3}
+
+
+def test_readding_a_title_replaces_its_terms(tmp_path):
+    index = SearchIndex(str(tmp_path / 'search.sqlite3'))
+    index.add("Debian: DSA-6012-1: curl", "first", DEBIAN_BODY, 'debian', 'bad date', article_id=101)
+    index.add("Debian: DSA-6012-1: curl", "second", "Package : curl\nFixes CVE-2025-0001 only.\n", 'debian',
+              'Mon, 22 Sep 2025 10:00:00 +0000', article_id=101)
+
+    assert index.search("websocket") == []
+    [hit] = index.search("second")
+    assert hit['cves'] == ['CVE-2025-0001']
+    assert index.search(cve='CVE-2025-9086') == []
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.result = []
+
+    def execute(self, sql, params):
+        after, = params
+        limit = int(sql.rsplit('LIMIT', 1)[1])
+        self.result = [row for row in self.rows if row[0] > after][:limit]
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self, buffered=True):
+        return FakeCursor(self.rows)
+
+
+def test_bootstrap_resumes_from_its_own_checkpoint(tmp_path, monkeypatch):
+    rows = [(article_id, 87, f"Debian: DSA-{article_id}-1: curl", "intro",
+             f'<pre><font face="Courier">Package : curl\nCVE-2025-{1000 + article_id} &amp; more</font></pre>',
+             '2025-09-22 10:00:00') for article_id in range(1, 4)]
+    monkeypatch.setattr(Advisory, 'db_connect', lambda self, database: FakeConnection(rows))
+    monkeypatch.setattr(Advisory, 'db_disconnect', lambda self, connection: None)
+    index = SearchIndex(str(tmp_path / 'search.sqlite3'))
+    checkpoint = Checkpoint(str(tmp_path / 'checkpoint.json'))
+    # A live insert before the first bootstrap must not hide the history
+    index.add("Debian: DSA-9999-1: curl", "intro", "Package : curl", 'debian', '2025-09-25 10:00:00',
+              article_id=250000)
+
+    assert search_index.bootstrap(index, checkpoint, chunk_size=2) == 3
+    assert checkpoint.get('search:lsv7') == 3
+    rows.extend([(4, 87, "Debian: DSA-4-1: curl", "intro", "Package : curl", '2025-09-23 10:00:00'),
+                 (5, 172, "Ubuntu 5-1: curl", "intro", "", '2025-09-24 10:00:00')])
+    assert search_index.bootstrap(index, checkpoint, chunk_size=2) == 2
+    # Each database keeps its own position
+    assert search_index.bootstrap(index, checkpoint, 'lsv7j5beta', chunk_size=10) == 5
+    assert checkpoint.get('search:lsv7j5beta') == 5
+
+    assert index.stats() == {'debian': 5, 'ubuntu': 1, 'cves': 3}
+    [hit] = index.search("more", cve='CVE-2025-1002')
+    assert hit['article_id'] == 2 and '<pre>' not in hit['snippet'] and '& [more]' in hit['snippet']
+    assert index.search(distro='ubuntu')[0]['created'] == '2025-09-24 10:00:00'
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Tests for the durable advisory spool and its replay worker"""
+
+import sys
+import subprocess
+import advisory
+import metrics
+import spool
+from spool import Spool
+
+ADVISORY = {'title': 'Debian: DSA-6059-1: thunderbird', 'short_desc': 'Several issues',
+            'body': 'body\n', 'distro': 'debian', 'date': 'Mon, 17 Nov 2025 20:05:12 +0000',
+            'message_id': '<a@example.org>', 'dedup_keys': []}
+
+
+class FakeAdvisory:
+    """Stands in for Advisory: fails to connect while down, then returns queued outcomes"""
+
+    down = True
+    outcomes = []
+    inserted = []
+
+    def insert_advisories(self, advisories, notify=False):
+        if FakeAdvisory.down:
+            raise Exception("failed to connect to MySQL database lsv7")
+        FakeAdvisory.inserted.extend(adv['title'] for adv in advisories)
+        return [FakeAdvisory.outcomes.pop(0) if FakeAdvisory.outcomes else 'inserted' for _ in advisories]
+
+    def send_failed(self, *args, **kwargs):
+        pass
+
+
+def test_append_ack_and_compact(tmp_path):
+    s = Spool(str(tmp_path))
+    first = s.append(ADVISORY)
+    second = s.append(dict(ADVISORY, title='Debian: DSA-6060-1: curl'))
+    s.fail(second, "timeout")
+    s.ack(first, 'inserted')
+
+    pending = s.read()
+    assert list(pending) == [second]
+    assert pending[second]['attempts'] == 1
+
+    # A torn write is skipped and the next record starts on a new line
+    with open(s.path, 'a') as f:
+        f.write('{"op": "add", "id": "tor')
+    third = s.append(ADVISORY)
+    assert list(s.read()) == [second, third]
+
+    assert s.compact() == 2
+    assert s.read()[second]['attempts'] == 1
+    with open(s.path) as f:
+        assert len(f.readlines()) == 3
+
+
+def test_replay_waits_for_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(advisory, 'Advisory', FakeAdvisory)
+    monkeypatch.setattr(spool.time, 'sleep', lambda seconds: setattr(FakeAdvisory, 'down', False))
+    monkeypatch.setattr(metrics, 'write_textfile', lambda: None)
+    s = Spool(str(tmp_path))
+    for n in range(3):
+        s.append(dict(ADVISORY, title=f"advisory {n}"))
+
+    FakeAdvisory.down = True
+    assert spool.replay(s, batch_size=2, once=True, grace=0) == {}
+    assert len(s.read()) == 3
+
+    # Without --once the worker backs off (sleep brings the database back) and drains in batches
+    FakeAdvisory.inserted = []
+    FakeAdvisory.outcomes = ['inserted', 'duplicate', 'inserted']
+    assert spool.replay(s, batch_size=2, grace=0) == {'inserted': 2, 'duplicate': 1}
+    assert FakeAdvisory.inserted == ['advisory 0', 'advisory 1', 'advisory 2']
+    assert s.read() == {}
+
+
+def test_replay_gives_up_after_max_attempts(tmp_path, monkeypatch):
+    monkeypatch.setattr(advisory, 'Advisory', FakeAdvisory)
+    monkeypatch.setattr(spool.time, 'sleep', lambda seconds: None)
+    monkeypatch.setattr(metrics, 'write_textfile', lambda: None)
+    FakeAdvisory.down = False
+    FakeAdvisory.outcomes = ['failed'] * spool.MAX_ATTEMPTS
+    s = Spool(str(tmp_path))
+    s.append(ADVISORY)
+    assert spool.replay(s, grace=0) == {'gave_up': 1}
+    assert s.read() == {}
+
+
+def test_young_entries_are_left_for_their_script(tmp_path, monkeypatch):
+    monkeypatch.setattr(advisory, 'Advisory', FakeAdvisory)
+    FakeAdvisory.down = False
+    s = Spool(str(tmp_path))
+    s.append(ADVISORY)
+    assert spool.replay(s) == {}
+    assert len(s.read()) == 1
+
+
+def test_entries_of_live_scripts_are_left_alone(tmp_path, monkeypatch):
+    monkeypatch.setattr(advisory, 'Advisory', FakeAdvisory)
+    monkeypatch.setattr(metrics, 'write_textfile', lambda: None)
+    FakeAdvisory.down = False
+    # An alert script that spooled its advisory and is still waiting for an insert slot
+    script = subprocess.Popen([sys.executable, '-c', f"import sys; from spool import Spool; "
+                               f"Spool({str(tmp_path)!r}).append({ADVISORY!r}); print(); sys.stdin.read()"],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    script.stdout.readline()
+    assert spool.replay(Spool(str(tmp_path)), grace=0) == {}
+
+    script.communicate()
+    assert spool.replay(Spool(str(tmp_path)), grace=0) == {'inserted': 1}
+
+
+def test_drained_spool_shrinks(tmp_path, monkeypatch):
+    monkeypatch.setattr(advisory, 'Advisory', FakeAdvisory)
+    big = dict(ADVISORY, body='x' * 100_000)
+    s = Spool(str(tmp_path), compact_bytes=10 ** 9)
+    for n in range(3):
+        s.ack(s.append(dict(big, title=f"advisory {n}")), 'inserted')
+    assert spool.os.path.getsize(s.path) > 300_000
+
+    # Nothing pending to replay, but the journal is past the bound
+    s.compact_bytes = 250_000
+    assert spool.replay(s, once=True) == {}
+    assert spool.os.path.getsize(s.path) == 0
+
+    # Live acks compact on their own once the bound is passed
+    pending = s.append(dict(big, title='still pending'))
+    for n in range(3):
+        s.ack(s.append(dict(big, title=f"live {n}")), 'inserted')
+    assert list(s.read()) == [pending]
+    assert spool.os.path.getsize(s.path) < 250_000
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Tests for the adaptive rate controller"""
+
+from throttle import RateController
+
+
+class FakeProbe:
+    """Connection answering SHOW GLOBAL STATUS with queued Threads_running values"""
+
+    def __init__(self, values):
+        self.values = values
+
+    def is_connected(self):
+        return True
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        self.value = self.values.pop(0)
+
+    def fetchone(self):
+        return ('Threads_running', str(self.value))
+
+    def close(self):
+        pass
+
+
+def test_rate_recovers_from_load_probes_after_a_spike(tmp_path):
+    probe = FakeProbe([40] + [2] * 30)
+    throttle = RateController(100, max_threads_running=16, pause_file=str(tmp_path / 'pause'),
+                              connect=lambda: probe, load_interval=0)
+    assert throttle.rate == 50
+
+    throttle.check_load()
+    assert throttle.rate == 25
+
+    # Bulk import only acquires; healthy probes alone must bring it back to the cap
+    for _ in range(30):
+        throttle.check_load()
+    assert throttle.rate == 100
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Tests for per-message stage timing"""
+
+import json
+import timing
+from parser_engine import get_engine
+import bench_corpus
+
+
+def test_engine_charges_each_stage():
+    (_, _, raw), = bench_corpus.generate_corpus(sizes=['small'], distros=['debian'])[:1]
+    timer = timing.StageTimer()
+    get_engine().parse(raw, timer=timer)
+    assert list(timer.stages) == ['mime', 'detect', 'subject', 'decode', 'body', 'short_desc', 'fields']
+    assert all(seconds >= 0 for seconds in timer.stages.values())
+
+
+def test_records_aggregate_across_runs(tmp_path):
+    log = str(tmp_path / 'timings.jsonl')
+    for ms in [1.0, 2.0, 3.0, 10.0]:
+        timing.write_record({'spec': 'debian', 'total_ms': ms * 2, 'stages_ms': {'mime': ms}}, log)
+    timing.write_record({'spec': 'fedora', 'total_ms': 5.0, 'stages_ms': {'mime': 5.0}}, log)
+    with open(log, 'a') as f:
+        f.write('not json\n')
+
+    groups = timing.aggregate(timing.read_records([log]), 'spec')
+    assert groups['debian']['mime'] == [1.0, 2.0, 3.0, 10.0]
+    assert groups['debian']['total'] == [2.0, 4.0, 6.0, 20.0]
+    assert timing.percentile(groups['debian']['mime'], 0.95) == 10.0
+    assert groups['fedora']['mime'] == [5.0]
+
+
+def test_profiler_summary(tmp_path):
+    with timing.Profiler(top=5) as profiler:
+        sorted(str(i) for i in range(10000))
+    summary = profiler.summary(dump_dir=str(tmp_path))
+    assert len(summary['functions']) <= 5
+    assert summary['peak_kb'] > 0
+    assert summary['profile_file'].startswith(str(tmp_path))
+    json.dumps(summary)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Adaptive rate control for backfills and bulk imports.
+
+RateController is a token bucket on rows per second shared by every writer
+thread of a run. The rate backs off multiplicatively when per-row query
+latency goes over target or when the server reports too many running
+threads, and recovers additively while both look healthy. Creating the
+pause file stops all writers until it is removed.
+"""
+
+import os
+import time
+import threading
+
+PAUSE_FILE = '/home/alerts/scripts_linstage/backfill.pause'
+
+
+class RateController:
+    """Token bucket on rows/second that adapts to database latency and load"""
+
+    def __init__(self, max_rate=None, min_rate=5.0, target_latency=None, max_threads_running=None,
+                 pause_file=None, connect=None, load_interval=5.0):
+        self.max_rate = float(max_rate or os.getenv('THROTTLE_MAX_RATE', 500))
+        self.min_rate = min(min_rate, self.max_rate)
+        self.target_latency = float(target_latency or os.getenv('THROTTLE_TARGET_LATENCY_MS', 5)) / 1000
+        self.max_threads_running = int(max_threads_running or os.getenv('THROTTLE_MAX_THREADS_RUNNING', 16))
+        self.pause_file = pause_file or os.getenv('THROTTLE_PAUSE_FILE', PAUSE_FILE)
+        self.load_interval = load_interval
+
+        self.rate = self.max_rate / 2
+        self.tokens = 0.0
+        self.last_refill = time.monotonic()
+        self.last_load_check = 0.0
+        self.lock = threading.Lock()
+        self.probe_lock = threading.Lock()
+
+        # Own connection for SHOW STATUS so probes never interleave with a writer's cursor
+        self.connect = connect
+        self.probe_connection = None
+
+    def wait_if_paused(self):
+        """Block while the pause file exists"""
+        if not os.path.exists(self.pause_file):
+            return
+        print(f"Paused: remove {self.pause_file} to resume")
+        while os.path.exists(self.pause_file):
+            time.sleep(1)
+        print("Resumed")
+
+    def acquire(self, rows):
+        """Take tokens for rows, sleeping off any deficit at the current rate"""
+        self.wait_if_paused()
+        self.check_load()
+        with self.lock:
+            now = time.monotonic()
+            # Allow at most one second of burst
+            self.tokens = min(self.rate, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            self.tokens -= rows
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+    def record(self, elapsed, rows):
+        """Feed back how long a statement batch covering rows took"""
+        if rows <= 0:
+            return
+        per_row = elapsed / rows
+        with self.lock:
+            if per_row > self.target_latency:
+                self._decrease(f"latency {per_row * 1000:.1f}ms/row")
+            else:
+                self._increase()
+
+    def check_load(self):
+        """Back off when the server has too many running threads, recover while it has few"""
+        if not self.connect or time.monotonic() - self.last_load_check < self.load_interval:
+            return
+        # Only one writer thread probes at a time; the others keep going
+        if not self.probe_lock.acquire(blocking=False):
+            return
+        try:
+            self.last_load_check = time.monotonic()
+            threads_running = self.threads_running()
+        finally:
+            self.probe_lock.release()
+        if threads_running is None:
+            return
+        with self.lock:
+            if threads_running > self.max_threads_running:
+                self._decrease(f"Threads_running {threads_running}")
+            else:
+                # Writers that never call record() would otherwise stay at the backed-off rate
+                self._increase()
+
+    def threads_running(self):
+        """Return the server's Threads_running, or None if it can't be read"""
+        try:
+            if self.probe_connection is None or not self.probe_connection.is_connected():
+                self.probe_connection = self.connect()
+            if not self.probe_connection:
+                return None
+            cursor = self.probe_connection.cursor()
+            cursor.execute("SHOW GLOBAL STATUS LIKE 'Threads_running'")
+            row = cursor.fetchone()
+            cursor.close()
+            return int(row[1]) if row else None
+        except Exception as e:
+            print(f"Error reading server load: {e}")
+            self.probe_connection = None
+            return None
+
+    def _increase(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def _decrease(self, reason):
+        new_rate = max(self.min_rate, self.rate * 0.5)
+        if new_rate < self.rate:
+            print(f"Throttling to {new_rate:.1f} rows/sec ({reason})")
+        self.rate = new_rate
+
+    def close(self):
+        """Close the load probe connection"""
+        if self.probe_connection:
+            try:
+                self.probe_connection.close()
+            except Exception:
+                pass
+            self.probe_connection = None
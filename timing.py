@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Per-message stage timing and opt-in profiling.
+
+A StageTimer is handed through the parser engine and Advisory.insert_advisory,
+which call lap(stage) as each stage finishes; time is accumulated per stage
+name so the two database passes of an insert add up. The alert scripts write
+one JSON line per message to the timing log, optionally with a cProfile and
+tracemalloc summary (--profile), and running this module aggregates the log.
+"""
+
+import os
+import sys
+import json
+import time
+import cProfile
+import pstats
+import tracemalloc
+from datetime import datetime
+
+TIMING_LOG = os.getenv('ALERT_TIMING_LOG', '/home/alerts/scripts_linstage/timings.jsonl')
+PROFILE_DIR = os.getenv('ALERT_PROFILE_DIR', '/home/alerts/scripts_linstage/profiles')
+
+
+class StageTimer:
+    """Accumulates seconds per named stage using a lap clock"""
+
+    def __init__(self):
+        self.stages = {}
+        self.started = time.perf_counter()
+        self.last = self.started
+
+    def lap(self, stage):
+        """Charge the time since the previous lap to stage"""
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self.last
+        self.last = now
+
+    def skip(self):
+        """Restart the lap clock without charging any stage"""
+        self.last = time.perf_counter()
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def stages_ms(self):
+        return {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()}
+
+
+class NullTimer:
+    """Timer that records nothing, used when no timer is passed"""
+
+    stages = {}
+
+    def lap(self, stage):
+        pass
+
+    def skip(self):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+class Profiler:
+    """cProfile and tracemalloc around a block, summarised for the timing log"""
+
+    def __init__(self, top=20):
+        self.top = top
+        self.profile = cProfile.Profile()
+        self.snapshot = None
+        self.peak = 0
+
+    def __enter__(self):
+        tracemalloc.start()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.disable()
+        self.snapshot = tracemalloc.take_snapshot()
+        _, self.peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return False
+
+    def summary(self, dump_dir=PROFILE_DIR):
+        """Top functions by cumulative time and top allocation sites"""
+        stats = pstats.Stats(self.profile)
+        functions = []
+        for (filename, line, name), (cc, nc, tt, ct, _) in sorted(
+                stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top]:
+            functions.append({'function': f"{os.path.basename(filename)}:{line}({name})",
+                              'calls': nc, 'tottime_ms': round(tt * 1000, 3),
+                              'cumtime_ms': round(ct * 1000, 3)})
+        allocations = [{'site': str(stat.traceback[0]), 'kb': round(stat.size / 1024, 1), 'count': stat.count}
+                       for stat in self.snapshot.statistics('lineno')[:self.top]]
+
+        summary = {'peak_kb': round(self.peak / 1024, 1), 'functions': functions, 'allocations': allocations}
+        # Keep the full profile for pstats/snakeviz when there is somewhere to put it
+        try:
+            os.makedirs(dump_dir, exist_ok=True)
+            path = os.path.join(dump_dir, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+            stats.dump_stats(path)
+            summary['profile_file'] = path
+        except OSError as e:
+            print(f"Error saving profile: {e}")
+        return summary
+
+
+def write_record(record, path=TIMING_LOG):
+    """Append one JSON line to the timing log; never fails the caller"""
+    if not path:
+        return
+    line = (json.dumps(record, default=str) + '\n').encode('utf-8')
+    try:
+        # One O_APPEND write per record so concurrent alert scripts don't interleave lines
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        print(f"Error writing timing record: {e}")
+
+
+def read_records(paths):
+    """Yield records from timing logs, skipping malformed lines"""
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def aggregate(records, group_by=None):
+    """Return {group: {stage: sorted milliseconds}} including a 'total' stage"""
+    groups = {}
+    for record in records:
+        group = record.get(group_by, '') if group_by else 'all'
+        stages = groups.setdefault(group, {})
+        for stage, ms in record.get('stages_ms', {}).items():
+            stages.setdefault(stage, []).append(ms)
+        if 'total_ms' in record:
+            stages.setdefault('total', []).append(record['total_ms'])
+    for stages in groups.values():
+        for values in stages.values():
+            values.sort()
+    return groups
+
+
+def print_aggregate(groups):
+    print(f"{'group':<20} {'stage':<18} {'count':>6} {'mean ms':>10} {'p50':>10} {'p95':>10} {'max':>10}")
+    for group, stages in sorted(groups.items()):
+        for stage, values in stages.items():
+            print(f"{group:<20} {stage:<18} {len(values):>6} {sum(values) / len(values):>10.2f} "
+                  f"{percentile(values, 0.5):>10.2f} {percentile(values, 0.95):>10.2f} {values[-1]:>10.2f}")
+
+
+def main():
+    args = list(sys.argv[1:])
+    if '--help' in args or '-h' in args:
+        print("Usage: python timing.py [--by FIELD] [LOG ...]")
+        print("  --by FIELD: Group by a record field such as spec, distro or outcome")
+        print(f"  LOG: Timing logs to aggregate (default: {TIMING_LOG})")
+        sys.exit(0)
+    group_by = None
+    if '--by' in args:
+        index = args.index('--by')
+        if index + 1 >= len(args):
+            print("Error: --by requires a field name")
+            sys.exit(1)
+        group_by = args[index + 1]
+        del args[index:index + 2]
+    print_aggregate(aggregate(read_records(args or [TIMING_LOG]), group_by))
+
+
+if __name__ == "__main__":
+    main()